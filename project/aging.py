@@ -0,0 +1,88 @@
+import time
+from typing import Callable
+
+from .task_queue import Queue
+
+
+# promotes tasks one priority level up after they have waited `interval`
+# seconds in their subqueue, so low priorities are not starved by a steady
+# stream of higher-priority tasks
+#
+# time is cut into `buckets` epochs per interval. every subqueue keeps the ids
+# that entered it per epoch (SubQueue.entries) and every task the epoch it
+# entered in (SubQueue.tasks), so a tick only looks at the epochs that have just
+# expired: its cost is the number of tasks promoted plus the entries of tasks
+# that left the subqueue in the meantime, each entry is visited once. an epoch
+# expires once all of its tasks have waited interval seconds, i.e. `buckets`
+# whole epochs after its end: a task waits more than interval and at most
+# interval + interval / buckets seconds before it is promoted, wherever in its
+# epoch it entered. a promoted task keeps its enqueue order (position
+# "keep"), i.e. it goes in front of the tasks enqueued after it in its new
+# subqueue, and it waits another interval there before the next promotion.
+#
+# the queue ticks the policy at the start of get_task and get_tasks; tick may
+# also be called directly, e.g. from a timer
+class AgingPolicy:
+    def __init__(
+        self,
+        queue: Queue,
+        interval: float,
+        buckets: int = 8,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if interval <= 0 or buckets < 1:
+            raise ValueError("interval and buckets must be positive")
+
+        self.queue = queue
+        self.buckets = buckets
+        self.width = interval / buckets
+        self.clock = clock
+        self.start = clock()
+        self.ticked = 0  # last epoch ticked
+        self.promoted = 0
+
+        # tasks already queued start waiting now; TC: O(N)
+        for subq in queue.subqueues:
+            ids = list(subq.tasks)
+            subq.tasks.update(dict.fromkeys(ids, 0))
+            subq.entries.clear()
+            if ids:
+                subq.enter(ids, 0)
+
+        queue.aging = self
+
+    def detach(self) -> None:
+        # stop aging the queue
+        self.queue.aging = None
+        for subq in self.queue.subqueues:
+            subq.entries.clear()
+
+    def epoch(self) -> int:
+        return int((self.clock() - self.start) // self.width)
+
+    def tick(self) -> int:
+        # promote the tasks of the expired epochs, returns their number
+        # TC: O(1) within an epoch, O(L + K) otherwise with L levels and K tasks
+        epoch = self.epoch()
+        if epoch <= self.ticked:
+            return 0
+
+        self.ticked = epoch
+        # a task that entered at the very end of an epoch has waited interval
+        # seconds only once `buckets` more epochs have passed
+        expired = epoch - self.buckets - 1
+
+        promoted = 0
+        # from high to low, so a task is promoted once per tick: it enters its
+        # new subqueue in the current epoch
+        for priority, subq in enumerate(self.queue.subqueues, start=1):
+            ids = subq.expire(expired)
+            if priority == 1:
+                continue
+
+            for id in ids:
+                self.queue.change_priority(id, priority - 1, "keep")
+            promoted += len(ids)
+
+        self.promoted += promoted
+        return promoted
@@ -0,0 +1,261 @@
+from array import array
+
+from .doubly_linked_list import Node
+from .task import Task
+
+EMPTY = -1
+
+
+# doubly linked list stored as a struct of arrays
+#
+# tasks live in a list of slots, prev/next links are slot indices kept in
+# array('q') buffers and released slots are chained into a free-list through
+# the `next_items` buffer, so no per-task node objects are kept alive and the
+# garbage collector has nothing to traverse but the tasks themselves.
+#
+# the public API mirrors DoublyLinkedList, but the returned node is a single
+# view (Node with only `item` set) reused by every call, so no wrapper is
+# allocated per operation: read `item` before the next call and never follow
+# links through it; extend returns the appended tasks instead of nodes
+class ArrayDoublyLinkedList:
+    def __init__(self, capacity: int = 16):
+        self.items = [None] * capacity
+        self.prev_items = array("q", [EMPTY]) * capacity
+        self.next_items = array("q", range(1, capacity + 1))
+        if capacity > 0:
+            self.next_items[-1] = EMPTY
+        self.free_slot = 0 if capacity > 0 else EMPTY
+
+        self.start_slot = EMPTY
+        self.end_slot = EMPTY
+        self.slots = dict()  # task id -> slot
+        self.view = Node(None)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __iter__(self):
+        # tasks from the start to the end; TC: O(N); SC: O(1)
+        slot = self.start_slot
+        while slot != EMPTY:
+            yield self.items[slot]
+            slot = self.next_items[slot]
+
+    def is_empty(self):
+        # TC: O(1); SC: O(1)
+        return self.start_slot == EMPTY and len(self.slots) == 0
+
+    def _grow(self) -> None:
+        # double the capacity; TC: O(N) amortized to O(1) per insert
+        capacity = len(self.items)
+        new_capacity = max(2 * capacity, 16)
+
+        self.items.extend([None] * (new_capacity - capacity))
+        self.prev_items.extend(array("q", [EMPTY]) * (new_capacity - capacity))
+        self.next_items.extend(range(capacity + 1, new_capacity + 1))
+        self.next_items[-1] = EMPTY
+        self.free_slot = capacity
+
+    def _allocate(self, data: Task) -> int:
+        # TC: O(1) amortized; SC: O(1)
+        if self.free_slot == EMPTY:
+            self._grow()
+
+        slot = self.free_slot
+        self.free_slot = self.next_items[slot]
+
+        self.items[slot] = data
+        self.slots[data.id] = slot
+        return slot
+
+    def _view(self, data: Task) -> Node:
+        # point the shared view at data; TC: O(1); SC: O(1)
+        self.view.item = data
+        return self.view
+
+    def _release(self, slot: int) -> Node:
+        # TC: O(1); SC: O(1)
+        data = self.items[slot]
+        self.items[slot] = None
+        self.slots.pop(data.id)
+
+        self.prev_items[slot] = EMPTY
+        self.next_items[slot] = self.free_slot
+        self.free_slot = slot
+
+        return self._view(data)
+
+    def _link_after(self, slot: int, prev_slot: int) -> None:
+        # link slot after prev_slot (at the start if prev_slot is EMPTY)
+        next_slot = (
+            self.start_slot if prev_slot == EMPTY else self.next_items[prev_slot]
+        )
+
+        self.prev_items[slot] = prev_slot
+        self.next_items[slot] = next_slot
+
+        if prev_slot == EMPTY:
+            self.start_slot = slot
+        else:
+            self.next_items[prev_slot] = slot
+
+        if next_slot == EMPTY:
+            self.end_slot = slot
+        else:
+            self.prev_items[next_slot] = slot
+
+    def _unlink(self, slot: int) -> Node:
+        prev_slot, next_slot = self.prev_items[slot], self.next_items[slot]
+
+        if prev_slot == EMPTY:
+            self.start_slot = next_slot
+        else:
+            self.next_items[prev_slot] = next_slot
+
+        if next_slot == EMPTY:
+            self.end_slot = prev_slot
+        else:
+            self.prev_items[next_slot] = prev_slot
+
+        return self._release(slot)
+
+    def _slot_at_index(self, index: int) -> int:
+        # TC: O(N); SC: O(1)
+        slot = self.start_slot
+        for _ in range(index):
+            slot = self.next_items[slot]
+        return slot
+
+    def _check_duplicate(self, data: Task) -> None:
+        if data.id in self.slots:
+            raise ValueError("duplicate id in tasks")
+
+    def get_node_by_id(self, id: int) -> Node:
+        # TC: O(1); SC: O(1)
+        return self.get(id)
+
+    def get(self, id: int) -> Node:
+        slot = self.slots.get(id)
+        if slot is None:
+            return None
+        return self._view(self.items[slot])
+
+    def index_of(self, id: int) -> int:
+        # position of the task id; TC: O(N); SC: O(1)
+        slot = self.slots.get(id)
+        if slot is None:
+            raise ValueError(f"id {id} not found in tasks")
+
+        index = 0
+        while self.prev_items[slot] != EMPTY:
+            index += 1
+            slot = self.prev_items[slot]
+
+        return index
+
+    def append(self, data: Task) -> Node:
+        # TC: O(1) amortized; SC: O(1)
+        self._check_duplicate(data)
+        slot = self._allocate(data)
+        self._link_after(slot, self.end_slot)
+        return self._view(data)
+
+    def append_right(self, data: Task) -> Node:
+        return self.append(data)
+
+    def append_left(self, data: Task) -> Node:
+        # TC: O(1) amortized; SC: O(1)
+        self._check_duplicate(data)
+        slot = self._allocate(data)
+        self._link_after(slot, EMPTY)
+        return self._view(data)
+
+    def insert_before(self, other_id: int, data: Task) -> Node:
+        # insert right before the task other_id; TC: O(1) amortized; SC: O(1)
+        other_slot = self.slots.get(other_id)
+        if other_slot is None:
+            raise ValueError(f"id {other_id} not found in tasks")
+
+        self._check_duplicate(data)
+        self._link_after(self._allocate(data), self.prev_items[other_slot])
+        return self._view(data)
+
+    def insert_after(self, other_id: int, data: Task) -> Node:
+        # insert right after the task other_id; TC: O(1) amortized; SC: O(1)
+        other_slot = self.slots.get(other_id)
+        if other_slot is None:
+            raise ValueError(f"id {other_id} not found in tasks")
+
+        self._check_duplicate(data)
+        self._link_after(self._allocate(data), other_slot)
+        return self._view(data)
+
+    def extend(self, data: list[Task]) -> list[Task]:
+        # append many tasks at once; either all tasks are appended or none
+        # TC: O(K); SC: O(K)
+        new_ids = set()
+        for task in data:
+            if task.id in self.slots or task.id in new_ids:
+                raise ValueError("duplicate id in tasks")
+            new_ids.add(task.id)
+
+        for task in data:
+            self._link_after(self._allocate(task), self.end_slot)
+
+        return data
+
+    def pop_right(self) -> Node:
+        # TC: O(1); SC: O(1)
+        if self.is_empty():
+            return None
+        return self._unlink(self.end_slot)
+
+    def pop_left(self) -> Node:
+        # TC: O(1); SC: O(1)
+        if self.is_empty():
+            return None
+        return self._unlink(self.start_slot)
+
+    def pop(self, id: int) -> Node:
+        # pop by id from anywhere; TC: O(1); SC: O(1)
+        slot = self.slots.get(id)
+        if slot is None:
+            raise ValueError(f"id {id} not found in tasks")
+        return self._unlink(slot)
+
+    def insert_at_index(self, index: int, data: Task) -> Node:
+        # same semantics as DoublyLinkedList.insert_at_index; TC: O(N); SC: O(1)
+        if index < 0:
+            raise ValueError("negative index does not exist in a list")
+
+        if self.is_empty():
+            raise ValueError(f"index {index} not found in empty list")
+
+        self._check_duplicate(data)
+
+        if index >= len(self.slots):
+            raise ValueError(
+                f"index {index} not found in list, list length: {len(self.slots)}"
+            )
+
+        if index == 0:
+            return self.append_left(data)
+
+        prev_slot = self._slot_at_index(index)
+        self._link_after(self._allocate(data), prev_slot)
+        return self._view(data)
+
+    def pop_at_index(self, index: int) -> Node:
+        # pop at any index; TC: O(N); SC: O(1)
+        if index < 0:
+            raise ValueError("negative index does not exist in a list")
+
+        if self.is_empty():
+            raise ValueError(f"index {index} not found in empty list")
+
+        if index >= len(self.slots):
+            raise ValueError(
+                f"index {index} not found in list, list length: {len(self.slots)}"
+            )
+
+        return self._unlink(self._slot_at_index(index))
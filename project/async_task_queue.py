@@ -0,0 +1,117 @@
+import asyncio
+
+from .resources import Resources
+from .task import Task
+from .task_queue import TaskQueue
+
+
+# asyncio-native task queue on top of TaskQueue
+#
+# waiting consumers are futures; a newly added task is handed over to the first
+# waiter (FIFO) whose resources fit it, so a consumer is resumed only with a
+# task it can run. all queue operations run on the event loop thread, so no
+# locking is needed; bulk operations are split into chunks and give control
+# back to the loop between them
+class AsyncTaskQueue:
+    def __init__(self, id: int, name: str, chunk_size: int = 1024, **kwargs):
+        self.queue = TaskQueue(id, name, **kwargs)
+        self.chunk_size = chunk_size
+        self.waiters = []  # (available_resources, future)
+
+    def __len__(self):
+        return len(self.queue)
+
+    def _hand_over(self, task: Task) -> bool:
+        # TC: O(W) with W waiters
+        for waiter in self.waiters:
+            available_resources, future = waiter
+            if future.done():
+                continue
+
+            if self.queue.is_valid_with_resources(task, available_resources):
+                self.queue.pop(task.id)
+                self.waiters.remove(waiter)
+                future.set_result(task)
+                return True
+
+        return False
+
+    async def add_task(self, task: Task) -> None:
+        self.queue.add_task(task)
+        if self.waiters:
+            self._hand_over(task)
+
+    async def add_tasks(self, tasks) -> None:
+        # every chunk is added atomically; the loop may run between chunks
+        tasks = list(tasks)
+        for start in range(0, len(tasks), self.chunk_size):
+            chunk = tasks[start : start + self.chunk_size]
+            self.queue.add_tasks(chunk)
+            for task in chunk:
+                if not self.waiters:
+                    break
+                self._hand_over(task)
+
+            await asyncio.sleep(0)
+
+    def get_task_nowait(self, available_resources: Resources) -> Task | None:
+        return self.queue.get_task(available_resources)
+
+    def cancel(self, id: int) -> Task | None:
+        # remove a queued task; None if it is not queued (anymore)
+        if self.queue.get_node_by_id(id) is None:
+            return None
+        return self.queue.pop(id).item
+
+    async def get_task(
+        self, available_resources: Resources, timeout: float | None = None
+    ) -> Task | None:
+        # wait up to timeout seconds (forever if None) for a fitting task
+        task = self.queue.get_task(available_resources)
+        if task is not None:
+            return task
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (available_resources, future)
+        self.waiters.append(waiter)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            # since Python 3.12 the wait may time out in the loop iteration the
+            # task was handed over in; the task is returned, not lost
+            if future.done() and not future.cancelled():
+                return future.result()
+            return None
+        except asyncio.CancelledError:
+            # the task may have been handed over right before the cancellation;
+            # give it back to the head of its subqueue instead of losing it
+            if future.done() and not future.cancelled():
+                self.queue.append_left(future.result())
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+    async def get_tasks(
+        self, available_resources: Resources, max_tasks: int
+    ) -> tuple[list[Task], Resources]:
+        # same as TaskQueue.get_tasks, but yields to the loop between priorities
+        self.queue.promote_due()
+        self.queue.expire_leases()
+        self.queue.age()
+
+        tasks = []
+        for priority_int in list(self.queue.nonempty_priorities()):
+            subq_tasks, available_resources = self.queue.get_tasks_from_subq(
+                priority_int, available_resources, max_tasks - len(tasks)
+            )
+            tasks.extend(subq_tasks)
+            await asyncio.sleep(0)
+
+        return tasks, available_resources
+
+    async def stream(self, available_resources: Resources):
+        # async iterator over fitting tasks: `async for task in q.stream(res)`
+        while True:
+            yield await self.get_task(available_resources)
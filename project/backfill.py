@@ -0,0 +1,110 @@
+import time
+from typing import Callable
+
+from .resources import Resources, add, fits, subtract
+from .task import Task
+from .task_queue import TaskQueue
+
+
+# EASY backfill dispatching from a TaskQueue onto a fixed capacity
+#
+# the head task (the first one of the highest non-empty priority) is
+# dispatched as soon as it fits. while it does not, it gets a reservation: the
+# shadow time is when enough running tasks will have finished, by their
+# expected runtimes, for the head to fit, and the extra resources are what will
+# be left over at that time besides the head. a later task is started only if
+# it fits now and either ends by the shadow time or fits into the extra
+# resources, so backfilling never delays the head. a head larger than the whole
+# capacity gets no reservation and other tasks are dispatched first-fit.
+#
+# runtime(task) is the expected runtime of a task, e.g. a user estimate; with
+# estimates that are too low the head may still be delayed, as in EASY. at
+# most `depth` fitting tasks are considered for backfill per get_task
+class BackfillScheduler:
+    def __init__(
+        self,
+        queue: TaskQueue,
+        capacity: Resources,
+        runtime: Callable[[Task], float],
+        depth: int = 64,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.queue = queue
+        self.capacity = capacity
+        self.runtime = runtime
+        self.depth = depth
+        self.clock = clock
+
+        self.in_use = Resources(0, 0, 0)
+        self.running = dict()  # task id -> (expected end, resources)
+        self.backfilled = 0
+
+    def __len__(self):
+        return len(self.running)
+
+    def free(self) -> Resources:
+        return subtract(self.capacity, self.in_use)
+
+    def head(self) -> Task | None:
+        # TC: O(1)
+        for priority in self.queue.nonempty_priorities():
+            id = self.queue.subqueue(priority).index.first()
+            return self.queue.get_node_by_id(id).item
+        return None
+
+    def reservation(self, head: Task, now: float) -> tuple[float, Resources] | None:
+        # shadow time and extra resources of the head; None if it never fits
+        # TC: O(R log R) with R running tasks
+        if not fits(head.resources, self.capacity):
+            return None
+
+        available = self.free()
+        for end, resources in sorted(self.running.values()):
+            available = add(available, resources)
+            if fits(head.resources, available):
+                return max(end, now), subtract(available, head.resources)
+
+        return None
+
+    def _start(self, task: Task, now: float) -> Task:
+        self.queue.pop(task.id)
+        self.in_use = add(self.in_use, task.resources)
+        self.running[task.id] = (now + self.runtime(task), task.resources)
+        return task
+
+    def get_task(self) -> Task | None:
+        # start the next task; TC: O(R log R + depth * (N / B + B))
+        self.queue.promote_due()
+        self.queue.age()
+        now = self.clock()
+        free = self.free()
+
+        head = self.head()
+        if head is None:
+            return None
+        if fits(head.resources, free):
+            return self._start(head, now)
+
+        reservation = self.reservation(head, now)
+        considered = 0
+        for priority in self.queue.nonempty_priorities():
+            for id in self.queue.subqueue(priority).index.fitting(free):
+                task = self.queue.get_node_by_id(id).item
+                if (
+                    reservation is None
+                    or now + self.runtime(task) <= reservation[0]
+                    or fits(task.resources, reservation[1])
+                ):
+                    self.backfilled += reservation is not None
+                    return self._start(task, now)
+
+                considered += 1
+                if considered >= self.depth:
+                    return None
+
+        return None
+
+    def finish(self, id: int) -> None:
+        # release the resources of a task that has ended
+        _, resources = self.running.pop(id)
+        self.in_use = subtract(self.in_use, resources)
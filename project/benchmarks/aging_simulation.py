@@ -0,0 +1,110 @@
+# wait times by priority with and without aging, in a simulated cluster
+#
+# tasks arrive as a Poisson stream with priorities 1 to 5 and run for an
+# exponential time on a cluster of `--cores` cores; higher priorities alone
+# fill the cluster and more, so lower ones starve under strict priority. the
+# simulation runs on a virtual clock, which the aging policy reads too
+#
+# usage:
+#   python -m project.benchmarks.aging_simulation --tasks 50000 --intervals 10 50
+import argparse
+import heapq
+import random
+import statistics
+import time
+
+from project.aging import AgingPolicy
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+
+# share of arrivals per priority
+MIX = [0.4, 0.3, 0.2, 0.07, 0.03]
+
+
+def simulate(ntasks: int, cores: int, load: float, interval: float | None):
+    rng = random.Random(0)
+    now = 0.0
+
+    tq = TaskQueue(1, "sim")
+    aging = None
+    if interval is not None:
+        aging = AgingPolicy(tq, interval, clock=lambda: now)
+
+    # unit mean runtime, one core per task; offered load relative to cores
+    rate = load * cores
+    arrivals, at = [], 0.0
+    for ii in range(ntasks):
+        at += rng.expovariate(rate)
+        priority = rng.choices(range(1, 6), MIX)[0]
+        arrivals.append((at, Task(ii, priority, Resources(1, 1, 0), "", None)))
+
+    enqueued = dict()  # id -> (arrival time, original priority)
+    waits = {priority: [] for priority in range(1, 6)}
+    running = []  # (end time, task)
+    free = cores
+    next_arrival = 0
+    started = time.perf_counter()
+
+    while next_arrival < len(arrivals) or running:
+        if running and (
+            next_arrival == len(arrivals) or running[0][0] <= arrivals[next_arrival][0]
+        ):
+            now, _ = heapq.heappop(running)
+            free += 1
+        else:
+            now, task = arrivals[next_arrival]
+            next_arrival += 1
+            enqueued[task.id] = (now, task.priority)
+            tq.add_task(task)
+
+        while free:
+            task = tq.get_task(Resources(free, free, 0))
+            if task is None:
+                break
+
+            arrived, priority = enqueued.pop(task.id)
+            waits[priority].append(now - arrived)
+            heapq.heappush(running, (now + rng.expovariate(1.0), task.id))
+            free -= 1
+
+        if next_arrival == len(arrivals) and not running:
+            break
+
+    elapsed = time.perf_counter() - started
+    return waits, elapsed, aging.promoted if aging else 0
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    return statistics.quantiles(values, n=1000, method="inclusive")[int(q * 10) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="wait times by priority with and without aging"
+    )
+    parser.add_argument("--tasks", type=int, default=50_000)
+    parser.add_argument("--cores", type=int, default=32)
+    parser.add_argument("--load", type=float, default=1.02)
+    parser.add_argument("--intervals", type=float, nargs="+", default=[10, 50])
+    args = parser.parse_args()
+
+    print(
+        f"{'aging':>8} {'priority':>8} {'p50':>8} {'p99':>8} {'max':>8} "
+        f"{'promoted':>8} {'sim s':>6}"
+    )
+    for interval in [None, *args.intervals]:
+        waits, elapsed, promoted = simulate(args.tasks, args.cores, args.load, interval)
+        label = "off" if interval is None else f"{interval:g}"
+        for priority, values in waits.items():
+            print(
+                f"{label:>8} {priority:>8} {percentile(values, 50):>8.1f} "
+                f"{percentile(values, 99):>8.1f} {max(values):>8.1f} "
+                f"{promoted:>8} {elapsed:>6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# trace-driven simulation of EASY backfill against first-fit dispatching
+#
+# a trace is replayed on a cluster of `--cores` cores on a virtual clock, once
+# with TaskQueue.get_task (strict priority, first-fit) and once with
+# BackfillScheduler; both report utilization, makespan and wait times, also
+# of wide tasks (more than half of the cluster). the trace is a csv file with
+# the columns arrival,priority,cpu_cores,runtime,estimate (ram = cpu_cores),
+# or a synthetic one: mostly narrow short tasks and a few wide long ones,
+# estimates are 1 to 3 times the runtime
+#
+# usage:
+#   python -m project.benchmarks.backfill_simulation --tasks 20000 --cores 64
+#   python -m project.benchmarks.backfill_simulation --trace trace.csv
+import argparse
+import csv
+import heapq
+import random
+import statistics
+
+from project.backfill import BackfillScheduler
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+
+
+def synthetic_trace(ntasks: int, cores: int, load: float, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(ntasks):
+        if rng.random() < 0.05:
+            cpu_cores, runtime = (
+                rng.randint(cores // 2 + 1, cores),
+                rng.expovariate(0.2),
+            )
+        else:
+            cpu_cores, runtime = rng.randint(1, 4), rng.expovariate(1.0)
+        rows.append([rng.randint(1, 3), cpu_cores, runtime])
+
+    # arrivals spread so that the offered core-seconds match the load
+    work = sum(cpu_cores * runtime for _, cpu_cores, runtime in rows)
+    rate = len(rows) * cores * load / work
+
+    trace, at = [], 0.0
+    for priority, cpu_cores, runtime in rows:
+        at += rng.expovariate(rate)
+        estimate = runtime * rng.uniform(1, 3)
+        trace.append((at, priority, cpu_cores, runtime, estimate))
+    return trace
+
+
+def read_trace(path: str) -> list:
+    with open(path, newline="") as file:
+        return [
+            (
+                float(row["arrival"]),
+                int(row["priority"]),
+                int(row["cpu_cores"]),
+                float(row["runtime"]),
+                float(row["estimate"]),
+            )
+            for row in csv.DictReader(file)
+        ]
+
+
+def simulate(trace: list, cores: int, backfill: bool) -> dict:
+    now = 0.0
+    capacity = Resources(cores, cores, 0)
+    tq = TaskQueue(1, "sim")
+    # content holds the (runtime, estimate) of a task
+    scheduler = BackfillScheduler(
+        tq, capacity, runtime=lambda task: task.content[1], clock=lambda: now
+    )
+    free = cores
+
+    arrivals = {}
+    waits, wide_waits = [], []
+    running = []  # (end time, task id)
+    busy = 0.0
+    next_arrival = 0
+
+    while next_arrival < len(trace) or running:
+        if running and (
+            next_arrival == len(trace) or running[0][0] <= trace[next_arrival][0]
+        ):
+            now, id = heapq.heappop(running)
+            if backfill:
+                scheduler.finish(id)
+            else:
+                free += arrivals.pop(id)
+        else:
+            at, priority, cpu_cores, runtime, estimate = trace[next_arrival]
+            now = at
+            resources = Resources(cpu_cores, cpu_cores, 0)
+            tq.add_task(
+                Task(next_arrival, priority, resources, (runtime, estimate), None)
+            )
+            arrivals[next_arrival] = at
+            next_arrival += 1
+
+        while True:
+            if backfill:
+                task = scheduler.get_task()
+            else:
+                task = tq.get_task(Resources(free, free, 0))
+            if task is None:
+                break
+
+            wait = now - arrivals.pop(task.id)
+            waits.append(wait)
+            if task.resources.cpu_cores > cores // 2:
+                wide_waits.append(wait)
+
+            runtime = task.content[0]
+            busy += task.resources.cpu_cores * runtime
+            heapq.heappush(running, (now + runtime, task.id))
+            if not backfill:
+                free -= task.resources.cpu_cores
+                arrivals[task.id] = task.resources.cpu_cores
+
+    return {
+        "utilization": busy / (cores * now),
+        "makespan": now,
+        "wait": statistics.fmean(waits),
+        "p99": statistics.quantiles(waits, n=100)[98],
+        "wide": statistics.fmean(wide_waits) if wide_waits else 0.0,
+        "wide max": max(wide_waits, default=0.0),
+        "backfilled": scheduler.backfilled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="EASY backfill against first-fit on a task trace"
+    )
+    parser.add_argument("--trace", default=None, help="csv trace path")
+    parser.add_argument("--tasks", type=int, default=20_000)
+    parser.add_argument("--cores", type=int, default=64)
+    parser.add_argument("--load", type=float, default=0.9)
+    args = parser.parse_args()
+
+    if args.trace is not None:
+        trace = read_trace(args.trace)
+    else:
+        trace = synthetic_trace(args.tasks, args.cores, args.load)
+
+    print(
+        f"{'policy':>9} {'util':>6} {'makespan':>9} {'wait':>7} {'p99':>7} "
+        f"{'wide':>7} {'wide max':>8} {'backfilled':>10}"
+    )
+    for backfill in (False, True):
+        stats = simulate(trace, args.cores, backfill)
+        policy = "backfill" if backfill else "first-fit"
+        print(
+            f"{policy:>9} {stats['utilization']:>6.1%} {stats['makespan']:>9.0f} "
+            f"{stats['wait']:>7.1f} {stats['p99']:>7.1f} {stats['wide']:>7.1f} "
+            f"{stats['wide max']:>8.1f} {stats['backfilled']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# large task payloads inline against handles into a BlobStore
+#
+# queues `--tasks` tasks with payloads of `--size-mb` MB, once as bytes held by
+# the tasks and once as BlobHandles of a BlobStore, then prints the Python heap
+# allocated by the queue and its payloads, the time to encode every task (what
+# the write-ahead log and the server do), the time and size of a snapshot and
+# the time to read every payload in full (zero-copy views for handles)
+#
+# usage:
+#   python -m project.benchmarks.blob_payloads --tasks 200 --size-mb 4
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from project.blob_store import BlobStore
+from project.codec import encode_task
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+
+
+def run(args, dir: str, store: BlobStore | None) -> dict:
+    payload = os.urandom(args.size_mb << 20)
+
+    tracemalloc.start()
+    tq = TaskQueue(1, "bench")
+    for ii in range(args.tasks):
+        # a fresh copy per task, as if every payload came from a producer
+        content = bytes(memoryview(payload)) if store is None else store.put(payload)
+        tq.add_task(Task(ii, 1, Resources(1, 1, 0), content, None))
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    size = sum(len(encode_task(task)) for task in tq.tasks)
+    encode = time.perf_counter() - start
+
+    path = os.path.join(dir, "queue.snapshot")
+    start = time.perf_counter()
+    tq.snapshot(path)
+    snapshot = time.perf_counter() - start
+    snapshot_size = os.path.getsize(path)
+
+    start = time.perf_counter()
+    checksum = 0
+    while (task := tq.get_task(Resources(1, 1, 0))) is not None:
+        content = task.content if store is None else store.view(task.content)
+        checksum ^= content[-1]
+    read = time.perf_counter() - start
+
+    return dict(
+        heap=heap / 2**20,
+        encode=encode,
+        encoded=size / 2**20,
+        snapshot=snapshot,
+        snapshot_size=snapshot_size / 2**20,
+        read=read,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="inline payloads or blob handles")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--size-mb", type=int, default=4)
+    args = parser.parse_args()
+
+    print(
+        f"{'payloads':<10} {'heap MB':>8} {'encode s':>9} {'encoded MB':>11}"
+        f" {'snapshot s':>11} {'snapshot MB':>12} {'read s':>8}"
+    )
+    with tempfile.TemporaryDirectory() as dir:
+        inline = run(args, dir, None)
+        with BlobStore(os.path.join(dir, "blobs")) as store:
+            handles = run(args, dir, store)
+
+        for name, stats in (("inline", inline), ("handles", handles)):
+            print(
+                f"{name:<10} {stats['heap']:8.1f} {stats['encode']:9.4f}"
+                f" {stats['encoded']:11.1f} {stats['snapshot']:11.4f}"
+                f" {stats['snapshot_size']:12.2f} {stats['read']:8.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# compare TaskQueue.add_tasks against a loop of TaskQueue.add_task
+#
+# usage:
+#   python -m project.benchmarks.bulk_enqueue --ntasks 100000 --repeat 5
+import argparse
+import time
+
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+
+
+def make_tasks(ntasks: int) -> list[Task]:
+    return [
+        Task(ii, ii % 5 + 1, Resources(ii % 64, ii % 32, ii % 8), "content", None)
+        for ii in range(ntasks)
+    ]
+
+
+def add_task_loop(tasks: list[Task]) -> float:
+    tq = TaskQueue(1, "bench")
+    start = time.perf_counter()
+    for task in tasks:
+        tq.add_task(task)
+    return time.perf_counter() - start
+
+
+def add_tasks_bulk(tasks: list[Task]) -> float:
+    tq = TaskQueue(1, "bench")
+    start = time.perf_counter()
+    tq.add_tasks(tasks)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="compare TaskQueue.add_tasks against a loop of add_task"
+    )
+    parser.add_argument("--ntasks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.ntasks)
+
+    loop_time = min(add_task_loop(tasks) for _ in range(args.repeat))
+    bulk_time = min(add_tasks_bulk(tasks) for _ in range(args.repeat))
+
+    print(f"tasks: {args.ntasks}, best of {args.repeat}")
+    print(f"add_task loop: {loop_time:.4f}s ({args.ntasks / loop_time:,.0f} tasks/s)")
+    print(f"add_tasks:     {bulk_time:.4f}s ({args.ntasks / bulk_time:,.0f} tasks/s)")
+    print(f"speedup:       {loop_time / bulk_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
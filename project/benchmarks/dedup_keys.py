@@ -0,0 +1,110 @@
+# cost and memory of deduplication keys on a high-cardinality stream
+#
+# `--adds` adds arrive at one per virtual millisecond; a share `--duplicates`
+# of them retries one of the last `--recent` keys, the rest carry new keys. the
+# dedup window spans `--window` adds. runs without dedup keys, with an index of
+# the whole window and with an index of `--max-keys` keys plus a Bloom filter
+# of the keys evicted from it, whose maybes are rejected; prints the time per
+# add, the memory allocated by dedup.py and the adds that were wrongly kept or
+# dropped
+#
+# usage:
+#   python -m project.benchmarks.dedup_keys --adds 1000000 --window 500000
+import argparse
+import random
+import time
+import tracemalloc
+
+from project.dedup import Deduplicator
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+
+
+def run(args, keys: list[str], max_keys: int | None, bloom: bool, trace: bool):
+    # time per add, or memory allocated by dedup.py if trace is True
+    now = 0.0
+    tq = TaskQueue(1, "bench")
+    tq.clock = lambda: now
+    if max_keys is not None:
+        Deduplicator(
+            tq,
+            window=args.window / 1000,
+            max_keys=max_keys,
+            bloom_keys=args.window if bloom else 0,
+            reject_maybe=True,
+            clock=tq.clock,
+        )
+
+    if trace:
+        tracemalloc.start()
+    added = []
+    start = time.perf_counter()
+    for ii, key in enumerate(keys):
+        now = ii / 1000
+        task = Task(ii, 1, Resources(1, 1, 0), "", None)
+        if max_keys is None:
+            tq.add_task(task)
+        else:
+            added.append(tq.add_task(task, dedup_key=key) is task)
+    elapsed = time.perf_counter() - start
+
+    if not trace:
+        return elapsed / len(keys), added
+
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = snapshot.filter_traces([tracemalloc.Filter(True, "*dedup.py")])
+    return sum(stat.size for stat in stats.statistics("filename"))
+
+
+def errors(args, keys: list[str], added: list[bool]) -> tuple[int, int]:
+    # duplicates that were added and new keys that were dropped
+    first = dict()  # key -> when it was first added
+    kept = dropped = 0
+    for ii, (key, was_added) in enumerate(zip(keys, added)):
+        duplicate = key in first and ii - first[key] < args.window
+        if was_added:
+            first[key] = ii
+            kept += duplicate
+        else:
+            dropped += not duplicate
+    return kept, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cost of deduplication keys")
+    parser.add_argument("--adds", type=int, default=1_000_000)
+    parser.add_argument("--window", type=int, default=500_000)
+    parser.add_argument("--duplicates", type=float, default=0.1)
+    parser.add_argument("--recent", type=int, default=100_000)
+    parser.add_argument("--max-keys", type=int, default=50_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    keys = []
+    for ii in range(args.adds):
+        if keys and rng.random() < args.duplicates:
+            keys.append(keys[-rng.randint(1, min(args.recent, len(keys)))])
+        else:
+            keys.append(f"job-{ii}")
+
+    print(
+        f"{'setup':<24} {'us/add':>8} {'memory MB':>10} {'kept dup':>9} {'dropped':>8}"
+    )
+    for name, max_keys, bloom in (
+        ("no dedup keys", None, False),
+        ("index of the window", args.window, False),
+        (f"index {args.max_keys} + bloom", args.max_keys, True),
+    ):
+        per_add, added = run(args, keys, max_keys, bloom, trace=False)
+        kept, dropped = errors(args, keys, added) if added else (0, 0)
+        memory = run(args, keys, max_keys, bloom, trace=True)
+        print(
+            f"{name:<24} {per_add * 1e6:8.2f} {memory / 2**20:10.1f}"
+            f" {kept:9d} {dropped:8d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# cost of delayed tasks with a million of them pending
+#
+# delays `--delayed` tasks with distinct due times next to `--tasks` eligible
+# ones, then measures get_task against the same queue without delayed tasks,
+# the promotion of `--due` tasks at once and cancel of delayed tasks. the queue
+# clock is virtual
+#
+# usage:
+#   python -m project.benchmarks.delayed_tasks --delayed 1000000 --due 10000
+import argparse
+import time
+
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+
+
+def make_queue(ntasks: int) -> TaskQueue:
+    tq = TaskQueue(1, "bench")
+    tq.add_tasks(
+        Task(ii, ii % 5 + 1, Resources(ii % 64, ii % 32, ii % 8), "", None)
+        for ii in range(ntasks)
+    )
+    return tq
+
+
+def time_gets(tq: TaskQueue, ngets: int) -> float:
+    resources = Resources(64, 32, 8)
+    start = time.perf_counter()
+    for _ in range(ngets):
+        tq.get_task(resources)
+    return (time.perf_counter() - start) / ngets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cost of many delayed tasks")
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--delayed", type=int, default=1_000_000)
+    parser.add_argument("--due", type=int, default=10_000)
+    parser.add_argument("--gets", type=int, default=20_000)
+    args = parser.parse_args()
+
+    now = 0.0
+    tq = make_queue(args.tasks)
+    tq.clock = lambda: now
+
+    start = time.perf_counter()
+    for ii in range(args.delayed):
+        id = args.tasks + ii
+        task = Task(id, ii % 5 + 1, Resources(ii % 64, ii % 32, ii % 8), "", None)
+        tq.add_task(task, not_before=1 + ii)
+    elapsed = time.perf_counter() - start
+    print(f"delay:            {elapsed / args.delayed * 1e6:8.2f} us per task")
+
+    baseline = make_queue(args.tasks)
+    print(f"get, no delayed:  {time_gets(baseline, args.gets) * 1e6:8.2f} us")
+    print(f"get, delayed:     {time_gets(tq, args.gets) * 1e6:8.2f} us")
+
+    now = args.due + 0.5
+    start = time.perf_counter()
+    promoted = tq.promote_due()
+    elapsed = time.perf_counter() - start
+    print(f"promotion:        {elapsed / promoted * 1e6:8.2f} us per task ({promoted})")
+
+    ids = range(args.tasks + args.due, args.tasks + args.delayed)
+    start = time.perf_counter()
+    for id in ids:
+        tq.cancel_delayed(id)
+    elapsed = time.perf_counter() - start
+    print(f"cancel:           {elapsed / len(ids) * 1e6:8.2f} us per task")
+
+
+if __name__ == "__main__":
+    main()
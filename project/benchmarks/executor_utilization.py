@@ -0,0 +1,114 @@
+# makespan and budget utilization of LocalExecutor against a polling runner
+#
+# tasks sleep for a random time and ask for random cpu_cores and ram; both
+# runners use a process pool of the same size. the polling runner checks the
+# queue with the free resources every `--poll` seconds, as a runner glued on a
+# non-blocking get_task would
+#
+# usage:
+#   python -m project.benchmarks.executor_utilization --tasks 400 --cores 8
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from project.concurrent_task_queue import ConcurrentTaskQueue
+from project.executor import LocalExecutor
+from project.resources import Resources, add, subtract
+from project.task import Task
+
+
+def work(content: str) -> str:
+    time.sleep(float(content))
+    return content
+
+
+def make_tasks(ntasks: int, cores: int, seed: int = 0) -> list[Task]:
+    rng = random.Random(seed)
+    return [
+        Task(
+            ii,
+            rng.randint(1, 5),
+            Resources(rng.randint(1, cores), rng.randint(1, cores // 2), 0),
+            str(rng.uniform(0.005, 0.05)),
+            None,
+        )
+        for ii in range(ntasks)
+    ]
+
+
+def run_executor(tasks: list[Task], budget: Resources) -> tuple[float, tuple]:
+    tq = ConcurrentTaskQueue(1, "bench")
+    with LocalExecutor(tq, budget, work) as executor:
+        start = time.monotonic()
+        tq.add_tasks(tasks)
+        executor.wait_idle()
+        elapsed = time.monotonic() - start
+        utilization = executor.utilization(since=start)
+
+    return elapsed, utilization
+
+
+def run_polling(tasks: list[Task], budget: Resources, poll: float) -> tuple:
+    tq = ConcurrentTaskQueue(1, "bench")
+    in_use = Resources(0, 0, 0)
+    running = dict()  # future -> task
+    busy = 0.0  # cpu_cores * seconds in use
+
+    with ProcessPoolExecutor(budget.cpu_cores) as pool:
+        start = last = time.monotonic()
+        tq.add_tasks(tasks)
+
+        while len(tq) or running:
+            done = [future for future in running if future.done()]
+            for future in done:
+                task = running.pop(future)
+                task.result = future.result()
+                in_use = subtract(in_use, task.resources)
+
+            while len(running) < budget.cpu_cores:
+                task = tq.get_task(subtract(budget, in_use), block=False)
+                if task is None:
+                    break
+                in_use = add(in_use, task.resources)
+                running[pool.submit(work, task.content)] = task
+
+            time.sleep(poll)
+            now = time.monotonic()
+            busy += in_use.cpu_cores * (now - last)
+            last = now
+
+        wait(running)
+        elapsed = time.monotonic() - start
+
+    return elapsed, busy / (budget.cpu_cores * elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="makespan and utilization of LocalExecutor vs polling"
+    )
+    parser.add_argument("--tasks", type=int, default=400)
+    parser.add_argument("--cores", type=int, default=8)
+    parser.add_argument("--poll", type=float, default=0.01)
+    args = parser.parse_args()
+
+    budget = Resources(2 * args.cores, args.cores, 0)
+
+    elapsed, utilization = run_executor(make_tasks(args.tasks, args.cores), budget)
+    print(f"{'runner':>8} {'makespan':>9} {'tasks/s':>8} {'cpu':>6} {'ram':>6}")
+    print(
+        f"{'executor':>8} {elapsed:>8.2f}s {args.tasks / elapsed:>8.0f} "
+        f"{utilization.cpu_cores:>6.0%} {utilization.ram:>6.0%}"
+    )
+
+    tasks = make_tasks(args.tasks, args.cores)
+    elapsed, cpu = run_polling(tasks, budget, args.poll)
+    print(
+        f"{'polling':>8} {elapsed:>8.2f}s {args.tasks / elapsed:>8.0f} "
+        f"{cpu:>6.0%} {'':>6}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# cost of leases with a million of them outstanding
+#
+# leases `--tasks` tasks with distinct deadlines, then measures an expiry
+# check with nothing due (what every get_task pays), the expiry of `--expire`
+# leases at once and ack of the rest. the queue clock is virtual
+#
+# usage:
+#   python -m project.benchmarks.lease_expiry --tasks 1000000 --expire 10000
+import argparse
+import time
+
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cost of many outstanding leases")
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--expire", type=int, default=10_000)
+    args = parser.parse_args()
+
+    now = 0.0
+    tq = TaskQueue(1, "bench")
+    tq.clock = lambda: now
+    tq.add_tasks(
+        Task(ii, ii % 5 + 1, Resources(ii % 64, ii % 32, ii % 8), "", None)
+        for ii in range(args.tasks)
+    )
+    resources = Resources(64, 32, 8)
+
+    start = time.perf_counter()
+    tokens = [tq.lease_task(resources, ttl=1 + ii)[1] for ii in range(args.tasks)]
+    elapsed = time.perf_counter() - start
+    print(f"lease:          {elapsed / args.tasks * 1e6:8.2f} us per task")
+
+    nchecks = 100_000
+    start = time.perf_counter()
+    for _ in range(nchecks):
+        tq.expire_leases()
+    elapsed = time.perf_counter() - start
+    print(f"nothing due:    {elapsed / nchecks * 1e6:8.2f} us per check")
+
+    now = args.expire + 0.5
+    start = time.perf_counter()
+    expired = tq.expire_leases()
+    elapsed = time.perf_counter() - start
+    print(f"expiry:         {elapsed / expired * 1e6:8.2f} us per lease ({expired})")
+
+    start = time.perf_counter()
+    for token in tokens[args.expire :]:
+        tq.ack(token)
+    elapsed = time.perf_counter() - start
+    print(f"ack:            {elapsed / (args.tasks - args.expire) * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# DoublyLinkedList against ArrayDoublyLinkedList at high queue depth:
+# memory of the list, full garbage collection pause and churn throughput
+#
+# usage:
+#   python -m project.benchmarks.list_engines --depth 1000000 --churn 200000
+import argparse
+import gc
+import time
+import tracemalloc
+
+from project.array_linked_list import ArrayDoublyLinkedList
+from project.doubly_linked_list import DoublyLinkedList
+from project.resources import Resources
+from project.task import Task
+
+
+def run(list_cls: type, tasks: list[Task], nchurn: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    dll = list_cls()
+    dll.extend(tasks)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    gc.collect()
+    gc_pause = time.perf_counter() - start
+
+    # pop the oldest task and append a new one, as a steady-state queue does
+    next_id = len(tasks)
+    start = time.perf_counter()
+    for ii in range(nchurn):
+        task = dll.pop_left().item
+        task.id = next_id + ii
+        dll.append(task)
+    churn = nchurn / (time.perf_counter() - start)
+
+    return {"memory": memory / len(tasks), "gc_pause": gc_pause, "churn": churn}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compare doubly linked lists")
+    parser.add_argument("--depth", type=int, default=1_000_000)
+    parser.add_argument("--churn", type=int, default=200_000)
+    args = parser.parse_args()
+
+    tasks = [
+        Task(ii, 1, Resources(1, 1, 0), "content", None) for ii in range(args.depth)
+    ]
+
+    print(f"depth: {args.depth}, churn: {args.churn}")
+    print(f"{'engine':>22} {'bytes/task':>10} {'gc pause':>10} {'churn ops/s':>12}")
+    for list_cls in (DoublyLinkedList, ArrayDoublyLinkedList):
+        result = run(list_cls, tasks, args.churn)
+        print(
+            f"{list_cls.__name__:>22} {result['memory']:>10.1f}"
+            f" {result['gc_pause'] * 1000:>8.1f}ms {result['churn']:>12,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# bytes per queued task: slotted Node/Task/Resources against the previous
+# dict-backed classes, and for the whole TaskQueue
+#
+# usage:
+#   python -m project.benchmarks.memory_per_task --ntasks 1000000
+import argparse
+import gc
+import tracemalloc
+from dataclasses import dataclass
+
+from project.doubly_linked_list import Node
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+
+
+# previous representations, kept here only for the comparison
+class DictNode:
+    def __init__(self, data) -> None:
+        self.next_item, self.prev_item = None, None
+        self.item = data
+
+
+@dataclass
+class DictResources:
+    ram: int
+    cpu_cores: int
+    gpu_count: int
+
+
+@dataclass
+class DictTask:
+    id: int
+    priority: int
+    resources: DictResources
+    content: str
+    result: str
+
+
+def measure(build, ntasks: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    objects = build(ntasks)
+
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+
+    return (after - before) / ntasks
+
+
+def build_objects(node_cls, task_cls, resources_cls):
+    def build(ntasks: int) -> list:
+        return [
+            node_cls(task_cls(ii, 1, resources_cls(ii, ii, ii), "content", None))
+            for ii in range(ntasks)
+        ]
+
+    return build
+
+
+def build_task_queue(ntasks: int) -> TaskQueue:
+    tq = TaskQueue(1, "bench")
+    tq.add_tasks(
+        Task(ii, ii % 5 + 1, Resources(ii, ii, ii), "content", None)
+        for ii in range(ntasks)
+    )
+    return tq
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bytes per queued task")
+    parser.add_argument("--ntasks", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    dict_backed = measure(build_objects(DictNode, DictTask, DictResources), args.ntasks)
+    slotted = measure(build_objects(Node, Task, Resources), args.ntasks)
+    task_queue = measure(build_task_queue, args.ntasks)
+
+    print(f"tasks: {args.ntasks}")
+    print(f"node + task + resources, dict-backed: {dict_backed:7.1f} bytes/task")
+    print(f"node + task + resources, slotted:     {slotted:7.1f} bytes/task")
+    print(f"TaskQueue, all structures:            {task_queue:7.1f} bytes/task")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# insert_at_index / pop_at_index / index_of on long queues:
+# DoublyLinkedList (linear walks) against IndexedDoublyLinkedList (skip list)
+#
+# usage:
+#   python -m project.benchmarks.positional_operations --depth 100000 --ops 1000
+import argparse
+import random
+import time
+
+from project.doubly_linked_list import DoublyLinkedList
+from project.indexed_linked_list import IndexedDoublyLinkedList
+from project.resources import Resources
+from project.task import Task
+
+
+def run(list_cls: type, depth: int, nops: int) -> float:
+    rng = random.Random(0)
+    dll = list_cls()
+    dll.extend([Task(ii, 1, Resources(1, 1, 0), "c", None) for ii in range(depth)])
+
+    start = time.perf_counter()
+    for ii in range(nops):
+        dll.insert_at_index(
+            rng.randrange(len(dll)), Task(depth + ii, 1, None, "c", None)
+        )
+        dll.index_of(depth + ii)
+        dll.pop_at_index(rng.randrange(len(dll)))
+    return (time.perf_counter() - start) / nops
+
+
+def main():
+    parser = argparse.ArgumentParser(description="positional list operations")
+    parser.add_argument("--depth", type=int, default=100_000)
+    parser.add_argument("--ops", type=int, default=1_000)
+    args = parser.parse_args()
+
+    print(f"depth: {args.depth}; one op = insert_at_index + index_of + pop_at_index")
+    for list_cls in (DoublyLinkedList, IndexedDoublyLinkedList):
+        latency = run(list_cls, args.depth, args.ops)
+        print(f"{list_cls.__name__:>24}: {latency * 1e6:10.1f} us/op")
+
+
+if __name__ == "__main__":
+    main()
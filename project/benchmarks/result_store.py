@@ -0,0 +1,94 @@
+# memory and latency of results kept on tasks against a ResultStore
+#
+# `--tasks` finished tasks with results of `--size` bytes: kept on the Task
+# objects (the tasks must stay alive to read them), in a ResultStore without
+# bound and in a ResultStore of `--max-mb` MB that spills to a file. prints the
+# memory still allocated once the tasks are dropped, the time per put and per
+# get of random ids (from memory and from the spill file)
+#
+# usage:
+#   python -m project.benchmarks.result_store --tasks 100000 --size 1024
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from project.resources import Resources
+from project.result_store import ResultStore
+from project.task import Task
+
+
+def run(args, setup: str, path: str, trace: bool):
+    if trace:
+        tracemalloc.start()
+
+    tasks = [Task(ii, 1, Resources(1, 1, 0), "", None) for ii in range(args.tasks)]
+    store = None
+    if setup == "bounded":
+        store = ResultStore(max_bytes=args.max_mb << 20, spill_path=path)
+    elif setup == "store":
+        store = ResultStore(max_bytes=1 << 62)
+
+    start = time.perf_counter()
+    for task in tasks:
+        result = os.urandom(args.size // 2).hex()
+        if store is None:
+            task.result = result
+        else:
+            store.put_result(task.id, result)
+    put = (time.perf_counter() - start) / args.tasks
+
+    if store is not None:
+        tasks = None
+    if trace:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        if store is not None:
+            store.close()
+        return memory
+
+    ids = random.Random(0).choices(range(args.tasks), k=args.gets)
+    start = time.perf_counter()
+    for id in ids:
+        if store is None:
+            tasks[id].result
+        else:
+            store.get_result(id)
+    get = (time.perf_counter() - start) / args.gets
+
+    spilled = 0 if store is None else len(store.spilled)
+    if store is not None:
+        store.close()
+    return put, get, spilled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="results on tasks or in a store")
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--max-mb", type=int, default=16)
+    parser.add_argument("--gets", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, "results.spill")
+        print(
+            f"{'setup':<22} {'memory MB':>10} {'put us':>8} {'get us':>8} {'spilled':>8}"
+        )
+        for setup, name in (
+            ("tasks", "results on tasks"),
+            ("store", "store, no bound"),
+            ("bounded", f"store, {args.max_mb} MB + spill"),
+        ):
+            put, get, spilled = run(args, setup, path, trace=False)
+            memory = run(args, setup, path, trace=True)
+            print(
+                f"{name:<22} {memory / 2**20:10.1f} {put * 1e6:8.2f}"
+                f" {get * 1e6:8.2f} {spilled:8d}"
+            )
+
+
+if __name__ == "__main__":
+    main()
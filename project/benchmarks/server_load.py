@@ -0,0 +1,113 @@
+# load generator for the queue server: ops/s and p50/p99 latency of add_task
+# and get_task with many connections and pipelined requests
+#
+# the server runs in its own process, started by this script on a unix socket
+# (or on localhost TCP with --tcp)
+#
+# usage:
+#   python -m project.benchmarks.server_load --connections 4 --pipeline 16
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from project.client import TaskQueueClient
+from project.resources import Resources
+from project.task import Task
+
+
+def percentile(values: list[float], percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def worker(
+    client: TaskQueueClient, first_id: int, nops: int, latencies: dict
+) -> None:
+    resources = Resources(1, 1, 0)
+    for task_id in range(first_id, first_id + nops):
+        start = time.perf_counter()
+        await client.add_task(
+            Task(task_id, task_id % 5 + 1, resources, "content", None)
+        )
+        added = time.perf_counter()
+        await client.get_task(resources, timeout=0)
+        latencies["add"].append(added - start)
+        latencies["get"].append(time.perf_counter() - added)
+
+
+async def run(args: argparse.Namespace, address: dict) -> None:
+    if "path" in address:
+        clients = [
+            await TaskQueueClient.connect_unix(address["path"])
+            for _ in range(args.connections)
+        ]
+    else:
+        clients = [
+            await TaskQueueClient.connect(address["host"], address["port"])
+            for _ in range(args.connections)
+        ]
+
+    latencies = {"add": [], "get": []}
+    workers = [
+        worker(client, (ii * args.pipeline + jj) * args.ops, args.ops, latencies)
+        for ii, client in enumerate(clients)
+        for jj in range(args.pipeline)
+    ]
+
+    start = time.perf_counter()
+    await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - start
+
+    for client in clients:
+        await client.close()
+
+    nrequests = 2 * len(workers) * args.ops
+    print(
+        f"connections: {args.connections}, pipeline: {args.pipeline}, "
+        f"requests: {nrequests}"
+    )
+    print(f"throughput: {nrequests / elapsed:,.0f} ops/s")
+    for name, values in latencies.items():
+        print(
+            f"{name}: p50 {percentile(values, 50) * 1e6:,.0f}us"
+            f" p99 {percentile(values, 99) * 1e6:,.0f}us"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="load generator for project.server")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--pipeline", type=int, default=16, help="requests in flight")
+    parser.add_argument("--ops", type=int, default=500, help="add/get pairs per flow")
+    parser.add_argument("--tcp", action="store_true", help="use localhost TCP")
+    parser.add_argument("--port", type=int, default=7878)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dir:
+        if args.tcp:
+            address = {"host": "127.0.0.1", "port": args.port}
+            server_args = ["--port", str(args.port)]
+        else:
+            address = {"path": os.path.join(dir, "queue.sock")}
+            server_args = ["--unix", address["path"]]
+
+        server = subprocess.Popen(
+            [sys.executable, "-m", "project.server", *server_args],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            # the server prints its address once it listens
+            server.stdout.readline()
+            asyncio.run(run(args, address))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
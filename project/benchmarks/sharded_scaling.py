@@ -0,0 +1,106 @@
+# throughput and priority inversions of a ShardedTaskQueue by shard count
+#
+# every thread adds and gets `--ops` tasks of random priorities in a loop. a
+# get is counted as a priority inversion when, right after it, some shard still
+# holds a task of a higher priority than the one returned (every task fits, so
+# that task should have been returned instead); concurrent adds make this an
+# upper bound. the local-first strategy, which drains the preferred shard
+# before stealing, is measured for comparison
+#
+# usage:
+#   python -m project.benchmarks.sharded_scaling --shards 1 2 4 8 --threads 4
+import argparse
+import random
+import threading
+import time
+
+from project.resources import Resources
+from project.sharded_task_queue import ShardedTaskQueue
+from project.task import Task
+
+RESOURCES = Resources(1, 1, 0)
+
+
+def highest_priority(tq: ShardedTaskQueue) -> int | None:
+    return next(tq.nonempty_priorities(), None)
+
+
+def get_local_first(tq: ShardedTaskQueue) -> Task | None:
+    for index in tq.shard_order():
+        with tq.locks[index]:
+            task = tq.shards[index].get_task(RESOURCES)
+        if task is not None:
+            return task
+    return None
+
+
+def worker(tq, get, worker_id, nops, start_event, inversions) -> None:
+    rng = random.Random(worker_id)
+    first_id = worker_id * nops
+    ninversions = 0
+
+    start_event.wait()
+    for ii in range(first_id, first_id + nops):
+        tq.add_task(Task(ii, rng.randint(1, tq.levels), RESOURCES, "content", None))
+        task = get(tq)
+        highest = highest_priority(tq)
+        if task is not None and highest is not None and highest < task.priority:
+            ninversions += 1
+
+    inversions.append(ninversions)
+
+
+def run(nshards: int, nthreads: int, nops: int, local_first: bool):
+    tq = ShardedTaskQueue(1, "bench", shards=nshards)
+    get = get_local_first if local_first else lambda tq: tq.get_task(RESOURCES)
+    # a backlog, so that shards hold tasks of different priorities
+    tq.add_tasks(
+        Task(-ii, random.randint(1, 5), RESOURCES, "content", None)
+        for ii in range(1, 1001)
+    )
+
+    start_event = threading.Event()
+    inversions = []
+    threads = [
+        threading.Thread(
+            target=worker, args=(tq, get, ii, nops, start_event, inversions)
+        )
+        for ii in range(nthreads)
+    ]
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    # one add and one get per op
+    return 2 * nthreads * nops / elapsed, sum(inversions) / (nthreads * nops)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="throughput and priority inversions of a ShardedTaskQueue"
+    )
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{'shards':>6} {'strategy':>11} {'ops/s':>12} {'inversions':>10}")
+    for nshards in args.shards:
+        for local_first in (False, True):
+            throughput, inversion_rate = run(
+                nshards, args.threads, args.ops, local_first
+            )
+            strategy = "local-first" if local_first else "priority"
+            print(
+                f"{nshards:>6} {strategy:>11} {throughput:>12,.0f} "
+                f"{inversion_rate:>10.2%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
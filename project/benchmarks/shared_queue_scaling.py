@@ -0,0 +1,69 @@
+# throughput of one SharedTaskQueue used by a growing number of processes
+#
+# every process adds and gets `--ops` tasks in a loop on the same shared queue
+#
+# usage:
+#   python -m project.benchmarks.shared_queue_scaling --processes 1 2 4 8
+import argparse
+import multiprocessing
+import time
+
+from project.resources import Resources
+from project.shared_task_queue import SharedTaskQueue
+from project.task import Task
+
+
+def worker(tq: SharedTaskQueue, worker_id: int, nops: int, start_event) -> None:
+    resources = Resources(1, 1, 0)
+    first_id = worker_id * nops
+
+    start_event.wait()
+    for ii in range(first_id, first_id + nops):
+        tq.add_task(Task(ii, ii % 5 + 1, resources, "content", None))
+        tq.get_task(resources)
+
+    tq.close()
+
+
+def run(nprocesses: int, nops: int) -> float:
+    tq = SharedTaskQueue(capacity=nprocesses * nops, content_size=16)
+    start_event = multiprocessing.Event()
+
+    processes = [
+        multiprocessing.Process(target=worker, args=(tq, ii, nops, start_event))
+        for ii in range(nprocesses)
+    ]
+    for process in processes:
+        process.start()
+
+    start = time.perf_counter()
+    start_event.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    tq.close()
+    tq.unlink()
+
+    # one add and one get per op
+    return 2 * nprocesses * nops / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="throughput of a SharedTaskQueue shared by many processes"
+    )
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--ops", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{'processes':>9} {'ops/s':>12} {'scaling':>8}")
+    base = None
+    for nprocesses in args.processes:
+        throughput = run(nprocesses, args.ops)
+        base = base or throughput
+        print(f"{nprocesses:>9} {throughput:>12,.0f} {throughput / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# TaskQueue.snapshot/load against replaying a write-ahead log of the same queue
+#
+# usage:
+#   python -m project.benchmarks.snapshot_restore --ntasks 1000000
+import argparse
+import os
+import tempfile
+import time
+
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+from project.wal import WriteAheadLog
+
+
+def make_tasks(ntasks: int) -> list[Task]:
+    return [
+        Task(ii, ii % 5 + 1, Resources(ii % 64, ii % 32, ii % 8), "content", None)
+        for ii in range(ntasks)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="snapshot and restore a TaskQueue")
+    parser.add_argument("--ntasks", type=int, default=1_000_000)
+    parser.add_argument("--skip-wal", action="store_true", help="skip log replay")
+    parser.add_argument("--dir", default=None, help="directory of the files")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as dir:
+        snapshot_path = os.path.join(dir, "queue.snapshot")
+        wal_path = os.path.join(dir, "queue.wal")
+
+        with WriteAheadLog(wal_path, mode="async") as wal:
+            tq = TaskQueue(1, "bench", wal=None if args.skip_wal else wal)
+            tq.add_tasks(make_tasks(args.ntasks))
+            tq.wal = None
+
+        start = time.perf_counter()
+        tq.snapshot(snapshot_path)
+        snapshot = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pid = tq.snapshot(snapshot_path, background=True)
+        pause = time.perf_counter() - start
+        tq.finish_snapshot(pid)
+        size = os.path.getsize(snapshot_path)
+        del tq
+
+        start = time.perf_counter()
+        tq = TaskQueue.load(snapshot_path)
+        load = time.perf_counter() - start
+        assert len(tq) == args.ntasks
+        del tq
+
+        print(f"tasks: {args.ntasks}, snapshot size: {size / 2**20:.1f} MiB")
+        print(f"snapshot:              {snapshot:6.2f}s")
+        print(f"background snapshot:   {pause * 1000:6.1f}ms pause")
+        print(f"load:                  {load:6.2f}s")
+
+        if not args.skip_wal:
+            start = time.perf_counter()
+            with WriteAheadLog(wal_path) as wal:
+                tq = TaskQueue(1, "bench", wal=wal)
+            replay = time.perf_counter() - start
+            assert len(tq) == args.ntasks
+            print(f"log replay:            {replay:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# enqueue throughput of TaskQueue with a write-ahead log in sync, group and
+# async mode against the in-memory queue, and replay time of the log
+#
+# usage:
+#   python -m project.benchmarks.wal_enqueue --ntasks 100000 --sync-ntasks 2000
+import argparse
+import os
+import tempfile
+import time
+
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+from project.wal import WriteAheadLog
+
+
+def make_tasks(ntasks: int) -> list[Task]:
+    return [
+        Task(ii, ii % 5 + 1, Resources(ii % 64, ii % 32, ii % 8), "content", None)
+        for ii in range(ntasks)
+    ]
+
+
+def enqueue(tasks: list[Task], wal: WriteAheadLog | None) -> float:
+    tq = TaskQueue(1, "bench", wal=wal)
+    start = time.perf_counter()
+    for task in tasks:
+        tq.add_task(task)
+    if wal is not None:
+        wal.sync()
+    return len(tasks) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TaskQueue with a write-ahead log")
+    parser.add_argument("--ntasks", type=int, default=100_000)
+    parser.add_argument(
+        "--sync-ntasks", type=int, default=2_000, help="tasks for the sync mode"
+    )
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--dir", default=None, help="directory of the log")
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.ntasks)
+    memory = enqueue(tasks, None)
+    print(f"tasks: {args.ntasks} (sync mode: {args.sync_ntasks})")
+    print(f"{'mode':>8} {'tasks/s':>12} {'vs memory':>10}")
+    print(f"{'memory':>8} {memory:>12,.0f} {1:>9.2f}x")
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as dir:
+        path = os.path.join(dir, "queue.wal")
+        for mode in ("sync", "group", "async"):
+            ntasks = args.sync_ntasks if mode == "sync" else args.ntasks
+            with WriteAheadLog(path, mode, args.batch_size, args.interval) as wal:
+                throughput = enqueue(tasks[:ntasks], wal)
+            print(f"{mode:>8} {throughput:>12,.0f} {memory / throughput:>9.2f}x")
+            if mode != "async":
+                os.remove(path)
+
+        start = time.perf_counter()
+        with WriteAheadLog(path) as wal:
+            tq = TaskQueue(1, "bench", wal=wal)
+        elapsed = time.perf_counter() - start
+        print(f"replay of {len(tq)} tasks: {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
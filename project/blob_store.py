@@ -0,0 +1,229 @@
+import bisect
+import mmap
+import os
+import struct
+import threading
+from typing import NamedTuple
+
+USED = struct.Struct("<q")  # segment header: end of the allocated space
+
+ALIGNMENT = 8
+
+
+# place of a blob in a BlobStore; small enough to be a task's content in the
+# queue, the write-ahead log and snapshots (see codec.TAG_HANDLE)
+class BlobHandle(NamedTuple):
+    segment: int
+    offset: int
+    length: int
+
+
+def aligned(size: int) -> int:
+    return max(ALIGNMENT, size + -size % ALIGNMENT)
+
+
+# large payloads out of the tasks, in memory-mapped files
+#
+# blobs are written into segments, files of `segment_size` bytes in
+# `directory` mapped into memory (a blob larger than that gets a segment of its
+# own). a new segment is added when a blob does not fit any more, the existing
+# ones are never remapped, so views of them stay valid. view(handle) is a
+# read-only memoryview of the mapping: no copy is made, and pages are read from
+# the file by the OS when they are touched, so blobs need not be resident.
+#
+# free(handle) gives the space of a blob back: freed extents are merged with
+# free neighbours and reused best-fit, or returned to the end of their
+# segment. a view is valid until its blob is freed; views must be released
+# before close. freeing a handle that is not allocated, e.g. one freed already,
+# raises ValueError, unless its space was handed out again meanwhile. the
+# header of every segment records its allocated end, so a reopened store keeps
+# its blobs, but space freed before that is not reused
+class BlobStore:
+    def __init__(self, directory: str, segment_size: int = 64 << 20):
+        if segment_size <= USED.size:
+            raise ValueError(f"segment_size must be over {USED.size} bytes")
+
+        self.directory = directory
+        self.segment_size = segment_size
+        self.lock = threading.Lock()
+
+        self.files = []
+        self.maps = []
+        self.views = []  # memoryview of every mapping, sliced by view()
+        self.used = []  # allocated end of every segment
+
+        # free extents: (segment, offset) -> size, (segment, end) -> offset,
+        # (size, segment, offset) sorted for best-fit and (segment, offset)
+        # sorted for the checks of free
+        self.free_at = dict()
+        self.free_end = dict()
+        self.free_sizes = []
+        self.free_positions = []
+
+        os.makedirs(directory, exist_ok=True)
+        names = sorted(name for name in os.listdir(directory) if name.endswith(".blob"))
+        for index, name in enumerate(names):
+            if name != self._name(index):
+                raise ValueError(f"unexpected segment file {name}")
+            self._map(os.path.join(directory, name), None)
+        for segment in range(len(self.maps) - 1):
+            self._retire(segment)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _name(self, index: int) -> str:
+        return f"{index:06}.blob"
+
+    def _map(self, path: str, size: int | None) -> None:
+        # map an existing segment file, or create one of size bytes
+        file = open(path, "r+b" if size is None else "w+b")
+        if size is not None:
+            file.truncate(size)
+
+        buf = mmap.mmap(file.fileno(), 0)
+        if size is not None:
+            USED.pack_into(buf, 0, USED.size)
+
+        self.files.append(file)
+        self.maps.append(buf)
+        self.views.append(memoryview(buf))
+        self.used.append(USED.unpack_from(buf, 0)[0])
+
+    def close(self) -> None:
+        for view in self.views:
+            view.release()
+        for buf, file in zip(self.maps, self.files):
+            buf.close()
+            file.close()
+        self.views, self.maps, self.files = [], [], []
+
+    def sync(self) -> None:
+        # write the blobs to the disk
+        for buf in self.maps:
+            buf.flush()
+
+    def put(self, data) -> BlobHandle:
+        # copy data (bytes-like, or str stored as utf-8) into the store
+        # TC: O(S + log F) with F free extents, O(S + F) to reuse one
+        if isinstance(data, str):
+            data = data.encode()
+        data = memoryview(data).cast("B")
+        length = len(data)
+        size = aligned(length)
+
+        with self.lock:
+            segment, offset = self._allocate(size)
+
+        self.views[segment][offset : offset + length] = data
+        return BlobHandle(segment, offset, length)
+
+    def view(self, handle: BlobHandle) -> memoryview:
+        # TC: O(1), no copy
+        segment, offset, length = handle
+        return self.views[segment][offset : offset + length].toreadonly()
+
+    def free(self, handle: BlobHandle) -> None:
+        # TC: O(F) with F free extents
+        segment, offset, length = handle
+        size = aligned(length)
+        with self.lock:
+            if not self._is_allocated(segment, offset, size):
+                raise ValueError(f"{handle} is not an allocated blob")
+            self._release(segment, offset, size)
+
+    def _is_allocated(self, segment: int, offset: int, size: int) -> bool:
+        # whether the extent lies in the allocated space of its segment and
+        # overlaps no free extent; must be called with the lock held
+        # TC: O(log F)
+        if not (
+            0 <= segment < len(self.maps)
+            and USED.size <= offset
+            and offset + size <= self.used[segment]
+        ):
+            return False
+
+        positions = self.free_positions
+        ii = bisect.bisect_right(positions, (segment, offset))
+        if ii > 0 and positions[ii - 1][0] == segment:
+            before = positions[ii - 1][1]
+            if before + self.free_at[segment, before] > offset:
+                return False
+        if ii < len(positions) and positions[ii] < (segment, offset + size):
+            return False
+        return True
+
+    def _allocate(self, size: int) -> tuple[int, int]:
+        # best fit among free extents, then the end of the last segment, then
+        # a new segment; must be called with the lock held
+        ii = bisect.bisect_left(self.free_sizes, (size,))
+        if ii < len(self.free_sizes):
+            _, segment, offset = self.free_sizes[ii]
+            free_size = self._remove_free(segment, offset)
+            if free_size > size:
+                self._add_free(segment, offset + size, free_size - size)
+            return segment, offset
+
+        if not self.maps or self.used[-1] + size > len(self.maps[-1]):
+            if self.maps:
+                self._retire(len(self.maps) - 1)
+            path = os.path.join(self.directory, self._name(len(self.maps)))
+            self._map(path, max(self.segment_size, USED.size + size))
+
+        segment = len(self.maps) - 1
+        offset = self.used[segment]
+        self._set_used(segment, offset + size)
+        return segment, offset
+
+    def _retire(self, segment: int) -> None:
+        # the rest of a segment that is not the last one becomes a free extent
+        buf = self.maps[segment]
+        if self.used[segment] < len(buf):
+            self._add_free(segment, self.used[segment], len(buf) - self.used[segment])
+            self._set_used(segment, len(buf))
+
+    def _set_used(self, segment: int, used: int) -> None:
+        self.used[segment] = used
+        USED.pack_into(self.maps[segment], 0, used)
+
+    def _add_free(self, segment: int, offset: int, size: int) -> None:
+        self.free_at[segment, offset] = size
+        self.free_end[segment, offset + size] = offset
+        bisect.insort(self.free_sizes, (size, segment, offset))
+        bisect.insort(self.free_positions, (segment, offset))
+
+    def _remove_free(self, segment: int, offset: int) -> int:
+        size = self.free_at.pop((segment, offset))
+        del self.free_end[segment, offset + size]
+        del self.free_sizes[
+            bisect.bisect_left(self.free_sizes, (size, segment, offset))
+        ]
+        del self.free_positions[
+            bisect.bisect_left(self.free_positions, (segment, offset))
+        ]
+        return size
+
+    def _release(self, segment: int, offset: int, size: int) -> None:
+        # merge with the free extents right before and after
+        before = self.free_end.get((segment, offset))
+        if before is not None:
+            size += self._remove_free(segment, before)
+            offset = before
+        if (segment, offset + size) in self.free_at:
+            size += self._remove_free(segment, offset + size)
+
+        if segment == len(self.maps) - 1 and offset + size == self.used[segment]:
+            self._set_used(segment, offset)
+        else:
+            self._add_free(segment, offset, size)
+
+    def stats(self) -> tuple[int, int]:
+        # bytes allocated (blobs and free extents) and bytes of free extents
+        with self.lock:
+            return (
+                sum(self.used) - USED.size * len(self.used),
+                sum(self.free_at.values()),
+            )
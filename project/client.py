@@ -0,0 +1,130 @@
+import asyncio
+
+from .codec import encode_task
+from .protocol import (
+    GET,
+    GET_BATCH,
+    INT,
+    Request,
+    Status,
+    decode_optional_task,
+    decode_tasks,
+    frame,
+    read_frame,
+)
+from .resources import Resources
+from .task import Task
+
+
+# asyncio client of TaskQueueServer
+#
+# every call sends its request right away and waits only for its own
+# response, so concurrent calls over one connection are pipelined:
+#   await asyncio.gather(*(client.add_task(task) for task in tasks))
+# tasks sent in response to a get that was cancelled in the meantime are added
+# back to the queue (at the end of their subqueues)
+class TaskQueueClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+        self.request_id = 0
+        self.pending = dict()  # request id -> (request, future of the response)
+        self.giving_back = set()
+        self.receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 7878):
+        return cls(*await asyncio.open_connection(host, port))
+
+    @classmethod
+    async def connect_unix(cls, path: str):
+        return cls(*await asyncio.open_unix_connection(path))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self) -> None:
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        await self.receiver
+
+    async def _receive(self) -> None:
+        try:
+            while True:
+                request_id, status, payload = await read_frame(self.reader)
+                request, future = self.pending.pop(request_id, (None, None))
+                if future is None:
+                    continue
+
+                if not future.done():
+                    future.set_result((status, payload))
+                elif status == Status.OK and request == Request.GET:
+                    self._give_back([decode_optional_task(payload)])
+                elif status == Status.OK and request == Request.GET_BATCH:
+                    self._give_back(decode_tasks(payload)[0])
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            for _, future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("connection closed"))
+            self.pending.clear()
+
+    def _give_back(self, tasks: list[Task | None]) -> None:
+        for task in tasks:
+            if task is not None:
+                add = asyncio.create_task(self.add_task(task))
+                self.giving_back.add(add)
+                add.add_done_callback(self.giving_back.discard)
+
+    async def _request(self, request: Request, payload: bytes = b"") -> bytes:
+        if self.receiver.done():
+            raise ConnectionError("connection closed")
+
+        self.request_id = (self.request_id + 1) % 2**32
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.request_id] = (request, future)
+
+        self.writer.write(frame(self.request_id, request, payload))
+        await self.writer.drain()
+
+        status, payload = await future
+        if status == Status.ERROR:
+            raise ValueError(payload.decode())
+        return payload
+
+    async def add_task(self, task: Task) -> None:
+        await self._request(Request.ADD, encode_task(task))
+
+    async def get_task(
+        self, available_resources: Resources, timeout: float | None = None
+    ) -> Task | None:
+        # same as AsyncTaskQueue.get_task: wait up to timeout seconds (forever
+        # if None, not at all if 0) for a fitting task
+        timeout = -1.0 if timeout is None else timeout
+        payload = await self._request(
+            Request.GET, GET.pack(*available_resources, timeout)
+        )
+        return decode_optional_task(payload)
+
+    async def get_tasks(
+        self, available_resources: Resources, max_tasks: int
+    ) -> tuple[list[Task], Resources]:
+        payload = await self._request(
+            Request.GET_BATCH, GET_BATCH.pack(*available_resources, max_tasks)
+        )
+        return decode_tasks(payload)
+
+    async def cancel(self, id: int) -> Task | None:
+        # remove a queued task; None if it is not queued (anymore)
+        return decode_optional_task(await self._request(Request.CANCEL, INT.pack(id)))
+
+    async def length(self) -> int:
+        return INT.unpack(await self._request(Request.LEN))[0]
@@ -0,0 +1,153 @@
+import pickle
+import struct
+from array import array
+from itertools import accumulate
+
+from .blob_store import BlobHandle
+from .resources import Resources
+from .task import Task
+
+# id, priority, ram, cpu_cores, gpu_count
+TASK_HEADER = struct.Struct("<qiqqq")
+LENGTH = struct.Struct("<I")
+INT = struct.Struct("<q")
+HANDLE = struct.Struct("<qqq")  # segment, offset, length
+
+# tags of encoded values
+TAG_NONE = 0
+TAG_INT = 1
+TAG_STR = 2
+TAG_BYTES = 3
+TAG_PICKLE = 4  # anything else
+TAG_HANDLE = 5  # BlobHandle of a payload in a BlobStore
+
+INT_MIN, INT_MAX = -(2**63), 2**63 - 1
+
+# kinds of encoded columns of values
+KIND_NONE = 0  # all values are None, nothing is stored
+KIND_STR = 1  # all values are str: one utf-8 text, offsets in characters
+KIND_TAGGED = 2  # concatenated tagged values, offsets in bytes
+
+
+# binary encoding of tasks
+#
+# a task is a fixed header (id, priority and resources) followed by its content
+# and result, every one of them a tagged value: a one byte tag and a payload,
+# i.e. an int64, a length-prefixed utf-8 string or bytes, a BlobHandle (the
+# payload stays in its BlobStore), or a pickle for any other type (subclasses
+# of str and bytes are stored as str and bytes, bool is pickled). encoded tasks
+# are self-delimiting, so they can be concatenated
+#
+# unpickling runs arbitrary code: bytes from an untrusted peer must be decoded
+# with trusted=False, which refuses pickled values with a ValueError
+def encode_value(value) -> bytes:
+    # TC: O(S) with S the size of the value; SC: O(S)
+    if value is None:
+        return bytes((TAG_NONE,))
+
+    if isinstance(value, int) and not isinstance(value, bool):
+        if INT_MIN <= value <= INT_MAX:
+            return bytes((TAG_INT,)) + INT.pack(value)
+
+    if isinstance(value, BlobHandle):
+        return bytes((TAG_HANDLE,)) + HANDLE.pack(*value)
+
+    if isinstance(value, str):
+        data, tag = value.encode(), TAG_STR
+    elif isinstance(value, bytes):
+        data, tag = value, TAG_BYTES
+    else:
+        data, tag = pickle.dumps(value), TAG_PICKLE
+
+    return bytes((tag,)) + LENGTH.pack(len(data)) + data
+
+
+def decode_value(buf, offset: int = 0, trusted: bool = True) -> tuple[object, int]:
+    # value at offset and the offset right after it; TC: O(S); SC: O(S)
+    tag = buf[offset]
+    offset += 1
+
+    if tag == TAG_NONE:
+        return None, offset
+
+    if tag == TAG_INT:
+        return INT.unpack_from(buf, offset)[0], offset + INT.size
+
+    if tag == TAG_HANDLE:
+        return BlobHandle(*HANDLE.unpack_from(buf, offset)), offset + HANDLE.size
+
+    (length,) = LENGTH.unpack_from(buf, offset)
+    offset += LENGTH.size
+    data = bytes(buf[offset : offset + length])
+    if len(data) != length:
+        raise ValueError("truncated value")
+    offset += length
+
+    if tag == TAG_STR:
+        return data.decode(), offset
+    if tag == TAG_BYTES:
+        return data, offset
+    if tag == TAG_PICKLE:
+        if not trusted:
+            raise ValueError("pickled values are refused")
+        return pickle.loads(data), offset
+
+    raise ValueError(f"unknown value tag {tag}")
+
+
+def encode_task(task: Task) -> bytes:
+    # TC: O(S) with S the size of content and result; SC: O(S)
+    resources = task.resources
+    return (
+        TASK_HEADER.pack(
+            task.id,
+            task.priority,
+            resources.ram,
+            resources.cpu_cores,
+            resources.gpu_count,
+        )
+        + encode_value(task.content)
+        + encode_value(task.result)
+    )
+
+
+def decode_task(buf, offset: int = 0, trusted: bool = True) -> tuple[Task, int]:
+    # task at offset and the offset right after it; TC: O(S); SC: O(S)
+    id, priority, ram, cpu_cores, gpu_count = TASK_HEADER.unpack_from(buf, offset)
+    content, offset = decode_value(buf, offset + TASK_HEADER.size, trusted)
+    result, offset = decode_value(buf, offset, trusted)
+
+    return Task(
+        id, priority, Resources(ram, cpu_cores, gpu_count), content, result
+    ), offset
+
+
+# columns of values, e.g. the contents of many tasks, are encoded at once;
+# the common cases (all None, all str) skip the per-value tags
+def encode_values(values: list) -> tuple[int, bytes, array]:
+    # kind, data and len(values) + 1 offsets into data; TC: O(S); SC: O(S)
+    if all(value is None for value in values):
+        return KIND_NONE, b"", array("q")
+
+    if all(isinstance(value, str) for value in values):
+        offsets = array("q", accumulate(map(len, values), initial=0))
+        return KIND_STR, "".join(values).encode(), offsets
+
+    encoded = [encode_value(value) for value in values]
+    offsets = array("q", accumulate(map(len, encoded), initial=0))
+    return KIND_TAGGED, b"".join(encoded), offsets
+
+
+def decode_values(kind: int, data, offsets: list[int], count: int) -> list:
+    # inverse of encode_values; TC: O(S); SC: O(S)
+    if kind == KIND_NONE:
+        return [None] * count
+
+    if kind == KIND_STR:
+        text = str(data, "utf-8")
+        return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    if kind == KIND_TAGGED:
+        return [decode_value(data, offset)[0] for offset in offsets[:-1]]
+
+    raise ValueError(f"unknown column kind {kind}")
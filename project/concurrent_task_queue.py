@@ -0,0 +1,242 @@
+import threading
+from typing import Hashable
+
+from .doubly_linked_list import Node
+from .resources import Resources
+from .task import Task
+from .task_queue import Lease, TaskQueue
+
+
+# consumer blocked in ConcurrentTaskQueue.get_task
+class Waiter:
+    def __init__(self, available_resources: Resources) -> None:
+        self.available_resources = available_resources
+        self.event = threading.Event()
+        self.task = None
+
+
+# thread-safe task queue with blocking get_task
+#
+# all public methods run under a single lock: tasks of every priority are
+# linked into one DoublyLinkedList, so its links cannot be guarded per priority.
+# the lock is reentrant, as TaskQueue methods call each other (add_task calls
+# append, get_task calls pop). critical sections are short (see TC of TaskQueue
+# methods) and consumers never hold the lock while they wait.
+#
+# every blocked consumer waits on its own event; a task inserted by any method
+# is handed over to the first waiter (FIFO) whose resources fit it, so a
+# consumer wakes up only with a task it can run and other consumers are not
+# disturbed
+class ConcurrentTaskQueue(TaskQueue):
+    def __init__(self, *args, **kwargs):
+        # the replay of a log in Queue.__init__ may call locked methods
+        self.lock = threading.RLock()
+        self.waiters = []
+        super().__init__(*args, **kwargs)
+
+    def __len__(self):
+        with self.lock:
+            return super().__len__()
+
+    def snapshot(self, path: str, background: bool = False) -> int | None:
+        # in the background, consumers are blocked only while forking
+        with self.lock:
+            return super().snapshot(path, background)
+
+    def _hand_over(self, task: Task) -> bool:
+        # must be called with the lock held; TC: O(W) with W waiters
+        for waiter in self.waiters:
+            if self.is_valid_with_resources(task, waiter.available_resources):
+                self.pop(task.id)
+                self.waiters.remove(waiter)
+                waiter.task = task
+                waiter.event.set()
+                return True
+
+        return False
+
+    def _hand_over_all(self, tasks: list[Task]) -> None:
+        # must be called with the lock held
+        for task in tasks:
+            if not self.waiters:
+                break
+            self._hand_over(task)
+
+    def append(self, data: Task) -> None:
+        with self.lock:
+            super().append(data)
+            if self.waiters:
+                self._hand_over(data)
+
+    def append_left(self, data: Task) -> None:
+        with self.lock:
+            super().append_left(data)
+            if self.waiters:
+                self._hand_over(data)
+
+    def extend(self, data: list[Task]) -> None:
+        data = list(data)
+        with self.lock:
+            super().extend(data)
+            self._hand_over_all(data)
+
+    def insert_at_index(self, index: int, data: Task) -> None:
+        with self.lock:
+            curr_node = super().insert_at_index(index, data)
+            if self.waiters:
+                self._hand_over(data)
+            return curr_node
+
+    def pop(self, id: int) -> Node:
+        with self.lock:
+            return super().pop(id)
+
+    def pop_right(self) -> Node:
+        with self.lock:
+            return super().pop_right()
+
+    def pop_left(self) -> Node:
+        with self.lock:
+            return super().pop_left()
+
+    def pop_at_index(self, index: int) -> Node:
+        with self.lock:
+            return super().pop_at_index(index)
+
+    def change_priority(self, id: int, priority: int, position: str = "keep") -> None:
+        with self.lock:
+            super().change_priority(id, priority, position)
+
+    def move_before(self, id: int, other_id: int) -> None:
+        with self.lock:
+            super().move_before(id, other_id)
+
+    def move_after(self, id: int, other_id: int) -> None:
+        with self.lock:
+            super().move_after(id, other_id)
+
+    def index_of(self, id: int) -> int:
+        with self.lock:
+            return super().index_of(id)
+
+    def add_task(
+        self,
+        task: Task,
+        not_before: float | None = None,
+        dedup_key: Hashable | None = None,
+    ) -> Task | None:
+        # an eligible task is handed over by append
+        with self.lock:
+            return super().add_task(task, not_before, dedup_key)
+
+    def add_tasks(self, tasks) -> None:
+        with self.lock:
+            super().add_tasks(tasks)
+
+    def get_tasks(
+        self, available_resources: Resources, max_tasks: int
+    ) -> tuple[list[Task], Resources]:
+        with self.lock:
+            return super().get_tasks(available_resources, max_tasks)
+
+    def get_task(
+        self,
+        available_resources: Resources,
+        block: bool = True,
+        timeout: float | None = None,
+        waiter: Waiter | None = None,
+    ) -> Task | None:
+        # return a fitting task; if there is none and block is True, wait up to
+        # timeout seconds (forever if timeout is None) for one to be added.
+        # a consumer whose resources may grow while it waits passes its own
+        # waiter (made with available_resources) and calls update_waiter
+        with self.lock:
+            if waiter is None:
+                waiter = Waiter(available_resources)
+
+            task = super().get_task(waiter.available_resources)
+            if task is not None or not block:
+                return task
+
+            self.waiters.append(waiter)
+
+        waiter.event.wait(timeout)
+
+        with self.lock:
+            # a task may have been handed over right after the timeout
+            if waiter.task is None:
+                self.waiters.remove(waiter)
+
+            return waiter.task
+
+    def lease_task(
+        self, available_resources: Resources, ttl: float
+    ) -> tuple[Task, int] | None:
+        # never blocks, see TaskQueue.lease_task
+        with self.lock:
+            return super().lease_task(available_resources, ttl)
+
+    def ack(self, token: int) -> Task:
+        with self.lock:
+            return super().ack(token)
+
+    def renew(self, token: int, ttl: float) -> None:
+        with self.lock:
+            super().renew(token, ttl)
+
+    def nack(self, token: int) -> Task:
+        with self.lock:
+            return super().nack(token)
+
+    def expire_leases(self) -> int:
+        with self.lock:
+            return super().expire_leases()
+
+    def _requeue(self, token: int, lease: Lease) -> bool:
+        # must be called with the lock held; a task back from a lease may be
+        # handed over to a waiting consumer
+        requeued = super()._requeue(token, lease)
+        if requeued and self.waiters:
+            self._hand_over(lease.task)
+        return requeued
+
+    def cancel_delayed(self, id: int) -> Task:
+        with self.lock:
+            return super().cancel_delayed(id)
+
+    def promote(self, ids) -> None:
+        with self.lock:
+            super().promote(ids)
+
+    def promote_due(self) -> int:
+        # blocked consumers are not woken up by time passing, only by changes
+        # of the queue; call this from a timer to hand over due tasks
+        with self.lock:
+            return super().promote_due()
+
+    def _promote(self, tasks: list[Task]) -> None:
+        # must be called with the lock held
+        super()._promote(tasks)
+        self._hand_over_all(tasks)
+
+    def update_waiter(self, waiter: Waiter, available_resources: Resources) -> None:
+        # change resources of a consumer blocked with its own waiter; a queued
+        # task that fits them is handed over right away. TC: O(W) + get_task
+        with self.lock:
+            waiter.available_resources = available_resources
+            if waiter not in self.waiters:
+                return
+
+            # due tasks and expired leases are handed over as they come back,
+            # possibly to this waiter
+            self._promote_due()
+            self._expire_leases()
+            self.age()
+            if waiter not in self.waiters:
+                return
+
+            task = self._dispatch(available_resources)
+            if task is not None:
+                self.waiters.remove(waiter)
+                waiter.task = task
+                waiter.event.set()
@@ -0,0 +1,135 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from .task import Task
+from .task_queue import Queue
+
+
+# bit array with k hash functions; keys cannot be removed, so a Deduplicator
+# keeps two generations and drops the older one every window
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        # capacity keys at most give a false positive rate of error_rate
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate in (0, 1)")
+
+        self.nbits = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.nhashes = max(1, round(self.nbits / capacity * math.log(2)))
+        self.bits = bytearray((self.nbits + 7) // 8)
+
+    def _positions(self, key: Hashable):
+        # double hashing: h1 + i * h2 for i < k; TC: O(k)
+        h1 = hash(key)
+        h2 = hash((key, self.nbits)) | 1
+        for ii in range(self.nhashes):
+            yield (h1 + ii * h2) % self.nbits
+
+    def add(self, key: Hashable) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return all(self.bits[pos >> 3] >> (pos & 7) & 1 for pos in self._positions(key))
+
+
+# deduplication keys of a queue, remembered for `window` seconds after the
+# first add, so a producer that retries the same logical job gets the task
+# added first back instead of a second copy (TaskQueue.add_task(..., dedup_key=))
+#
+# keys live in an OrderedDict key -> (expiry, task): every key gets the same
+# window, so insertion order is expiry order and expired keys are popped from
+# the front, each once. at most max_keys keys are kept; the oldest ones are
+# evicted before their window ends once there are more. with bloom_keys > 0,
+# evicted keys go to a Bloom filter sized for bloom_keys keys per window at
+# error_rate (about 10 bits per key at 1%, against ~100 bytes per indexed key)
+# for the rest of their window. a key found only by the Bloom filter is a
+# maybe: a new key is found too with probability error_rate. by default such
+# an add is queued and counted in maybe_duplicates, so no job is lost; with
+# reject_maybe=True it is dropped and add_task returns None, which catches
+# retries of evicted keys but loses new jobs with probability error_rate.
+# keys are not logged, a restarted queue starts with an empty window
+class Deduplicator:
+    def __init__(
+        self,
+        queue: Queue,
+        window: float,
+        max_keys: int = 1_000_000,
+        bloom_keys: int = 0,
+        error_rate: float = 0.01,
+        reject_maybe: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if window <= 0 or max_keys < 1:
+            raise ValueError("window and max_keys must be positive")
+
+        self.queue = queue
+        self.window = window
+        self.max_keys = max_keys
+        self.reject_maybe = reject_maybe
+        self.clock = clock
+
+        self.keys = OrderedDict()  # key -> (expiry, task)
+        self.evicted = 0  # keys evicted before their window ended
+        self.maybe_duplicates = 0  # adds with keys found by the Bloom filter only
+
+        # two generations of evicted keys: keys added to `current` are kept
+        # until the second rotation from now, i.e. at least one window
+        self.bloom_keys = bloom_keys
+        self.error_rate = error_rate
+        self.current = self.previous = None
+        self.rotate_at = clock() + window
+        if bloom_keys:
+            self.current = BloomFilter(bloom_keys, error_rate)
+            self.previous = BloomFilter(bloom_keys, error_rate)
+
+        queue.dedup = self
+
+    def detach(self) -> None:
+        # stop deduplicating adds to the queue
+        self.queue.dedup = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def expire(self) -> None:
+        # TC: O(1) amortized
+        now = self.clock()
+        keys = self.keys
+        while keys and keys[next(iter(keys))][0] <= now:
+            keys.popitem(last=False)
+
+        if self.current is not None and now >= self.rotate_at:
+            if now >= self.rotate_at + self.window:
+                self.previous = BloomFilter(self.bloom_keys, self.error_rate)
+            else:
+                self.previous = self.current
+            self.current = BloomFilter(self.bloom_keys, self.error_rate)
+            self.rotate_at = now + self.window
+
+    def find(self, key: Hashable) -> tuple[bool, Task | None]:
+        # whether key was added within the window, and its task if it is
+        # still indexed; (True, None) is a maybe of the Bloom filter
+        # TC: O(1) amortized, O(k) more with a Bloom filter
+        self.expire()
+        entry = self.keys.get(key)
+        if entry is not None:
+            return True, entry[1]
+
+        if self.current is not None and (key in self.current or key in self.previous):
+            self.maybe_duplicates += 1
+            return True, None
+
+        return False, None
+
+    def add(self, key: Hashable, task: Task) -> None:
+        # TC: O(1) amortized
+        self.keys[key] = (self.clock() + self.window, task)
+        if len(self.keys) > self.max_keys:
+            evicted, _ = self.keys.popitem(last=False)
+            self.evicted += 1
+            if self.current is not None:
+                self.current.add(evicted)
@@ -3,6 +3,8 @@ from .task import Task
 
 # node of a doubly linked list
 class Node:
+    __slots__ = ("next_item", "prev_item", "item")
+
     def __init__(self, data) -> None:
         self.next_item, self.prev_item = None, None
         self.item = data
@@ -18,6 +20,13 @@ class DoublyLinkedList:
     def __len__(self):
         return len(self.nodes)
 
+    def __iter__(self):
+        # tasks from the start to the end; TC: O(N); SC: O(1)
+        node = self.start_node
+        while node is not None:
+            yield node.item
+            node = node.next_item
+
     def is_empty(self):
         # TC: O(1); SC: O(1)
         return self.start_node is None and self.end_node is None and self.__len__() == 0
@@ -91,6 +100,79 @@ class DoublyLinkedList:
     def append_right(self, data: Task) -> None:
         return self.append(data)
 
+    def extend(self, data: list[Task]) -> list[Node]:
+        # append many tasks at once; either all tasks are appended or none
+        # TC: O(K); SC: O(K)
+
+        # validate ids before touching the list
+        new_ids = [task.id for task in data]
+        unique_ids = set(new_ids)
+        if len(unique_ids) != len(new_ids) or not unique_ids.isdisjoint(self.nodes):
+            raise ValueError("duplicate id in tasks")
+
+        if not data:
+            return []
+
+        # build the chain locally
+        new_nodes = list(map(Node, data))
+        for prev_item, next_item in zip(new_nodes, new_nodes[1:]):
+            prev_item.next_item = next_item
+            next_item.prev_item = prev_item
+
+        # splice the chain onto the tail
+        if self.is_empty():
+            self.start_node = new_nodes[0]
+        else:
+            old_end_node = self.start_node if len(self) == 1 else self.end_node
+            old_end_node.next_item = new_nodes[0]
+            new_nodes[0].prev_item = old_end_node
+
+        self.nodes.update(zip(new_ids, new_nodes))
+
+        # a single node list keeps only the start_node (see insert_to_empty_list)
+        self.end_node = new_nodes[-1] if len(self) > 1 else None
+
+        return new_nodes
+
+    def insert_before(self, other_id: int, data: Task) -> Node:
+        # insert right before the task other_id; TC: O(1); SC: O(1)
+        other_node = self.nodes.get(other_id)
+        if other_node is None:
+            raise ValueError(f"id {other_id} not found in tasks")
+
+        if data.id in self.nodes:
+            raise ValueError("duplicate id in tasks")
+
+        if other_node is self.start_node:
+            return self.append_left(data)
+
+        return self._link_between(other_node.prev_item, other_node, data)
+
+    def insert_after(self, other_id: int, data: Task) -> Node:
+        # insert right after the task other_id; TC: O(1); SC: O(1)
+        other_node = self.nodes.get(other_id)
+        if other_node is None:
+            raise ValueError(f"id {other_id} not found in tasks")
+
+        if data.id in self.nodes:
+            raise ValueError("duplicate id in tasks")
+
+        if other_node.next_item is None:
+            return self.append_right(data)
+
+        return self._link_between(other_node, other_node.next_item, data)
+
+    def _link_between(self, prev_item: Node, next_item: Node, data: Task) -> Node:
+        # TC: O(1); SC: O(1)
+        new_item = Node(data)
+        new_item.prev_item = prev_item
+        new_item.next_item = next_item
+        prev_item.next_item = new_item
+        next_item.prev_item = new_item
+
+        self.nodes[data.id] = new_item
+        return new_item
+
     def _actions_on_last_node_after_pop(self) -> None:
         # executed after pop
         if self.__len__() == 1:
@@ -266,3 +348,16 @@ class DoublyLinkedList:
 
     def get(self, id: int) -> Node:
         return self.nodes.get(id)
+
+    def index_of(self, id: int) -> int:
+        # position of the task id; TC: O(N); SC: O(1)
+        node = self.nodes.get(id)
+        if node is None:
+            raise ValueError(f"id {id} not found in tasks")
+
+        index = 0
+        while node.prev_item is not None:
+            index += 1
+            node = node.prev_item
+
+        return index
@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, NamedTuple
+
+from .concurrent_task_queue import ConcurrentTaskQueue, Waiter
+from .resources import Resources, add, subtract
+from .result_store import ResultStore
+from .task import Task
+
+
+# fractions of the budget in use, 0.0 to 1.0 (0.0 for an empty budget)
+class Utilization(NamedTuple):
+    ram: float
+    cpu_cores: float
+    gpu_count: float
+
+
+# runs tasks of a ConcurrentTaskQueue on a process pool within a resource
+# budget of the local host
+#
+# a dispatcher thread blocks in queue.get_task with the resources that are
+# free. when a task finishes, its resources are released and the waiting get
+# is widened in place (ConcurrentTaskQueue.update_waiter), so the dispatcher
+# wakes up only when a task is added or a finished one makes room for a queued
+# one; there is no polling. at most max_workers tasks run at once, a task is
+# not dispatched just to wait for a worker while holding resources.
+#
+# `function(task.content)` runs in a worker process (it must be picklable, i.e.
+# defined at module level); its return value is written to task.result, or put
+# into `results` by task id if a ResultStore is given, so the executor keeps no
+# reference to finished tasks. on_done(task, error) is called from a thread of
+# the pool. every change of the resources in use is sampled as (time, resources
+# in use)
+class LocalExecutor:
+    def __init__(
+        self,
+        queue: ConcurrentTaskQueue,
+        budget: Resources,
+        function: Callable,
+        max_workers: int | None = None,
+        on_done: Callable[[Task, BaseException | None], None] | None = None,
+        max_samples: int = 100_000,
+        results: ResultStore | None = None,
+    ):
+        self.queue = queue
+        self.budget = budget
+        self.function = function
+        self.max_workers = max_workers or max(budget.cpu_cores, 1)
+        self.on_done = on_done
+        self.results = results
+
+        self.condition = threading.Condition()
+        self.in_use = Resources(0, 0, 0)
+        self.running = dict()  # task id -> task
+        self.finished = 0
+        self.failed = 0
+        self.waiter = None  # waiter of the dispatcher blocked in get_task
+        self.stopping = False
+        self.samples = deque(maxlen=max_samples)
+
+        self.pool = None
+        self.dispatcher = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def free(self) -> Resources:
+        return subtract(self.budget, self.in_use)
+
+    def start(self) -> None:
+        self.pool = ProcessPoolExecutor(self.max_workers)
+        self.samples.append((time.monotonic(), self.in_use))
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def shutdown(self, wait: bool = True) -> None:
+        # stop dispatching; running tasks are finished if wait is True
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+            if self.waiter is not None:
+                self.waiter.event.set()
+
+        self.dispatcher.join()
+        self.pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _dispatch(self) -> None:
+        while True:
+            with self.condition:
+                while not self.stopping and len(self.running) >= self.max_workers:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+
+                waiter = self.waiter = Waiter(self.free())
+                # wait_idle may be waiting for the dispatcher to run dry
+                self.condition.notify_all()
+
+            task = self.queue.get_task(waiter.available_resources, waiter=waiter)
+
+            with self.condition:
+                self.waiter = None
+                if task is None:
+                    continue
+
+                if self.stopping:
+                    # keep the task at the head of its subqueue
+                    self.queue.append_left(task)
+                    return
+
+                self.in_use = add(self.in_use, task.resources)
+                self.running[task.id] = task
+                self.samples.append((time.monotonic(), self.in_use))
+
+            future = self.pool.submit(self.function, task.content)
+            future.add_done_callback(
+                lambda future, task=task: self._finish(task, future)
+            )
+
+    def _finish(self, task: Task, future: Future) -> None:
+        if future.cancelled():
+            error = RuntimeError("executor shut down before the task ran")
+        else:
+            error = future.exception()
+            if error is None and self.results is not None:
+                self.results.put_result(task.id, future.result())
+            elif error is None:
+                task.result = future.result()
+
+        with self.condition:
+            del self.running[task.id]
+            self.in_use = subtract(self.in_use, task.resources)
+            self.samples.append((time.monotonic(), self.in_use))
+            self.finished += 1
+            self.failed += error is not None
+            self.condition.notify_all()
+
+            if self.waiter is not None:
+                self.queue.update_waiter(self.waiter, self.free())
+
+        if self.on_done is not None:
+            self.on_done(task, error)
+
+    def is_idle(self) -> bool:
+        # nothing runs and the dispatcher waits on an empty queue
+        with self.condition:
+            return self._is_idle()
+
+    def _is_idle(self) -> bool:
+        return (
+            not self.running
+            and self.waiter is not None
+            and self.waiter.task is None
+            and len(self.queue) == 0
+        )
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        # wait until all queued tasks have run; False on timeout. queued tasks
+        # that never fit the budget keep the executor from being idle
+        with self.condition:
+            return self.condition.wait_for(self._is_idle, timeout)
+
+    def utilization(self, since: float | None = None) -> Utilization:
+        # time-weighted mean fraction of the budget in use from `since` (the
+        # first sample by default) until now; TC: O(S) with S samples
+        samples = list(self.samples)
+        now = time.monotonic()
+        start = samples[0][0] if since is None else since
+
+        totals = [0.0, 0.0, 0.0]
+        for (at, in_use), (next_at, _) in zip(samples, samples[1:] + [(now, None)]):
+            duration = min(next_at, now) - max(at, start)
+            if duration > 0:
+                for ii, amount in enumerate(in_use):
+                    totals[ii] += amount * duration
+
+        elapsed = now - start
+        return Utilization(
+            *(
+                total / (limit * elapsed) if limit and elapsed > 0 else 0.0
+                for total, limit in zip(totals, self.budget)
+            )
+        )
@@ -0,0 +1,253 @@
+import random
+
+from .task import Task
+
+MAX_LEVEL = 32
+
+
+# node of an indexable skip list; level 0 links form a doubly linked list
+class SkipNode:
+    __slots__ = ("item", "next_items", "prev_items", "widths")
+
+    def __init__(self, data, height: int) -> None:
+        self.item = data
+        self.next_items = [None] * height
+        self.prev_items = [None] * height
+        # widths[level]: count of level 0 steps to next_items[level]
+        self.widths = [0] * height
+
+    @property
+    def height(self) -> int:
+        return len(self.next_items)
+
+    @property
+    def next_item(self):
+        next_item = self.next_items[0]
+        return None if next_item is None or next_item.item is None else next_item
+
+    @property
+    def prev_item(self):
+        prev_item = self.prev_items[0]
+        return None if prev_item is None or prev_item.item is None else prev_item
+
+
+# doubly linked list with O(log N) positional operations
+#
+# the list is an indexable skip list: its level 0 is an ordinary doubly linked
+# list and every link on every level stores its width, i.e. how many positions
+# it skips. nodes are also indexed by task id, so
+# - get by id stays O(1)
+# - insert/pop/get at index and index_of(id) are O(log N) expected
+# - append/pop at either end and pop by id are O(log N) expected
+#
+# the public API mirrors DoublyLinkedList, including insert_at_index semantics
+class IndexedDoublyLinkedList:
+    def __init__(self, seed: int | None = None):
+        self.random = random.Random(seed)
+
+        # sentinels; head is at position -1, tail at position len(self)
+        self.head = SkipNode(None, MAX_LEVEL)
+        self.tail = SkipNode(None, MAX_LEVEL)
+        for level in range(MAX_LEVEL):
+            self.head.next_items[level] = self.tail
+            self.head.widths[level] = 1
+            self.tail.prev_items[level] = self.head
+
+        self.level = 1  # levels in use
+        self.nodes = dict()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        # tasks from the start to the end; TC: O(N); SC: O(1)
+        node = self.head.next_items[0]
+        while node is not self.tail:
+            yield node.item
+            node = node.next_items[0]
+
+    def is_empty(self):
+        # TC: O(1); SC: O(1)
+        return len(self.nodes) == 0
+
+    @property
+    def start_node(self) -> SkipNode | None:
+        return self.head.next_item
+
+    @property
+    def end_node(self) -> SkipNode | None:
+        return self.tail.prev_item
+
+    def _random_height(self) -> int:
+        # P(height >= h) = 2 ** (1 - h)
+        bits = self.random.getrandbits(MAX_LEVEL - 1) | (1 << (MAX_LEVEL - 1))
+        return (bits & -bits).bit_length()
+
+    def _node_at(self, index: int) -> SkipNode:
+        # TC: O(log N); SC: O(1)
+        node, pos = self.head, -1
+        for level in range(self.level - 1, -1, -1):
+            while pos + node.widths[level] <= index:
+                pos += node.widths[level]
+                node = node.next_items[level]
+        return node
+
+    def _insert(self, index: int, data: Task) -> SkipNode:
+        # insert so that the new node gets position index; TC: O(log N); SC: O(1)
+        if data.id in self.nodes:
+            raise ValueError("duplicate id in tasks")
+
+        height = self._random_height()
+        if height > self.level:
+            for level in range(self.level, height):
+                self.head.widths[level] = len(self.nodes) + 1
+            self.level = height
+
+        new_node = SkipNode(data, height)
+
+        # last node before position index on every level
+        node, pos = self.head, -1
+        for level in range(self.level - 1, -1, -1):
+            while pos + node.widths[level] < index:
+                pos += node.widths[level]
+                node = node.next_items[level]
+
+            if level >= height:
+                node.widths[level] += 1
+                continue
+
+            next_node = node.next_items[level]
+            new_node.next_items[level] = next_node
+            new_node.prev_items[level] = node
+            node.next_items[level] = new_node
+            next_node.prev_items[level] = new_node
+
+            new_node.widths[level] = node.widths[level] - (index - pos) + 1
+            node.widths[level] = index - pos
+
+        self.nodes[data.id] = new_node
+        return new_node
+
+    def _remove(self, node: SkipNode) -> SkipNode:
+        # TC: O(log N) expected; SC: O(1)
+        height = node.height
+        for level in range(height):
+            prev_node, next_node = node.prev_items[level], node.next_items[level]
+            prev_node.next_items[level] = next_node
+            next_node.prev_items[level] = prev_node
+            prev_node.widths[level] += node.widths[level] - 1
+
+        # links spanning over the node on higher levels get shorter
+        covering_node = node
+        for level in range(height, self.level):
+            while covering_node.height <= level:
+                top = covering_node.height - 1
+                covering_node = covering_node.prev_items[top]
+            covering_node.widths[level] -= 1
+
+        self.nodes.pop(node.item.id)
+        return node
+
+    def _index_of_node(self, node: SkipNode) -> int:
+        # walk back to the head along the highest links; TC: O(log N) expected
+        pos = -1
+        while node is not self.head:
+            top = node.height - 1
+            node = node.prev_items[top]
+            pos += node.widths[top]
+        return pos
+
+    def _check_index(self, index: int) -> None:
+        if index < 0:
+            raise ValueError("negative index does not exist in a list")
+
+        if self.is_empty():
+            raise ValueError(f"index {index} not found in empty list")
+
+        if index >= len(self.nodes):
+            raise ValueError(
+                f"index {index} not found in list, list length: {len(self.nodes)}"
+            )
+
+    def get_node_by_id(self, id: int) -> SkipNode:
+        # TC: O(1); SC: O(1)
+        return self.nodes.get(id, None)
+
+    def get(self, id: int) -> SkipNode:
+        return self.nodes.get(id)
+
+    def get_at_index(self, index: int) -> SkipNode:
+        # TC: O(log N); SC: O(1)
+        self._check_index(index)
+        return self._node_at(index)
+
+    def index_of(self, id: int) -> int:
+        # position of the task id; TC: O(log N) expected; SC: O(1)
+        node = self.nodes.get(id)
+        if node is None:
+            raise ValueError(f"id {id} not found in tasks")
+        return self._index_of_node(node)
+
+    def append(self, data: Task) -> SkipNode:
+        return self._insert(len(self.nodes), data)
+
+    def append_right(self, data: Task) -> SkipNode:
+        return self.append(data)
+
+    def append_left(self, data: Task) -> SkipNode:
+        return self._insert(0, data)
+
+    def insert_before(self, other_id: int, data: Task) -> SkipNode:
+        # insert right before the task other_id; TC: O(log N) expected; SC: O(1)
+        return self._insert(self.index_of(other_id), data)
+
+    def insert_after(self, other_id: int, data: Task) -> SkipNode:
+        # insert right after the task other_id; TC: O(log N) expected; SC: O(1)
+        return self._insert(self.index_of(other_id) + 1, data)
+
+    def extend(self, data: list[Task]) -> list[SkipNode]:
+        # append many tasks at once; either all tasks are appended or none
+        # TC: O(K log N); SC: O(K)
+        new_ids = set()
+        for task in data:
+            if task.id in self.nodes or task.id in new_ids:
+                raise ValueError("duplicate id in tasks")
+            new_ids.add(task.id)
+
+        return [self.append(task) for task in data]
+
+    def pop_right(self) -> SkipNode:
+        if self.is_empty():
+            return None
+        return self._remove(self.tail.prev_items[0])
+
+    def pop_left(self) -> SkipNode:
+        if self.is_empty():
+            return None
+        return self._remove(self.head.next_items[0])
+
+    def pop(self, id: int) -> SkipNode:
+        # pop by id from anywhere; TC: O(log N) expected; SC: O(1)
+        node = self.nodes.get(id)
+        if node is None:
+            raise ValueError(f"id {id} not found in tasks")
+        return self._remove(node)
+
+    def insert_at_index(self, index: int, data: Task) -> SkipNode:
+        # same semantics as DoublyLinkedList.insert_at_index: index 0 inserts at
+        # the start, any other index inserts right after the task at that index
+        # TC: O(log N); SC: O(1)
+        if data.id in self.nodes:
+            raise ValueError("duplicate id in tasks")
+
+        self._check_index(index)
+
+        if index == 0:
+            return self.append_left(data)
+
+        return self._insert(index + 1, data)
+
+    def pop_at_index(self, index: int) -> SkipNode:
+        # TC: O(log N); SC: O(1)
+        self._check_index(index)
+        return self._remove(self._node_at(index))
@@ -0,0 +1,82 @@
+import asyncio
+import struct
+from enum import IntEnum
+
+from .codec import decode_task, encode_task
+from .resources import Resources
+from .task import Task
+
+
+class Request(IntEnum):
+    ADD = 1
+    GET = 2
+    GET_BATCH = 3
+    CANCEL = 4
+    LEN = 5
+
+
+class Status(IntEnum):
+    OK = 0
+    ERROR = 1
+
+
+# length of the rest of the frame, request id, request type or status
+FRAME_HEADER = struct.Struct("<IIB")
+RESOURCES = struct.Struct("<qqq")
+GET = struct.Struct("<qqqd")  # resources, timeout (< 0: wait forever)
+GET_BATCH = struct.Struct("<qqqq")  # resources, max_tasks
+INT = struct.Struct("<q")
+COUNT = struct.Struct("<I")
+
+MAX_FRAME_SIZE = 64 * 2**20
+
+
+# length-prefixed binary protocol of the queue server
+#
+# every frame is FRAME_HEADER followed by a payload. a client may send many
+# requests without waiting for responses (pipelining); the server answers
+# every request with a frame carrying the same request id and a Status,
+# possibly out of order (a waiting get does not hold back later requests).
+# an ERROR payload is a utf-8 message. payloads of requests and responses:
+# - ADD: a task -> nothing; the server refuses tasks with pickled values
+# - GET: resources and timeout -> an optional task
+# - GET_BATCH: resources and max_tasks -> tasks and leftover resources
+# - CANCEL: a task id -> the optional removed task
+# - LEN: nothing -> queue length
+def frame(request_id: int, kind: int, payload: bytes = b"") -> bytes:
+    return FRAME_HEADER.pack(len(payload) + 5, request_id, kind) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, int, bytes]:
+    # request id, request type or status and payload of the next frame;
+    # raises asyncio.IncompleteReadError once the connection is closed
+    header = await reader.readexactly(FRAME_HEADER.size)
+    length, request_id, kind = FRAME_HEADER.unpack(header)
+    if not 5 <= length <= MAX_FRAME_SIZE:
+        raise ValueError(f"wrong frame length {length}")
+
+    payload = await reader.readexactly(length - 5)
+    return request_id, kind, payload
+
+
+def encode_optional_task(task: Task | None) -> bytes:
+    return b"\x00" if task is None else b"\x01" + encode_task(task)
+
+
+def decode_optional_task(payload: bytes) -> Task | None:
+    return None if payload[0] == 0 else decode_task(payload, 1)[0]
+
+
+def encode_tasks(tasks: list[Task], resources: Resources) -> bytes:
+    encoded = [encode_task(task) for task in tasks]
+    return COUNT.pack(len(tasks)) + b"".join(encoded) + RESOURCES.pack(*resources)
+
+
+def decode_tasks(payload: bytes) -> tuple[list[Task], Resources]:
+    (ntasks,) = COUNT.unpack_from(payload)
+    tasks, offset = [], COUNT.size
+    for _ in range(ntasks):
+        task, offset = decode_task(payload, offset)
+        tasks.append(task)
+
+    return tasks, Resources(*RESOURCES.unpack_from(payload, offset))
@@ -0,0 +1,822 @@
+import math
+from bisect import bisect_right
+
+from .resources import Resources
+
+INF = float("inf")  # minima of an empty slot of the tree, fit nothing
+
+
+# block of consecutive entries of the index with per-dimension minima
+class Block:
+    def __init__(self) -> None:
+        self.ids = []
+        self.ram = []
+        self.cpu_cores = []
+        self.gpu_count = []
+        self.seqs = []  # ordering keys, increasing in dispatch order
+
+        self.min_ram = None
+        self.min_cpu_cores = None
+        self.min_gpu_count = None
+
+        self.slot = None  # leaf of the block in the tree of ResourceIndex
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fits(self, ram: int, cpu_cores: int, gpu_count: int) -> bool:
+        # TC: O(1); SC: O(1)
+        # necessary (not sufficient) condition for any entry of the block to fit
+        return (
+            self.min_ram <= ram
+            and self.min_cpu_cores <= cpu_cores
+            and self.min_gpu_count <= gpu_count
+        )
+
+    def insert(self, pos: int, id: int, resources: Resources, seq: float) -> None:
+        # TC: O(B); SC: O(1)
+        self.ids.insert(pos, id)
+        self.seqs.insert(pos, seq)
+        self.ram.insert(pos, resources.ram)
+        self.cpu_cores.insert(pos, resources.cpu_cores)
+        self.gpu_count.insert(pos, resources.gpu_count)
+
+        if self.min_ram is None:
+            self.min_ram = resources.ram
+            self.min_cpu_cores = resources.cpu_cores
+            self.min_gpu_count = resources.gpu_count
+            return
+
+        self.min_ram = min(self.min_ram, resources.ram)
+        self.min_cpu_cores = min(self.min_cpu_cores, resources.cpu_cores)
+        self.min_gpu_count = min(self.min_gpu_count, resources.gpu_count)
+
+    def remove(self, id: int) -> None:
+        # TC: O(B); SC: O(1)
+        pos = self.ids.index(id)
+        self.ids.pop(pos)
+        self.seqs.pop(pos)
+        ram = self.ram.pop(pos)
+        cpu_cores = self.cpu_cores.pop(pos)
+        gpu_count = self.gpu_count.pop(pos)
+
+        # minima are recomputed only if the removed entry defined one of them
+        if (
+            ram == self.min_ram
+            or cpu_cores == self.min_cpu_cores
+            or gpu_count == self.min_gpu_count
+        ):
+            self.update_minima()
+
+    def update_minima(self) -> None:
+        # TC: O(B); SC: O(1)
+        if len(self.ids) == 0:
+            self.min_ram, self.min_cpu_cores, self.min_gpu_count = None, None, None
+            return
+
+        self.min_ram = min(self.ram)
+        self.min_cpu_cores = min(self.cpu_cores)
+        self.min_gpu_count = min(self.gpu_count)
+
+    def find_first(self, ram: int, cpu_cores: int, gpu_count: int) -> int | None:
+        # TC: O(B); SC: O(1)
+        block_ram, block_cpu_cores, block_gpu_count = (
+            self.ram,
+            self.cpu_cores,
+            self.gpu_count,
+        )
+        for ii in range(len(self.ids)):
+            if (
+                block_ram[ii] <= ram
+                and block_cpu_cores[ii] <= cpu_cores
+                and block_gpu_count[ii] <= gpu_count
+            ):
+                return self.ids[ii]
+
+        return None
+
+    def pack(self, budget: list, max_count: int, selected_ids: list) -> None:
+        # greedily select entries in order while they fit the shrinking budget
+        # TC: O(B); SC: O(1)
+        for ii in range(len(self.ids)):
+            if len(selected_ids) >= max_count:
+                return
+
+            if (
+                self.ram[ii] <= budget[0]
+                and self.cpu_cores[ii] <= budget[1]
+                and self.gpu_count[ii] <= budget[2]
+            ):
+                budget[0] -= self.ram[ii]
+                budget[1] -= self.cpu_cores[ii]
+                budget[2] -= self.gpu_count[ii]
+                selected_ids.append(self.ids[ii])
+
+    def split(self) -> "Block":
+        # move the right half of the block into a new block; TC: O(B); SC: O(B)
+        half = len(self.ids) // 2
+
+        new_block = Block()
+        for attr in ("ids", "seqs", "ram", "cpu_cores", "gpu_count"):
+            values = getattr(self, attr)
+            setattr(new_block, attr, values[half:])
+            setattr(self, attr, values[:half])
+
+        self.update_minima()
+        new_block.update_minima()
+
+        return new_block
+
+
+# ordered multi-dimensional index of task resources
+#
+# entries are kept in dispatch order and partitioned into blocks of at most
+# `block_size` entries; every block stores per-dimension minima of its entries,
+# so a first-fit search skips whole blocks that cannot contain a fitting task.
+#
+# a tournament tree over the blocks keeps these minima for every range of
+# blocks: blocks are leaves (slots) in dispatch order, free slots in between
+# are empty leaves, and every inner node holds the minima of its two children.
+# find_first descends from the root into the leftmost subtrees whose minima
+# fit, so it skips the N / B blocks in O(log(N / B)). a change of a block
+# updates its path up to the first node that does not change. a new block
+# takes a free slot between its neighbours and a removed one leaves its slot
+# free; only if there is no free slot, the tree is marked stale and rebuilt in
+# O(N / B) by the next query, with a free slot after every block and free
+# slots on both sides
+# TC of find_first: O(log(N / B) + B) with B = block_size in the usual case
+#
+# per-dimension minima over the whole index (the resource frontier) are kept
+# incrementally: appends update them in O(1), a removal of an entry holding one
+# of the minima only marks them stale and they are recomputed from block
+# minima on the next query
+#
+# every entry carries an ordering key (seq), increasing in dispatch order:
+# callers pass enqueue sequence numbers, entries placed relative to other
+# entries get a key in between their neighbours, or one below the first key
+# (above the last one) at the front (back). keys are unique, so insert_by_seq
+# puts an entry back at the exact position of its key, e.g. after a move from
+# another index or a lease; an entry whose key is taken already goes right
+# behind the entry holding it. about 50 inserts into the same gap use up the
+# floats between two keys: has_room_next_to / has_room_at tell when, and the
+# caller gives the entries new keys with respace
+class ResourceIndex:
+    def __init__(self, block_size: int = 64):
+        self.block_size = block_size
+        self.blocks = []
+        self.block_by_id = dict()
+
+        # tree of block minima: leaves in [tree_size, 2 * tree_size), node 0
+        # is unused and stays INF; slots[slot] is the block in that leaf
+        self.tree_size = 0
+        self.tree_ram = []
+        self.tree_cpu_cores = []
+        self.tree_gpu_count = []
+        self.slots = []
+        self.tree_is_stale = True
+
+        self.min_ram = None
+        self.min_cpu_cores = None
+        self.min_gpu_count = None
+        self.minima_are_stale = False
+
+        # summed resources of all entries
+        self.sum_ram = 0
+        self.sum_cpu_cores = 0
+        self.sum_gpu_count = 0
+
+    def __len__(self):
+        return len(self.block_by_id)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self.block_by_id
+
+    def __iter__(self):
+        for block in self.blocks:
+            yield from block.ids
+
+    def is_empty(self):
+        # TC: O(1); SC: O(1)
+        return len(self.block_by_id) == 0
+
+    def columns(self) -> tuple[list[int], list[float]]:
+        # ids and keys in dispatch order; TC: O(N); SC: O(N)
+        ids, seqs = [], []
+        for block in self.blocks:
+            ids.extend(block.ids)
+            seqs.extend(block.seqs)
+        return ids, seqs
+
+    def _check_duplicate(self, id: int) -> None:
+        if id in self.block_by_id:
+            raise ValueError("duplicate id in resource index")
+
+    def _insert_at(
+        self, block_index: int, pos: int, id: int, resources: Resources, seq: float
+    ) -> None:
+        # TC: O(B); SC: O(1)
+        self._check_duplicate(id)
+        self._update_minima_on_insert(resources)
+        self._update_sums(resources.ram, resources.cpu_cores, resources.gpu_count)
+
+        if not self.blocks:
+            self._add_block(0, Block())
+
+        block = self.blocks[block_index]
+        block.insert(pos, id, resources, seq)
+        self.block_by_id[id] = block
+        self._update_slot(block)
+        self._split_if_full(block_index)
+
+    def _locate(self, id: int) -> tuple[int, int]:
+        # block index and position of an entry; TC: O(N / B + B); SC: O(1)
+        block = self.block_by_id.get(id)
+        if block is None:
+            raise ValueError(f"id {id} not found in resource index")
+
+        return self.blocks.index(block), block.ids.index(id)
+
+    def _split_if_full(self, block_index: int) -> None:
+        block = self.blocks[block_index]
+        if len(block) <= self.block_size:
+            return
+
+        new_block = block.split()
+        self._update_slot(block)
+        self._add_block(block_index + 1, new_block)
+        for id in new_block.ids:
+            self.block_by_id[id] = new_block
+
+    def _add_block(self, block_index: int, block: Block) -> None:
+        # TC: O(N / B) for the list, O(log(N / B)) for the tree; SC: O(1)
+        self.blocks.insert(block_index, block)
+        if self.tree_is_stale:
+            return
+
+        # next to the neighbour at either end, half way between the neighbours
+        # in the middle
+        low = self.blocks[block_index - 1].slot if block_index > 0 else -1
+        high = self.tree_size
+        if block_index + 1 < len(self.blocks):
+            high = self.blocks[block_index + 1].slot
+
+        if block_index == 0:
+            slot = high - 1
+        elif block_index == len(self.blocks) - 1:
+            slot = low + 1
+        else:
+            slot = (low + high) // 2
+
+        if len(self.blocks) == 1 or not low < slot < high:
+            self.tree_is_stale = True
+            return
+
+        block.slot = slot
+        self.slots[slot] = block
+        self._update_slot(block)
+
+    def _remove_block(self, block: Block) -> None:
+        # remove an empty block; TC: O(N / B) for the list, O(log(N / B)) for
+        # the tree; SC: O(1)
+        if block is self.blocks[0]:
+            del self.blocks[0]
+        elif block is self.blocks[-1]:
+            self.blocks.pop()
+        else:
+            self.blocks.remove(block)
+
+        if not self.tree_is_stale:
+            self.slots[block.slot] = None
+            self._update_slot(block)
+
+    def _build_tree(self) -> None:
+        # TC: O(N / B); SC: O(N / B)
+        nblocks = len(self.blocks)
+        size = 4
+        while size < 4 * nblocks:
+            size *= 2
+        # every other slot from start on, the free ones are for splits; as
+        # many free slots on both sides, for blocks added at either end
+        start = (size - 2 * nblocks) // 2
+        end = start + 2 * nblocks
+
+        self.tree_size = size
+        self.slots = [None] * size
+        self.slots[start:end:2] = self.blocks
+        for slot, block in zip(range(start, end, 2), self.blocks):
+            block.slot = slot
+
+        trees = []
+        for attr in ("min_ram", "min_cpu_cores", "min_gpu_count"):
+            tree = [INF] * (2 * size)
+            tree[size + start : size + end : 2] = [
+                getattr(block, attr) for block in self.blocks
+            ]
+            # inner nodes level by level, from the leaves up
+            width = size // 2
+            while width:
+                tree[width : 2 * width] = map(
+                    min,
+                    tree[2 * width : 4 * width : 2],
+                    tree[2 * width + 1 : 4 * width : 2],
+                )
+                width //= 2
+            trees.append(tree)
+
+        self.tree_ram, self.tree_cpu_cores, self.tree_gpu_count = trees
+        self.tree_is_stale = False
+
+    def _update_slot(self, block: Block) -> None:
+        # propagate new minima of a block towards the root, up to the first
+        # node that does not change; TC: O(log(N / B)); SC: O(1)
+        if self.tree_is_stale:
+            return
+
+        ram, cpu_cores, gpu_count = INF, INF, INF
+        if block.min_ram is not None:
+            ram, cpu_cores, gpu_count = (
+                block.min_ram,
+                block.min_cpu_cores,
+                block.min_gpu_count,
+            )
+
+        tree_ram, tree_cpu_cores, tree_gpu_count = (
+            self.tree_ram,
+            self.tree_cpu_cores,
+            self.tree_gpu_count,
+        )
+        node = self.tree_size + block.slot
+        while node and (
+            tree_ram[node] != ram
+            or tree_cpu_cores[node] != cpu_cores
+            or tree_gpu_count[node] != gpu_count
+        ):
+            tree_ram[node] = ram
+            tree_cpu_cores[node] = cpu_cores
+            tree_gpu_count[node] = gpu_count
+
+            sibling = node ^ 1
+            ram = min(ram, tree_ram[sibling])
+            cpu_cores = min(cpu_cores, tree_cpu_cores[sibling])
+            gpu_count = min(gpu_count, tree_gpu_count[sibling])
+            node //= 2
+
+    def _update_minima_on_insert(self, resources: Resources) -> None:
+        # TC: O(1); SC: O(1)
+        if self.minima_are_stale:
+            return
+
+        if self.min_ram is None:
+            self.min_ram = resources.ram
+            self.min_cpu_cores = resources.cpu_cores
+            self.min_gpu_count = resources.gpu_count
+            return
+
+        self.min_ram = min(self.min_ram, resources.ram)
+        self.min_cpu_cores = min(self.min_cpu_cores, resources.cpu_cores)
+        self.min_gpu_count = min(self.min_gpu_count, resources.gpu_count)
+
+    def _update_sums(self, ram: int, cpu_cores: int, gpu_count: int) -> None:
+        # TC: O(1); SC: O(1)
+        self.sum_ram += ram
+        self.sum_cpu_cores += cpu_cores
+        self.sum_gpu_count += gpu_count
+
+    def _update_minima_on_remove(self, block: Block, pos: int) -> None:
+        # TC: O(1); SC: O(1)
+        if (
+            block.ram[pos] == self.min_ram
+            or block.cpu_cores[pos] == self.min_cpu_cores
+            or block.gpu_count[pos] == self.min_gpu_count
+        ):
+            self.minima_are_stale = True
+
+    def _recompute_minima(self) -> None:
+        # the root of the tree; TC: O(1), O(N / B) if the tree is stale; SC: O(1)
+        self.minima_are_stale = False
+        if not self.blocks:
+            self.min_ram, self.min_cpu_cores, self.min_gpu_count = None, None, None
+            return
+
+        if self.tree_is_stale:
+            self._build_tree()
+        self.min_ram = self.tree_ram[1]
+        self.min_cpu_cores = self.tree_cpu_cores[1]
+        self.min_gpu_count = self.tree_gpu_count[1]
+
+    def min_resources(self) -> Resources | None:
+        # per-dimension minima of all entries; TC: O(1) amortized; SC: O(1)
+        if self.minima_are_stale:
+            self._recompute_minima()
+
+        if self.min_ram is None:
+            return None
+
+        return Resources(self.min_ram, self.min_cpu_cores, self.min_gpu_count)
+
+    def sum_resources(self) -> Resources:
+        # summed resources of all entries; TC: O(1); SC: O(1)
+        return Resources(self.sum_ram, self.sum_cpu_cores, self.sum_gpu_count)
+
+    def may_fit(self, available_resources: Resources) -> bool:
+        # False guarantees that no entry fits; TC: O(1) amortized; SC: O(1)
+        if self.minima_are_stale:
+            self._recompute_minima()
+
+        if self.min_ram is None:
+            return False
+
+        return (
+            self.min_ram <= available_resources.ram
+            and self.min_cpu_cores <= available_resources.cpu_cores
+            and self.min_gpu_count <= available_resources.gpu_count
+        )
+
+    def first(self) -> int | None:
+        # TC: O(1); SC: O(1)
+        return self.blocks[0].ids[0] if self.blocks else None
+
+    def last(self) -> int | None:
+        # TC: O(1); SC: O(1)
+        return self.blocks[-1].ids[-1] if self.blocks else None
+
+    def seq_of(self, id: int) -> float:
+        # TC: O(B); SC: O(1)
+        block = self.block_by_id.get(id)
+        if block is None:
+            raise ValueError(f"id {id} not found in resource index")
+
+        return block.seqs[block.ids.index(id)]
+
+    def append(self, id: int, resources: Resources, seq: float | None = None) -> None:
+        # insert at the end of dispatch order; TC: O(1) amortized; SC: O(1)
+        # seq must be greater than the last one; defaults to the last one + 1
+        self._check_duplicate(id)
+        self._update_minima_on_insert(resources)
+        self._update_sums(resources.ram, resources.cpu_cores, resources.gpu_count)
+
+        if seq is None:
+            seq = self.blocks[-1].seqs[-1] + 1 if self.blocks else 0
+        if not self.blocks or len(self.blocks[-1]) >= self.block_size:
+            self._add_block(len(self.blocks), Block())
+
+        block = self.blocks[-1]
+        block.insert(len(block), id, resources, seq)
+        self.block_by_id[id] = block
+        self._update_slot(block)
+
+    def extend(
+        self,
+        ids: list[int],
+        resources: list[Resources],
+        seqs: list[float] | None = None,
+    ) -> None:
+        # append many entries at the end of dispatch order; either all entries
+        # are appended or none; TC: O(K); SC: O(K)
+        new_ids = set(ids)
+        if len(new_ids) != len(ids) or not new_ids.isdisjoint(self.block_by_id):
+            raise ValueError("duplicate id in resource index")
+
+        if not ids:
+            return
+
+        ids = list(ids)
+        if seqs is None:
+            start = self.blocks[-1].seqs[-1] + 1 if self.blocks else 0
+            seqs = range(start, start + len(ids))
+
+        columns = {
+            "ids": ids,
+            "seqs": list(seqs),
+            "ram": [entry.ram for entry in resources],
+            "cpu_cores": [entry.cpu_cores for entry in resources],
+            "gpu_count": [entry.gpu_count for entry in resources],
+        }
+        self._update_minima_on_insert(
+            Resources(
+                min(columns["ram"]),
+                min(columns["cpu_cores"]),
+                min(columns["gpu_count"]),
+            )
+        )
+        self._update_sums(
+            sum(columns["ram"]), sum(columns["cpu_cores"]), sum(columns["gpu_count"])
+        )
+
+        # top up the last block first, then cut the rest into full blocks
+        start = 0
+        if self.blocks and len(self.blocks[-1]) < self.block_size:
+            start = self.block_size - len(self.blocks[-1])
+            self._extend_block(self.blocks[-1], columns, 0, start)
+            self._update_slot(self.blocks[-1])
+
+        for block_start in range(start, len(ids), self.block_size):
+            block = Block()
+            self._extend_block(
+                block, columns, block_start, block_start + self.block_size
+            )
+            self._add_block(len(self.blocks), block)
+
+    def _extend_block(self, block: Block, columns: dict, start: int, end: int) -> None:
+        for attr, values in columns.items():
+            getattr(block, attr).extend(values[start:end])
+        block.update_minima()
+        self.block_by_id.update(dict.fromkeys(columns["ids"][start:end], block))
+
+    def append_left(
+        self, id: int, resources: Resources, seq: float | None = None
+    ) -> None:
+        # insert at the beginning of dispatch order; TC: O(B + N / B); SC: O(1)
+        # seq must be lower than the first one; defaults to the first one - 1
+        self._check_duplicate(id)
+        if seq is None:
+            seq = self.blocks[0].seqs[0] - 1 if self.blocks else 0
+
+        # a full first block is not split, a new one is put in front of it
+        if self.blocks and len(self.blocks[0]) >= self.block_size:
+            self._add_block(0, Block())
+
+        self._insert_at(0, 0, id, resources, seq)
+
+    def _key_before(self, block_index: int, pos: int) -> float | None:
+        # key of the entry right before a position, None at the front
+        if pos > 0:
+            return self.blocks[block_index].seqs[pos - 1]
+        if block_index > 0:
+            return self.blocks[block_index - 1].seqs[-1]
+        return None
+
+    def _key_at(self, block_index: int, pos: int) -> float | None:
+        # key of the entry at a position, None past the end
+        block = self.blocks[block_index]
+        if pos < len(block):
+            return block.seqs[pos]
+        if block_index + 1 < len(self.blocks):
+            return self.blocks[block_index + 1].seqs[0]
+        return None
+
+    def _key_next_to(self, other_id: int, before: bool) -> tuple[int, int, float]:
+        # position right before (after) other_id and a key for it, None if no
+        # float is left between the keys of the neighbours
+        block_index, pos = self._locate(other_id)
+        if not before:
+            pos += 1
+
+        low = self._key_before(block_index, pos)
+        high = self._key_at(block_index, pos)
+        if low is None:
+            return block_index, pos, high - 1
+        if high is None:
+            return block_index, pos, low + 1
+
+        seq = (low + high) / 2
+        return block_index, pos, seq if low < seq < high else None
+
+    def _key_by_seq(self, seq: float) -> tuple[int, int, float]:
+        # position after every entry with a key <= seq and a key for it: seq,
+        # or one right above it if an entry holds seq, None if there is none
+        block_index = bisect_right(self.blocks, seq, key=lambda block: block.seqs[-1])
+        if block_index == len(self.blocks):
+            if not self.blocks or self.blocks[-1].seqs[-1] != seq:
+                return block_index, 0, seq
+            return block_index, 0, math.nextafter(seq, INF)
+
+        pos = bisect_right(self.blocks[block_index].seqs, seq)
+        if self._key_before(block_index, pos) != seq:
+            return block_index, pos, seq
+
+        high = self.blocks[block_index].seqs[pos]
+        key = (seq + high) / 2
+        return block_index, pos, key if seq < key < high else None
+
+    def has_room_next_to(self, other_id: int, before: bool) -> bool:
+        # whether an entry can be inserted right before (after) other_id
+        # without respace; TC: O(N / B + B); SC: O(1)
+        return self._key_next_to(other_id, before)[2] is not None
+
+    def has_room_at(self, seq: float) -> bool:
+        # whether an entry can be inserted by seq without respace
+        # TC: O(log(N / B) + log B); SC: O(1)
+        return self._key_by_seq(seq)[2] is not None
+
+    def respace(self, seqs: list[float]) -> None:
+        # give the entries new keys, increasing in dispatch order; TC: O(N)
+        start = 0
+        for block in self.blocks:
+            block.seqs = list(seqs[start : start + len(block)])
+            start += len(block)
+
+    def insert_before(self, other_id: int, id: int, resources: Resources) -> None:
+        # insert right before other_id; TC: O(N / B + B); SC: O(1)
+        block_index, pos, seq = self._key_next_to(other_id, before=True)
+        if seq is None:
+            raise ValueError(f"no key left before id {other_id}, respace the index")
+
+        self._insert_at(block_index, pos, id, resources, seq)
+
+    def insert_after(self, other_id: int, id: int, resources: Resources) -> None:
+        # insert right after other_id; TC: O(N / B + B); SC: O(1)
+        block_index, pos, seq = self._key_next_to(other_id, before=False)
+        if seq is None:
+            raise ValueError(f"no key left after id {other_id}, respace the index")
+
+        self._insert_at(block_index, pos, id, resources, seq)
+
+    def insert_by_seq(self, id: int, resources: Resources, seq: float) -> None:
+        # insert after every entry with a key <= seq; TC: O(N / B + B); SC: O(1)
+        block_index, pos, key = self._key_by_seq(seq)
+        if key is None:
+            raise ValueError(f"no key left after key {seq}, respace the index")
+
+        if block_index == len(self.blocks):
+            return self.append(id, resources, key)
+
+        self._insert_at(block_index, pos, id, resources, key)
+
+    def remove(self, id: int) -> None:
+        # TC: O(B) (+ O(N / B) when a block runs empty); SC: O(1)
+        block = self.block_by_id.pop(id, None)
+        if block is None:
+            raise ValueError(f"id {id} not found in resource index")
+
+        pos = block.ids.index(id)
+        self._update_sums(-block.ram[pos], -block.cpu_cores[pos], -block.gpu_count[pos])
+        self._update_minima_on_remove(block, pos)
+        block.remove(id)
+        if len(block) == 0:
+            self._remove_block(block)
+        else:
+            self._update_slot(block)
+
+    def discard(self, id: int) -> None:
+        if id in self.block_by_id:
+            self.remove(id)
+
+    def find_first(self, available_resources: Resources) -> int | None:
+        # id of the earliest entry that fits available resources: depth-first,
+        # left to right, into the subtrees whose minima fit
+        # TC: O(log(N / B) + B) for the usual case; SC: O(log(N / B))
+        if self.tree_is_stale:
+            self._build_tree()
+
+        ram = available_resources.ram
+        cpu_cores = available_resources.cpu_cores
+        gpu_count = available_resources.gpu_count
+        tree_ram, tree_cpu_cores, tree_gpu_count = (
+            self.tree_ram,
+            self.tree_cpu_cores,
+            self.tree_gpu_count,
+        )
+        size = self.tree_size
+
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            if (
+                tree_ram[node] > ram
+                or tree_cpu_cores[node] > cpu_cores
+                or tree_gpu_count[node] > gpu_count
+            ):
+                continue
+
+            if node < size:
+                stack.append(2 * node + 1)
+                stack.append(2 * node)
+                continue
+
+            id = self.slots[node - size].find_first(ram, cpu_cores, gpu_count)
+            if id is not None:
+                return id
+
+        return None
+
+    def fitting(self, available_resources: Resources):
+        # ids of all entries that fit available resources, in dispatch order;
+        # the index must not change while the generator is consumed
+        # TC: O(N / B + B) per yielded id in the usual case; SC: O(1)
+        ram = available_resources.ram
+        cpu_cores = available_resources.cpu_cores
+        gpu_count = available_resources.gpu_count
+
+        for block in self.blocks:
+            if not block.fits(ram, cpu_cores, gpu_count):
+                continue
+
+            for ii in range(len(block.ids)):
+                if (
+                    block.ram[ii] <= ram
+                    and block.cpu_cores[ii] <= cpu_cores
+                    and block.gpu_count[ii] <= gpu_count
+                ):
+                    yield block.ids[ii]
+
+    def pack(
+        self, available_resources: Resources, max_count: int
+    ) -> tuple[list[int], Resources]:
+        # ids of entries that fit available resources together, taken greedily in
+        # dispatch order, and the leftover resources; entries are not removed
+        #
+        # the budget only shrinks, so an entry rejected once never fits later
+        # and a single pass over the blocks is enough
+        # TC: O(N / B + K * B) with K blocks containing selected entries; SC: O(K)
+        budget = [
+            available_resources.ram,
+            available_resources.cpu_cores,
+            available_resources.gpu_count,
+        ]
+        selected_ids = []
+
+        for block in self.blocks:
+            if len(selected_ids) >= max_count:
+                break
+
+            if not block.fits(*budget):
+                continue
+
+            block.pack(budget, max_count, selected_ids)
+
+        return selected_ids, Resources(*budget)
+
+    def check(self) -> None:
+        # full consistency check of blocks, keys, minima and sums, meant for
+        # tests and debugging; TC: O(N); SC: O(N)
+        ids, seqs = [], []
+        for block in self.blocks:
+            if not 0 < len(block) <= self.block_size:
+                raise ValueError(f"block of wrong size {len(block)}")
+
+            columns = (block.seqs, block.ram, block.cpu_cores, block.gpu_count)
+            if any(len(column) != len(block) for column in columns):
+                raise ValueError("block columns lengths differ")
+
+            minima = (min(block.ram), min(block.cpu_cores), min(block.gpu_count))
+            if minima != (block.min_ram, block.min_cpu_cores, block.min_gpu_count):
+                raise ValueError("wrong block minima")
+
+            if any(self.block_by_id.get(id) is not block for id in block.ids):
+                raise ValueError("entry is mapped to a wrong block")
+
+            ids.extend(block.ids)
+            seqs.extend(block.seqs)
+
+        if len(ids) != len(self.block_by_id):
+            raise ValueError("blocks and id map lengths differ")
+
+        if any(seqs[ii] >= seqs[ii + 1] for ii in range(len(seqs) - 1)):
+            raise ValueError("keys are not unique and in dispatch order")
+
+        sums = [0, 0, 0]
+        for block in self.blocks:
+            sums[0] += sum(block.ram)
+            sums[1] += sum(block.cpu_cores)
+            sums[2] += sum(block.gpu_count)
+        if Resources(*sums) != self.sum_resources():
+            raise ValueError("wrong summed resources")
+
+        if self.blocks and not self.minima_are_stale:
+            minima = (
+                min(block.min_ram for block in self.blocks),
+                min(block.min_cpu_cores for block in self.blocks),
+                min(block.min_gpu_count for block in self.blocks),
+            )
+            if minima != (self.min_ram, self.min_cpu_cores, self.min_gpu_count):
+                raise ValueError("wrong resource frontier")
+
+        if not self.tree_is_stale:
+            self._check_tree()
+
+    def _check_tree(self) -> None:
+        size = self.tree_size
+        block_slots = [block.slot for block in self.blocks]
+        if any(
+            block_slots[ii] >= block_slots[ii + 1] for ii in range(len(block_slots) - 1)
+        ):
+            raise ValueError("slots of blocks are not in dispatch order")
+
+        slots = [None] * size
+        for block in self.blocks:
+            slots[block.slot] = block
+        if len(self.slots) != size or any(
+            slot is not block for slot, block in zip(self.slots, slots)
+        ):
+            raise ValueError("blocks are in wrong slots of the tree")
+
+        for slot, block in enumerate(slots):
+            leaf = (INF, INF, INF)
+            if block is not None:
+                leaf = (block.min_ram, block.min_cpu_cores, block.min_gpu_count)
+            node = size + slot
+            tree_leaf = (
+                self.tree_ram[node],
+                self.tree_cpu_cores[node],
+                self.tree_gpu_count[node],
+            )
+            if tree_leaf != leaf:
+                raise ValueError("wrong leaf minima in the tree")
+
+        for tree in (self.tree_ram, self.tree_cpu_cores, self.tree_gpu_count):
+            if any(
+                tree[node] != min(tree[2 * node], tree[2 * node + 1])
+                for node in range(1, size)
+            ):
+                raise ValueError("wrong inner minima in the tree")
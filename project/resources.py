@@ -1,8 +1,20 @@
-from dataclasses import dataclass
+from typing import NamedTuple
 
 
-@dataclass
-class Resources:
+# immutable, tuple-backed: no per-instance __dict__
+class Resources(NamedTuple):
     ram: int
     cpu_cores: int
     gpu_count: int
+
+
+def add(left: Resources, right: Resources) -> Resources:
+    return Resources(*(ll + rr for ll, rr in zip(left, right)))
+
+
+def subtract(left: Resources, right: Resources) -> Resources:
+    return Resources(*(ll - rr for ll, rr in zip(left, right)))
+
+
+def fits(resources: Resources, available_resources: Resources) -> bool:
+    return all(need <= have for need, have in zip(resources, available_resources))
@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable
+
+from .codec import decode_value, encode_value
+
+
+@dataclass(slots=True)
+class Entry:
+    value: object
+    size: int  # size of the encoded value
+    expiry: float
+
+
+# results of finished tasks by task id, out of the Task objects, so a finished
+# task can be dropped while its result stays retrievable
+#
+# results are kept in memory in an OrderedDict in LRU order up to max_bytes
+# (sizes of the values encoded by codec.py). once over the bound, the least
+# recently used results are evicted: with spill_path they are appended to a
+# spill file and read back from it with one pread, up to max_spill_bytes (the
+# oldest spilled ones are dropped past it); without, they are dropped. spilled
+# results stay on disk when read. the file is rewritten with the live records
+# once dead records make up more than half of it and over 1 MiB
+#
+# with ttl, a result is dropped ttl seconds after put in either tier; expiry
+# runs on every put and get and costs O(1) amortized. wait_result blocks until
+# a result is put. all methods are thread-safe
+class ResultStore:
+    def __init__(
+        self,
+        max_bytes: int = 64 << 20,
+        ttl: float | None = None,
+        spill_path: str | None = None,
+        max_spill_bytes: int = 1 << 30,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_bytes < 0 or (ttl is not None and ttl <= 0):
+            raise ValueError("max_bytes must not be negative and ttl positive")
+
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_spill_bytes = max_spill_bytes
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()  # id -> Entry, least recently used first
+        self.memory_bytes = 0
+        self.expiries = deque()  # (expiry, id) in put order, i.e. expiry order
+        self.waiting = dict()  # id -> [event, consumers waiting on it]
+
+        # spill tier: id -> (offset, size, expiry) in spill order
+        self.spill_path = spill_path
+        self.spilled = OrderedDict()
+        self.spill_bytes = 0  # live bytes
+        self.file = None
+        if spill_path is not None:
+            self.file = open(spill_path, "w+b")
+
+        self.evicted = 0  # results dropped before their ttl
+        self.spills = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.memory) + len(self.spilled)
+
+    def __contains__(self, id: int) -> bool:
+        with self.lock:
+            self._expire()
+            return id in self.memory or id in self.spilled
+
+    def close(self) -> None:
+        # drop the spill file
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+            os.remove(self.spill_path)
+
+    def put_result(self, id: int, value) -> None:
+        # TC: O(S) with S the size of the value + evictions
+        size = len(encode_value(value))
+        expiry = float("inf") if self.ttl is None else self.clock() + self.ttl
+
+        with self.lock:
+            self._expire()
+            self._discard(id)
+            self.memory[id] = Entry(value, size, expiry)
+            self.memory_bytes += size
+            if self.ttl is not None:
+                self.expiries.append((expiry, id))
+            self._evict()
+
+            waiting = self.waiting.pop(id, None)
+            if waiting is not None:
+                waiting[0].set()
+
+    def get_result(self, id: int):
+        # TC: O(1), O(S) for a spilled result
+        with self.lock:
+            self._expire()
+            entry = self.memory.get(id)
+            if entry is not None:
+                self.memory.move_to_end(id)
+                return entry.value
+
+            spilled = self.spilled.get(id)
+            if spilled is None:
+                raise ValueError(f"no result for id {id}")
+
+            offset, size, _ = spilled
+            return decode_value(os.pread(self.file.fileno(), size, offset))[0]
+
+    def wait_result(self, id: int, timeout: float | None = None):
+        # result of id once it is put; TimeoutError after timeout seconds
+        # (forever if None). a result that is put and evicted while waiting
+        # raises ValueError
+        with self.lock:
+            self._expire()
+            waiting = None
+            if id not in self.memory and id not in self.spilled:
+                waiting = self.waiting.setdefault(id, [threading.Event(), 0])
+                waiting[1] += 1
+
+        if waiting is not None and not waiting[0].wait(timeout):
+            with self.lock:
+                waiting[1] -= 1
+                if not waiting[1] and self.waiting.get(id) is waiting:
+                    del self.waiting[id]
+            raise TimeoutError(f"no result for id {id} within {timeout} seconds")
+
+        return self.get_result(id)
+
+    def pop_result(self, id: int):
+        # get and drop a result
+        value = self.get_result(id)
+        with self.lock:
+            self._discard(id)
+        return value
+
+    def _discard(self, id: int) -> None:
+        # must be called with the lock held; entries in expiries are dropped
+        # lazily, by their expiry
+        entry = self.memory.pop(id, None)
+        if entry is not None:
+            self.memory_bytes -= entry.size
+
+        spilled = self.spilled.pop(id, None)
+        if spilled is not None:
+            self.spill_bytes -= spilled[1]
+
+    def _expire(self) -> None:
+        # must be called with the lock held; TC: O(1) amortized
+        if not self.expiries:
+            return
+
+        now = self.clock()
+        while self.expiries and self.expiries[0][0] <= now:
+            expiry, id = self.expiries.popleft()
+            entry = self.memory.get(id)
+            if entry is not None and entry.expiry == expiry:
+                self._discard(id)
+            spilled = self.spilled.get(id)
+            if spilled is not None and spilled[2] == expiry:
+                self._discard(id)
+
+    def _evict(self) -> None:
+        # must be called with the lock held
+        while self.memory_bytes > self.max_bytes and self.memory:
+            id, entry = self.memory.popitem(last=False)
+            self.memory_bytes -= entry.size
+            if self.file is None:
+                self.evicted += 1
+            else:
+                self._spill(id, entry)
+
+    def _spill(self, id: int, entry: Entry) -> None:
+        # TC: O(S) amortized, compaction included
+        data = encode_value(entry.value)
+        self.file.seek(0, os.SEEK_END)
+        offset = self.file.tell()
+        self.file.write(data)
+        self.file.flush()
+
+        self.spilled[id] = (offset, len(data), entry.expiry)
+        self.spill_bytes += len(data)
+        self.spills += 1
+
+        while self.spill_bytes > self.max_spill_bytes:
+            _, (_, size, _) = self.spilled.popitem(last=False)
+            self.spill_bytes -= size
+            self.evicted += 1
+
+        if offset + len(data) > 2 * self.spill_bytes + (1 << 20):
+            self._compact()
+
+    def _compact(self) -> None:
+        # rewrite the live records into a new spill file; TC: O(live bytes)
+        tmp_path = f"{self.spill_path}.tmp"
+        fd = self.file.fileno()
+        with open(tmp_path, "w+b") as tmp:
+            spilled = OrderedDict()
+            for id, (offset, size, expiry) in self.spilled.items():
+                spilled[id] = (tmp.tell(), size, expiry)
+                tmp.write(os.pread(fd, size, offset))
+
+        os.replace(tmp_path, self.spill_path)
+        self.file.close()
+        self.file = open(self.spill_path, "r+b")
+        self.spilled = spilled
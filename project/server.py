@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import struct
+
+from .async_task_queue import AsyncTaskQueue
+from .codec import decode_task
+from .protocol import (
+    GET,
+    GET_BATCH,
+    INT,
+    Request,
+    Status,
+    encode_optional_task,
+    encode_tasks,
+    frame,
+    read_frame,
+)
+from .resources import Resources
+from .task import Task
+from .wal import WriteAheadLog
+
+
+# asyncio server exposing an AsyncTaskQueue over TCP or a unix socket
+#
+# requests of a connection are handled in order as they arrive; a get that
+# has to wait for a task runs in its own asyncio task, so pipelined requests
+# behind it are not held back. waiting gets of a closed connection are
+# cancelled and a task handed over to them goes back to the queue
+class TaskQueueServer:
+    def __init__(self, queue: AsyncTaskQueue):
+        self.queue = queue
+        self.server = None
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 0, path: str | None = None
+    ) -> None:
+        # listen on a unix socket if path is given, on host:port otherwise
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+
+    @property
+    def address(self):
+        return self.server.sockets[0].getsockname()
+
+    async def serve_forever(self) -> None:
+        await self.server.serve_forever()
+
+    async def close(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        waiting = set()
+
+        try:
+            while True:
+                request_id, request, payload = await read_frame(reader)
+
+                if request == Request.GET:
+                    ram, cpu_cores, gpu_count, timeout = GET.unpack(payload)
+                    resources = Resources(ram, cpu_cores, gpu_count)
+
+                    task = self.queue.get_task_nowait(resources)
+                    if task is not None or timeout == 0:
+                        writer.write(
+                            frame(request_id, Status.OK, encode_optional_task(task))
+                        )
+                    else:
+                        timeout = None if timeout < 0 else timeout
+                        get = asyncio.create_task(
+                            self.wait_for_task(writer, request_id, resources, timeout)
+                        )
+                        waiting.add(get)
+                        get.add_done_callback(waiting.discard)
+                else:
+                    writer.write(await self.respond(request_id, request, payload))
+
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except (ValueError, struct.error):
+            # a malformed frame, the connection cannot be trusted anymore
+            pass
+        finally:
+            for get in list(waiting):
+                get.cancel()
+            writer.close()
+
+    async def wait_for_task(
+        self,
+        writer: asyncio.StreamWriter,
+        request_id: int,
+        resources: Resources,
+        timeout: float | None,
+    ) -> None:
+        task = await self.queue.get_task(resources, timeout)
+        if writer.is_closing():
+            # the consumer is gone, keep the task at the head of its subqueue
+            if task is not None:
+                self.queue.queue.append_left(task)
+            return
+
+        writer.write(frame(request_id, Status.OK, encode_optional_task(task)))
+
+    async def respond(self, request_id: int, request: int, payload: bytes) -> bytes:
+        try:
+            if request == Request.ADD:
+                await self.queue.add_task(self.decode_task(payload))
+                return frame(request_id, Status.OK)
+
+            if request == Request.GET_BATCH:
+                ram, cpu_cores, gpu_count, max_tasks = GET_BATCH.unpack(payload)
+                tasks, leftover_resources = await self.queue.get_tasks(
+                    Resources(ram, cpu_cores, gpu_count), max_tasks
+                )
+                return frame(
+                    request_id, Status.OK, encode_tasks(tasks, leftover_resources)
+                )
+
+            if request == Request.CANCEL:
+                task = self.queue.cancel(INT.unpack(payload)[0])
+                return frame(request_id, Status.OK, encode_optional_task(task))
+
+            if request == Request.LEN:
+                return frame(request_id, Status.OK, INT.pack(len(self.queue)))
+
+            raise ValueError(f"unknown request {request}")
+        except (ValueError, struct.error) as error:
+            return frame(request_id, Status.ERROR, str(error).encode())
+
+    def decode_task(self, payload: bytes) -> Task:
+        # a task from a client: pickled values are refused, and any failure to
+        # decode is a ValueError answered with an error, not a closed connection
+        try:
+            task, offset = decode_task(payload, trusted=False)
+        except ValueError:
+            raise
+        except Exception as error:
+            raise ValueError(f"malformed task: {error!r}") from error
+
+        if offset != len(payload):
+            raise ValueError("malformed task: trailing bytes")
+        return task
+
+
+async def serve(args: argparse.Namespace) -> None:
+    wal = None if args.wal is None else WriteAheadLog(args.wal, mode=args.wal_mode)
+    queue = AsyncTaskQueue(1, args.name, levels=args.levels, wal=wal)
+
+    server = TaskQueueServer(queue)
+    await server.start(args.host, args.port, args.unix)
+    print(f"listening on {server.address}", flush=True)
+
+    try:
+        await server.serve_forever()
+    finally:
+        if wal is not None:
+            wal.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="task queue server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7878)
+    parser.add_argument("--unix", default=None, help="unix socket path")
+    parser.add_argument("--name", default="server")
+    parser.add_argument("--levels", type=int, default=5)
+    parser.add_argument("--wal", default=None, help="write-ahead log path")
+    parser.add_argument("--wal-mode", default="group")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import itertools
+import threading
+from contextlib import ExitStack
+
+from .resources import Resources
+from .task import Task
+from .task_queue import TaskQueue
+
+Placements = ("hash", "round_robin")
+
+
+# task queue split into K TaskQueue shards, every one with its own lock
+#
+# tasks are placed by hashing their id or round-robin. get_task walks the
+# priorities that are non-empty in any shard (union of the shards' bitmaps),
+# from high to low, and for every priority tries the preferred shard first and
+# then steals from the other ones; so a fitting task of a higher priority is
+# taken before any task of a lower one, whichever shard holds it, and ties go
+# to the preferred shard. like TaskQueue.get_task, get_task and get_tasks
+# first promote due tasks, requeue expired leases and age tasks, in every shard
+# that has any of them. a consumer holds at most one shard lock at a time, so
+# consumers working on different shards do not contend; add_tasks holds the
+# locks of the shards it adds to at once, always taken in shard order
+class ShardedTaskQueue:
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        shards: int = 4,
+        placement: str = "hash",
+        **kwargs,
+    ):
+        # kwargs go to every TaskQueue shard, e.g. levels or list_cls
+        if shards < 1:
+            raise ValueError("a queue needs at least one shard")
+
+        if placement not in Placements:
+            raise ValueError(f"placement {placement} is not one of {Placements}")
+
+        self.id = id
+        self.name = name
+        self.placement = placement
+
+        self.shards = [TaskQueue(id, f"{name}-{ii}", **kwargs) for ii in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.levels = self.shards[0].levels
+
+        # round-robin placement: a counter and the shard of every queued task
+        self.counter = itertools.count()
+        self.shard_of = dict()
+        self.shard_of_lock = threading.Lock()
+
+    def __len__(self):
+        # TC: O(K); SC: O(1)
+        return sum(len(shard) for shard in self.shards)
+
+    def _locate(self, id: int) -> int | None:
+        if self.placement == "hash":
+            return hash(id) % len(self.shards)
+        return self.shard_of.get(id)
+
+    def _register(self, tasks: list[Task]) -> list[int]:
+        # shard of every task; round-robin ids are reserved up front, so an id
+        # is never queued in two shards at once
+        if self.placement == "hash":
+            return [hash(task.id) % len(self.shards) for task in tasks]
+
+        indexes = [next(self.counter) % len(self.shards) for _ in tasks]
+        ids = [task.id for task in tasks]
+        with self.shard_of_lock:
+            if len(set(ids)) != len(ids) or not self.shard_of.keys().isdisjoint(ids):
+                raise ValueError("duplicate id in tasks")
+            self.shard_of.update(zip(ids, indexes))
+
+        return indexes
+
+    def _unregister(self, tasks: list[Task]) -> None:
+        if self.placement == "round_robin":
+            for task in tasks:
+                self.shard_of.pop(task.id, None)
+
+    def preferred_shard(self) -> int:
+        # shard of the calling thread
+        return threading.get_ident() % len(self.shards)
+
+    def add_task(self, task: Task) -> None:
+        # TC: O(1) + TaskQueue.add_task
+        (index,) = self._register([task])
+
+        try:
+            with self.locks[index]:
+                self.shards[index].add_task(task)
+        except ValueError:
+            self._unregister([task])
+            raise
+
+    def add_tasks(self, tasks) -> None:
+        # either all tasks are added or none: priorities are checked up front
+        # and ids under the locks of all shards involved, before any of them
+        # is changed; TC: O(K) + TaskQueue.add_tasks
+        tasks = list(tasks)
+        for task in tasks:
+            if not 1 <= task.priority <= self.levels:
+                raise ValueError(f"priority {task.priority} does not exist")
+
+        tasks_by_shard = [[] for _ in self.shards]
+        for index, task in zip(self._register(tasks), tasks):
+            tasks_by_shard[index].append(task)
+        indexes = [
+            index for index, shard_tasks in enumerate(tasks_by_shard) if shard_tasks
+        ]
+
+        try:
+            with ExitStack() as stack:
+                for index in indexes:
+                    stack.enter_context(self.locks[index])
+
+                for index in indexes:
+                    self._check_ids(self.shards[index], tasks_by_shard[index])
+                for index in indexes:
+                    self.shards[index].add_tasks(tasks_by_shard[index])
+        except ValueError:
+            self._unregister(tasks)
+            raise
+
+    def _check_ids(self, shard: TaskQueue, tasks: list[Task]) -> None:
+        # must be called with the lock of the shard held
+        ids = [task.id for task in tasks]
+        if (
+            len(set(ids)) != len(ids)
+            or any(shard.tasks.get(id) is not None for id in ids)
+            or not shard.delayed.keys().isdisjoint(ids)
+            or not shard.leased_ids.keys().isdisjoint(ids)
+        ):
+            raise ValueError("duplicate id in tasks")
+
+    def pop(self, id: int) -> Task:
+        # remove a queued task from its shard
+        index = self._locate(id)
+        if index is None:
+            raise ValueError(f"id {id} not found in tasks")
+
+        with self.locks[index]:
+            task = self.shards[index].pop(id).item
+
+        self._unregister([task])
+        return task
+
+    def shard_order(self, preferred: int | None = None) -> list[int]:
+        # shards from the preferred one (the one of the calling thread by
+        # default) on, the order get_task tries them in
+        if preferred is None:
+            preferred = self.preferred_shard()
+        preferred %= len(self.shards)
+        return [*range(preferred, len(self.shards)), *range(preferred)]
+
+    def run_timers(self) -> None:
+        # promote due tasks, requeue expired leases and age tasks of every shard;
+        # shards with no delayed tasks, leases or aging are not locked
+        # TC: O(K) + the work done
+        for shard, lock in zip(self.shards, self.locks):
+            if shard.delayed_heap or shard.lease_deadlines or shard.aging is not None:
+                with lock:
+                    shard.promote_due()
+                    shard.expire_leases()
+                    shard.age()
+
+    def nonempty_priorities(self):
+        # union of the shards' bitmaps, read without locks: a hint that is
+        # checked again under the lock of every shard
+        bits = 0
+        for shard in self.shards:
+            bits |= shard.nonempty
+
+        while bits:
+            lowest = bits & -bits
+            yield lowest.bit_length()
+            bits ^= lowest
+
+    def get_task(
+        self, available_resources: Resources, preferred: int | None = None
+    ) -> Task | None:
+        # highest-priority fitting task of all shards, from the preferred shard
+        # (the one of the calling thread by default) on a tie
+        # TC: O(L * K) lock acquisitions in the worst case, L levels
+        self.run_timers()
+        order = self.shard_order(preferred)
+
+        for priority in self.nonempty_priorities():
+            bit = 1 << (priority - 1)
+            for index in order:
+                shard = self.shards[index]
+                if not shard.nonempty & bit:
+                    continue
+
+                with self.locks[index]:
+                    task = shard.get_task_from_subq(priority, available_resources)
+
+                if task is not False:
+                    self._unregister([task])
+                    return task
+
+        return None
+
+    def get_tasks(
+        self,
+        available_resources: Resources,
+        max_tasks: int,
+        preferred: int | None = None,
+    ) -> tuple[list[Task], Resources]:
+        # same as TaskQueue.get_tasks over all shards, priority by priority
+        self.run_timers()
+        order = self.shard_order(preferred)
+
+        tasks = []
+        for priority in self.nonempty_priorities():
+            for index in order:
+                if len(tasks) >= max_tasks:
+                    return tasks, available_resources
+
+                shard = self.shards[index]
+                with self.locks[index]:
+                    shard_tasks, available_resources = shard.get_tasks_from_subq(
+                        priority, available_resources, max_tasks - len(tasks)
+                    )
+
+                self._unregister(shard_tasks)
+                tasks.extend(shard_tasks)
+
+        return tasks, available_resources
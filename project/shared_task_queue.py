@@ -0,0 +1,312 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+from .codec import TAG_PICKLE, decode_value, encode_value
+from .resources import Resources
+from .task import Task
+from .task_queue import PriorityIntToName
+
+EMPTY = -1
+
+# header fields
+SIZE = 0
+FREE_HEAD = 1
+HEADER_LEN = 2  # followed by heads and tails of every priority list
+
+# per-slot arrays of length `capacity`, in this order after the header
+SLOT_ARRAYS = ("id", "priority", "ram", "cpu_cores", "gpu_count", "prev", "next")
+SLOT_ARRAYS += ("content_len", "result_len")
+
+
+# task queue whose whole state lives in a single shared memory block
+#
+# the block holds int64 arrays: a header (size, head of the free-slot list,
+# heads and tails of the per-priority lists), slot arrays with task ids,
+# priorities, resource vectors, prev/next links and content and result
+# lengths, an open-addressing id -> slot table, then a fixed-size content area
+# and a fixed-size result area per slot. contents are str, results are None,
+# int, str or bytes (encoded by codec.py, values that would be pickled are
+# refused). every operation runs under a multiprocessing.Lock shared by all
+# processes
+#
+# pass the queue to other processes as an argument of multiprocessing.Process
+# (or any other way that pickles it while spawning): it is re-attached there to
+# the same shared memory block, no broker process is involved
+class SharedTaskQueue:
+    def __init__(
+        self,
+        capacity: int,
+        content_size: int = 256,
+        result_size: int = 64,
+        levels: int = len(PriorityIntToName),
+        name: str | None = None,
+        lock=None,
+        create: bool = True,
+    ):
+        self.capacity = capacity
+        self.content_size = content_size
+        self.result_size = result_size
+        self.levels = levels
+        self.lock = multiprocessing.Lock() if lock is None else lock
+
+        # id -> slot table is at most half full
+        self.table_size = 1 << (2 * capacity - 1).bit_length()
+
+        self.heads_offset = HEADER_LEN
+        self.tails_offset = self.heads_offset + levels
+        self.slots_offset = self.tails_offset + levels
+        self.keys_offset = self.slots_offset + len(SLOT_ARRAYS) * capacity
+        self.table_slots_offset = self.keys_offset + self.table_size
+        ints_len = self.table_slots_offset + self.table_size
+
+        self.ints_nbytes = 8 * ints_len
+        results_start = self.ints_nbytes + capacity * content_size
+        size = results_start + capacity * result_size
+
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.ints = self.shm.buf[: self.ints_nbytes].cast("q")
+        self.contents = self.shm.buf[self.ints_nbytes : results_start]
+        self.results = self.shm.buf[results_start:size]
+
+        for ii, array_name in enumerate(SLOT_ARRAYS):
+            setattr(self, f"{array_name}_offset", self.slots_offset + ii * capacity)
+
+        if create:
+            self._initialize()
+
+    def __reduce__(self):
+        return (
+            self.__class__,
+            (
+                self.capacity,
+                self.content_size,
+                self.result_size,
+                self.levels,
+                self.shm.name,
+                self.lock,
+                False,
+            ),
+        )
+
+    def _initialize(self) -> None:
+        ints = self.ints
+        ints[SIZE] = 0
+        for ii in range(self.heads_offset, self.slots_offset):
+            ints[ii] = EMPTY
+        for ii in range(
+            self.table_slots_offset, self.table_slots_offset + self.table_size
+        ):
+            ints[ii] = EMPTY
+
+        # free-slot list is chained through `next`
+        ints[FREE_HEAD] = 0 if self.capacity > 0 else EMPTY
+        for slot in range(self.capacity):
+            ints[self.next_offset + slot] = slot + 1
+        if self.capacity > 0:
+            ints[self.next_offset + self.capacity - 1] = EMPTY
+
+    def close(self) -> None:
+        # detach this process from the shared memory block
+        self.ints.release()
+        self.contents.release()
+        self.results.release()
+        self.shm.close()
+
+    def unlink(self) -> None:
+        # destroy the shared memory block; call once, from the creating process
+        self.shm.unlink()
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def __len__(self):
+        with self.lock:
+            return self.ints[SIZE]
+
+    # id -> slot table (linear probing with backward shift deletion)
+    def _hash(self, id: int) -> int:
+        return (id * 0x9E3779B97F4A7C15 >> 16) & (self.table_size - 1)
+
+    def _find(self, id: int) -> int:
+        # position of the id in the table or EMPTY; TC: O(1) expected
+        ints, mask = self.ints, self.table_size - 1
+        pos = self._hash(id)
+        while ints[self.table_slots_offset + pos] != EMPTY:
+            if ints[self.keys_offset + pos] == id:
+                return pos
+            pos = (pos + 1) & mask
+
+        return EMPTY
+
+    def _table_insert(self, id: int, slot: int) -> None:
+        ints, mask = self.ints, self.table_size - 1
+        pos = self._hash(id)
+        while ints[self.table_slots_offset + pos] != EMPTY:
+            pos = (pos + 1) & mask
+
+        ints[self.keys_offset + pos] = id
+        ints[self.table_slots_offset + pos] = slot
+
+    def _table_delete(self, pos: int) -> None:
+        ints, mask = self.ints, self.table_size - 1
+        keys, slots = self.keys_offset, self.table_slots_offset
+
+        # shift back following entries of the probe chain to fill the hole
+        hole, curr = pos, pos
+        while True:
+            curr = (curr + 1) & mask
+            if ints[slots + curr] == EMPTY:
+                break
+
+            home = self._hash(ints[keys + curr])
+            if (hole <= curr and (home <= hole or home > curr)) or (
+                hole > curr and home <= hole and home > curr
+            ):
+                ints[keys + hole] = ints[keys + curr]
+                ints[slots + hole] = ints[slots + curr]
+                hole = curr
+
+        ints[slots + hole] = EMPTY
+
+    # slots
+    def _read_task(self, slot: int) -> Task:
+        ints = self.ints
+        content_start = slot * self.content_size
+        content_len = ints[self.content_len_offset + slot]
+        content = bytes(self.contents[content_start : content_start + content_len])
+        result_start = slot * self.result_size
+        result_len = ints[self.result_len_offset + slot]
+        result = self.results[result_start : result_start + result_len]
+
+        return Task(
+            ints[self.id_offset + slot],
+            ints[self.priority_offset + slot],
+            Resources(
+                ints[self.ram_offset + slot],
+                ints[self.cpu_cores_offset + slot],
+                ints[self.gpu_count_offset + slot],
+            ),
+            content.decode(),
+            decode_value(result, trusted=False)[0],
+        )
+
+    def _unlink_slot(self, slot: int) -> None:
+        # remove the slot from its priority list and return it to the free list
+        ints = self.ints
+        level = ints[self.priority_offset + slot] - 1
+        prev_slot = ints[self.prev_offset + slot]
+        next_slot = ints[self.next_offset + slot]
+
+        if prev_slot == EMPTY:
+            ints[self.heads_offset + level] = next_slot
+        else:
+            ints[self.next_offset + prev_slot] = next_slot
+
+        if next_slot == EMPTY:
+            ints[self.tails_offset + level] = prev_slot
+        else:
+            ints[self.prev_offset + next_slot] = prev_slot
+
+        self._table_delete(self._find(ints[self.id_offset + slot]))
+
+        ints[self.next_offset + slot] = ints[FREE_HEAD]
+        ints[FREE_HEAD] = slot
+        ints[SIZE] -= 1
+
+    def add_task(self, task: Task) -> None:
+        # TC: O(1) expected; SC: O(1)
+        if not 1 <= task.priority <= self.levels:
+            raise ValueError(f"priority {task.priority} does not exist")
+
+        # a BlobHandle points into a BlobStore of one process
+        if not isinstance(task.content, str):
+            raise ValueError(
+                f"content of type {type(task.content).__name__} is refused, "
+                "contents are str"
+            )
+        content = task.content.encode()
+        if len(content) > self.content_size:
+            raise ValueError(f"content is larger than {self.content_size} bytes")
+
+        result = encode_value(task.result)
+        if result[0] == TAG_PICKLE:
+            raise ValueError(f"result of type {type(task.result).__name__} is refused")
+        if len(result) > self.result_size:
+            raise ValueError(f"result is larger than {self.result_size} bytes")
+
+        with self.lock:
+            ints = self.ints
+            if self._find(task.id) != EMPTY:
+                raise ValueError("duplicate id in tasks")
+
+            slot = ints[FREE_HEAD]
+            if slot == EMPTY:
+                raise ValueError(f"queue is full, capacity: {self.capacity}")
+            ints[FREE_HEAD] = ints[self.next_offset + slot]
+
+            ints[self.id_offset + slot] = task.id
+            ints[self.priority_offset + slot] = task.priority
+            ints[self.ram_offset + slot] = task.resources.ram
+            ints[self.cpu_cores_offset + slot] = task.resources.cpu_cores
+            ints[self.gpu_count_offset + slot] = task.resources.gpu_count
+            ints[self.content_len_offset + slot] = len(content)
+            content_start = slot * self.content_size
+            self.contents[content_start : content_start + len(content)] = content
+            ints[self.result_len_offset + slot] = len(result)
+            result_start = slot * self.result_size
+            self.results[result_start : result_start + len(result)] = result
+
+            # link to the tail of the priority list
+            level = task.priority - 1
+            tail = ints[self.tails_offset + level]
+            ints[self.prev_offset + slot] = tail
+            ints[self.next_offset + slot] = EMPTY
+            if tail == EMPTY:
+                ints[self.heads_offset + level] = slot
+            else:
+                ints[self.next_offset + tail] = slot
+            ints[self.tails_offset + level] = slot
+
+            self._table_insert(task.id, slot)
+            ints[SIZE] += 1
+
+    def pop(self, id: int) -> Task:
+        # TC: O(1) expected; SC: O(1)
+        with self.lock:
+            pos = self._find(id)
+            if pos == EMPTY:
+                raise ValueError(f"id {id} not found in tasks")
+
+            slot = self.ints[self.table_slots_offset + pos]
+            task = self._read_task(slot)
+            self._unlink_slot(slot)
+            return task
+
+    def get_task(self, available_resources: Resources) -> Task | None:
+        # earliest task of the highest priority that fits; TC: O(N); SC: O(1)
+        ram = available_resources.ram
+        cpu_cores = available_resources.cpu_cores
+        gpu_count = available_resources.gpu_count
+
+        with self.lock:
+            ints = self.ints
+            for level in range(self.levels):
+                slot = ints[self.heads_offset + level]
+                while slot != EMPTY:
+                    if (
+                        ints[self.ram_offset + slot] <= ram
+                        and ints[self.cpu_cores_offset + slot] <= cpu_cores
+                        and ints[self.gpu_count_offset + slot] <= gpu_count
+                    ):
+                        task = self._read_task(slot)
+                        self._unlink_slot(slot)
+                        return task
+
+                    slot = ints[self.next_offset + slot]
+
+        return None
@@ -0,0 +1,199 @@
+import mmap
+import os
+import struct
+from array import array
+from dataclasses import dataclass
+
+from .codec import KIND_NONE, decode_values, encode_values
+
+MAGIC = b"TQSNAP02"
+
+# magic, queue id, levels, tasks, delayed tasks, queue seq, checkpoint, name
+# size, content kind, result kind, content data size, result data size
+HEADER = struct.Struct("<8sqIqqqqqBBqq")
+
+ALIGNMENT = 8
+
+
+@dataclass
+class Snapshot:
+    id: int
+    name: str
+    levels: int
+    seq: int
+    checkpoint: int
+    # columns in list order
+    ids: list[int]
+    priorities: list[int]
+    ram: list[int]
+    cpu_cores: list[int]
+    gpu_count: list[int]
+    contents: list
+    results: list
+    # dispatch order: level_counts[p - 1] entries of subqueue p after the
+    # entries of higher priorities, as list positions with their index keys
+    level_counts: list[int]
+    dispatch: list[int]
+    seqs: list[float]
+    # wall-clock due times of the delayed tasks, the last len(not_before)
+    # tasks of the columns; they are not in the dispatch order
+    not_before: list[float]
+
+
+# binary snapshot of a queue
+#
+# a fixed header is followed by 8-byte aligned sections: the queue name, the
+# int64 columns of level counts, ids, priorities, ram, cpu_cores, gpu_count and
+# dispatch positions, the float64 columns of index keys and due times of
+# delayed tasks, then offsets and data of contents and results (see
+# codec.encode_values). load maps the file and turns every column into a list
+# in one call, no per-task parsing is done except for the values of tagged
+# content and result columns
+def padding(size: int) -> int:
+    return -size % ALIGNMENT
+
+
+def write_snapshot(path: str, snapshot: Snapshot) -> None:
+    # written to a temporary file first, so `path` is always a whole snapshot
+    # TC: O(N + S); SC: O(N + S)
+    name = snapshot.name.encode()
+    content_kind, content_data, content_offsets = encode_values(snapshot.contents)
+    result_kind, result_data, result_offsets = encode_values(snapshot.results)
+
+    sections = [
+        name,
+        array("q", snapshot.level_counts),
+        array("q", snapshot.ids),
+        array("q", snapshot.priorities),
+        array("q", snapshot.ram),
+        array("q", snapshot.cpu_cores),
+        array("q", snapshot.gpu_count),
+        array("q", snapshot.dispatch),
+        array("d", snapshot.seqs),
+        array("d", snapshot.not_before),
+        content_offsets,
+        result_offsets,
+        content_data,
+        result_data,
+    ]
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(
+            HEADER.pack(
+                MAGIC,
+                snapshot.id,
+                snapshot.levels,
+                len(snapshot.ids),
+                len(snapshot.not_before),
+                snapshot.seq,
+                snapshot.checkpoint,
+                len(name),
+                content_kind,
+                result_kind,
+                len(content_data),
+                len(result_data),
+            )
+        )
+        file.write(bytes(padding(HEADER.size)))
+
+        for section in sections:
+            section = memoryview(section).cast("B")
+            file.write(section)
+            file.write(bytes(padding(len(section))))
+
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> Snapshot:
+    # TC: O(N + S); SC: O(N + S)
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            view = memoryview(buf)
+            try:
+                return parse_snapshot(view)
+            finally:
+                view.release()
+
+
+def parse_snapshot(view: memoryview) -> Snapshot:
+    (
+        magic,
+        id,
+        levels,
+        ntasks,
+        ndelayed,
+        seq,
+        checkpoint,
+        name_size,
+        content_kind,
+        result_kind,
+        content_size,
+        result_size,
+    ) = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("not a task queue snapshot")
+
+    offset = HEADER.size + padding(HEADER.size)
+
+    def section(size: int) -> memoryview:
+        nonlocal offset
+        data = view[offset : offset + size]
+        if len(data) != size:
+            raise ValueError("truncated snapshot")
+        offset += size + padding(size)
+        return data
+
+    def column(typecode: str, count: int) -> list:
+        data = section(8 * count)
+        try:
+            return data.cast(typecode).tolist()
+        finally:
+            data.release()
+
+    def values(kind: int, offsets: list[int], size: int) -> list:
+        data = section(size)
+        try:
+            return decode_values(kind, data, offsets, ntasks)
+        finally:
+            data.release()
+
+    name_data = section(name_size)
+    name = str(name_data, "utf-8")
+    name_data.release()
+
+    level_counts = column("q", levels)
+    ids = column("q", ntasks)
+    priorities = column("q", ntasks)
+    ram = column("q", ntasks)
+    cpu_cores = column("q", ntasks)
+    gpu_count = column("q", ntasks)
+    dispatch = column("q", ntasks - ndelayed)
+    seqs = column("d", ntasks - ndelayed)
+    not_before = column("d", ndelayed)
+    content_offsets = column("q", 0 if content_kind == KIND_NONE else ntasks + 1)
+    result_offsets = column("q", 0 if result_kind == KIND_NONE else ntasks + 1)
+    contents = values(content_kind, content_offsets, content_size)
+    results = values(result_kind, result_offsets, result_size)
+
+    return Snapshot(
+        id=id,
+        name=name,
+        levels=levels,
+        seq=seq,
+        checkpoint=checkpoint,
+        ids=ids,
+        priorities=priorities,
+        ram=ram,
+        cpu_cores=cpu_cores,
+        gpu_count=gpu_count,
+        contents=contents,
+        results=results,
+        level_counts=level_counts,
+        dispatch=dispatch,
+        seqs=seqs,
+        not_before=not_before,
+    )
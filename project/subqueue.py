@@ -1,10 +1,17 @@
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
+
+from .resource_index import ResourceIndex
 
 
 @dataclass
 class SubQueue:
     name: str
-    tasks: dict  # ordered by default; set is not ordered
+    tasks: dict  # id -> epoch it entered in; ordered, set is not ordered
+    index: ResourceIndex = field(default_factory=ResourceIndex)
+    # (epoch, ids) entered in that epoch, from old to new; kept only while the
+    # queue ages tasks, see aging.py
+    entries: deque = field(default_factory=deque)
 
     def __len__(self):
         return len(self.tasks)
@@ -13,7 +20,29 @@ class SubQueue:
         for k in self.tasks.keys():
             v = self.tasks.pop(k)
             break
+        self.index.discard(k)
         return (k, v)
 
     def popright(self):
-        return self.tasks.popitem()
+        k, v = self.tasks.popitem()
+        self.index.discard(k)
+        return (k, v)
+
+    def enter(self, ids: list[int], epoch: int) -> None:
+        # TC: O(K); SC: O(K)
+        if self.entries and self.entries[-1][0] == epoch:
+            self.entries[-1][1].extend(ids)
+        else:
+            self.entries.append((epoch, list(ids)))
+
+    def expire(self, epoch: int) -> list[int]:
+        # ids that entered in epoch or before and have stayed since then;
+        # every entry is visited once, also those of tasks that have left
+        expired = dict()
+        while self.entries and self.entries[0][0] <= epoch:
+            entry_epoch, ids = self.entries.popleft()
+            for id in ids:
+                if self.tasks.get(id) == entry_epoch:
+                    expired[id] = True
+
+        return list(expired)
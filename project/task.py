@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from .resources import Resources
 
 
-@dataclass
+@dataclass(slots=True)
 class Task:
     id: int
     priority: int
@@ -1,9 +1,19 @@
+import gc
+import heapq
+import math
+import os
+import time
+import traceback
 from dataclasses import dataclass
+from itertools import repeat
+from typing import Hashable
 
 from .doubly_linked_list import DoublyLinkedList, Node
 from .resources import Resources
+from .snapshot import Snapshot, read_snapshot, write_snapshot
 from .subqueue import SubQueue
 from .task import Task
+from .wal import Op, WriteAheadLog
 
 PriorityNameToInt = {
     "QHIGHEST": 1,
@@ -15,103 +25,632 @@ PriorityNameToInt = {
 
 PriorityIntToName = {val: key for key, val in PriorityNameToInt.items()}
 
+Positions = ("keep", "front", "back")
+
+
+# a task handed out by TaskQueue.lease_task, with its place in its subqueue
+@dataclass(slots=True)
+class Lease:
+    task: Task
+    seq: float
+    deadline: float
+
 
 @dataclass
 class Queue:
-    def __init__(self, id: int, name: str):
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        list_cls: type = DoublyLinkedList,
+        levels: int = len(PriorityIntToName),
+        validate: bool = False,
+        wal: WriteAheadLog | None = None,
+    ):
+        # list_cls: DoublyLinkedList or a class with the same API,
+        # e.g. ArrayDoublyLinkedList or IndexedDoublyLinkedList
+        # levels: number of priorities, 1 is the highest one
+        # validate: run check_invariants after every change, O(N) each time,
+        # meant for tests and debugging only
+        # wal: write-ahead log, replayed into the queue on construction and
+        # then written on every change
+        if levels < 1:
+            raise ValueError("a queue needs at least one priority level")
+
         self.id = id
         self.name = name
+        self.levels = levels
+        self.validate = validate
 
-        self.tasks = DoublyLinkedList()
+        self.tasks = list_cls()
 
-        self.QHIGHEST = SubQueue(
-            name="HIGHEST",
-            tasks=dict(),
-        )
-        self.QHIGH = SubQueue(
-            name="HIGH",
-            tasks=dict(),
-        )
-        self.QMIDDLE = SubQueue(
-            name="MIDDLE",
-            tasks=dict(),
-        )
-        self.QLOW = SubQueue(
-            name="LOW",
-            tasks=dict(),
-        )
-        self.QLOWEST = SubQueue(
-            name="LOWEST",
-            tasks=dict(),
-        )
+        # enqueue sequence number, orders tasks within subqueues
+        self.seq = 0
+
+        # subqueue of priority p is subqueues[p - 1]
+        self.subqueues = [
+            SubQueue(name=self.level_name(priority), tasks=dict())
+            for priority in range(1, levels + 1)
+        ]
+
+        # bit p - 1 is set when subqueue p may hold tasks to dispatch
+        self.nonempty = 0
+
+        # aging policy, see aging.py
+        self.aging = None
+
+        # deduplication keys, see dedup.py
+        self.dedup = None
+
+        # leased tasks, see TaskQueue.lease_task
+        self.clock = time.monotonic
+        self.leases = dict()  # token -> Lease
+        self.leased_ids = dict()  # id -> token
+        self.lease_deadlines = []  # heap of (deadline, token)
+        self.lease_token = 0
+
+        # delayed tasks, see TaskQueue.add_task; an entry (not_before, count,
+        # task) is in the heap and, until it is promoted or cancelled, in the dict
+        self.delayed = dict()  # id -> entry
+        self.delayed_heap = []
+        self.delayed_count = 0
+
+        # the default five levels stay reachable as QHIGHEST, ..., QLOWEST
+        if levels == len(PriorityIntToName):
+            for priority, subq_name in PriorityIntToName.items():
+                setattr(self, subq_name, self.subqueues[priority - 1])
+
+        # changes made by the replay are already in the log
+        self.wal = None
+        if wal is not None:
+            wal.replay(self)
+            self.wal = wal
+
+    def level_name(self, priority: int) -> str:
+        if self.levels == len(PriorityIntToName):
+            return PriorityIntToName[priority][1:]
+        return f"P{priority}"
 
     def __len__(self):
-        subqs_len = (
-            len(self.QHIGHEST.tasks)
-            + len(self.QHIGH.tasks)
-            + len(self.QMIDDLE.tasks)
-            + len(self.QLOW.tasks)
-            + len(self.QLOWEST.tasks)
-        )
+        # TC: O(1); SC: O(1)
+        return len(self.tasks)
+
+    def check_invariants(self) -> None:
+        # full cross-structure consistency check; TC: O(N); SC: O(N)
+        subqs_len = sum(len(subq.tasks) for subq in self.subqueues)
+        if subqs_len != len(self.tasks):
+            raise ValueError("subqueues and tasks lengths differ")
+
+        # read the tasks by iterating, lookups would move the shared view of
+        # ArrayDoublyLinkedList away from a node that is being returned
+        priorities = {task.id: task.priority for task in self.tasks}
+        for priority, subq in enumerate(self.subqueues, start=1):
+            # with equal lengths, this maps every task to exactly one subqueue
+            for id in subq.tasks:
+                if priorities.get(id) != priority:
+                    raise ValueError(f"id {id} is in a wrong subqueue")
+
+            subq.index.check()
+            if len(subq.index) != len(subq.tasks) or any(
+                id not in subq.tasks for id in subq.index
+            ):
+                raise ValueError(f"index of priority {priority} differs from tasks")
+
+            if bool(subq.index) != bool(self.nonempty & (1 << (priority - 1))):
+                raise ValueError(f"wrong bitmap bit for priority {priority}")
+
+        if self.nonempty >> self.levels:
+            raise ValueError("bitmap has bits above the last level")
+
+        for id in self.delayed:
+            if self.tasks.get(id) is not None:
+                raise ValueError(f"id {id} is both queued and delayed")
+
+        for id, token in self.leased_ids.items():
+            lease = self.leases.get(token)
+            if lease is None or lease.task.id != id:
+                raise ValueError(f"leased id {id} has no lease")
+            if self.tasks.get(id) is not None or id in self.delayed:
+                raise ValueError(f"id {id} is both leased and queued or delayed")
+        if len(self.leased_ids) != len(self.leases):
+            raise ValueError("leases and leased ids lengths differ")
 
-        tasks_len = len(self.tasks)
-        assert subqs_len == tasks_len, ValueError("subqueues and tasks lengths differ")
-        return tasks_len
+    def _validate(self) -> None:
+        if self.validate:
+            self.check_invariants()
+
+    def _check_priority(self, priority: int) -> None:
+        if not 1 <= priority <= self.levels:
+            raise ValueError(f"priority {priority} does not exist")
+
+    def _check_not_held(self, ids) -> None:
+        # the list checks the ids of queued tasks only, not those of delayed
+        # and leased tasks
+        if (self.delayed or self.leased_ids) and not (
+            self.delayed.keys().isdisjoint(ids)
+            and self.leased_ids.keys().isdisjoint(ids)
+        ):
+            raise ValueError("duplicate id in tasks")
+
+    def subqueue(self, priority: int) -> SubQueue:
+        # TC: O(1); SC: O(1)
+        self._check_priority(priority)
+        return self.subqueues[priority - 1]
+
+    def nonempty_priorities(self):
+        # priorities that may hold tasks, from high to low; empty levels are
+        # skipped by taking the lowest set bit; TC: O(1) per yielded priority
+        bits = self.nonempty
+        while bits:
+            lowest = bits & -bits
+            yield lowest.bit_length()
+            bits ^= lowest
 
     def subq_len(self, subq_int: int):
-        return len(getattr(self, PriorityIntToName[subq_int]))
+        # TC: O(1); SC: O(1)
+        return len(self.subqueue(subq_int))
+
+    def subq_resources(self, subq_int: int) -> Resources:
+        # summed resources requested by the tasks of a subqueue; TC: O(1)
+        return self.subqueue(subq_int).index.sum_resources()
+
+    def next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+    def next_front_seq(self) -> int:
+        # key of a task put in front of its subqueue: below every key handed
+        # out so far, leased tasks' included, so the keys stay unique and a
+        # nacked task goes back to its exact place
+        return -self.next_seq()
 
-    def insert_task_id_to_subqueue(self, id: int, priority: int) -> None:
-        subq = getattr(self, PriorityIntToName[priority])
-        subq.tasks[id] = True
+    def _enter(self, subq: SubQueue, ids: list[int]) -> None:
+        # add ids to a subqueue with the epoch they enter in (0 if the queue
+        # does not age tasks); TC: O(K); SC: O(K)
+        epoch = 0 if self.aging is None else self.aging.epoch()
+        subq.tasks.update(dict.fromkeys(ids, epoch))
+        if self.aging is not None:
+            subq.enter(ids, epoch)
+
+    def age(self) -> None:
+        # promote tasks that have waited long enough, if the queue ages tasks
+        if self.aging is not None:
+            self.aging.tick()
+
+    def insert_task_id_to_subqueue(
+        self, id: int, priority: int, resources: Resources | None = None
+    ) -> None:
+        subq = self.subqueue(priority)
+        self._enter(subq, [id])
+        if resources is not None:
+            subq.index.append(id, resources, self.next_seq())
+            self.nonempty |= 1 << (priority - 1)
+
+    def insert_task_id_to_subqueue_left(
+        self, id: int, priority: int, resources: Resources
+    ) -> None:
+        subq = self.subqueue(priority)
+        self._enter(subq, [id])
+        subq.index.append_left(id, resources, self.next_front_seq())
+        self.nonempty |= 1 << (priority - 1)
 
     def pop_task_id_from_subqueue(self, id: int, priority: int) -> None:
-        subq = getattr(self, PriorityIntToName[priority])
+        subq = self.subqueue(priority)
         subq.tasks.pop(id)
+        subq.index.discard(id)
+        if not subq.index:
+            self.nonempty &= ~(1 << (priority - 1))
 
     def append(self, data: Task) -> None:
-        self.insert_task_id_to_subqueue(data.id, data.priority)
+        # the priority and then the id (by the list) are validated first, so a
+        # wrong task never reaches subqueues
+        self._check_priority(data.priority)
+        self._check_not_held([data.id])
         self.tasks.append(data)
+        self.insert_task_id_to_subqueue(data.id, data.priority, data.resources)
+        if self.wal is not None:
+            self.wal.write(Op.APPEND, data)
+        self._validate()
 
     def append_left(self, data: Task) -> None:
-        self.insert_task_id_to_subqueue(data.id, data.priority)
+        self._check_priority(data.priority)
+        self._check_not_held([data.id])
         self.tasks.append_left(data)
+        self.insert_task_id_to_subqueue_left(data.id, data.priority, data.resources)
+        if self.wal is not None:
+            self.wal.write(Op.APPEND_LEFT, data)
+        self._validate()
 
     def append_right(self, data: Task) -> None:
         self.append(data)
 
+    def extend(self, data: list[Task]) -> None:
+        # append many tasks at once; either all tasks are appended or none
+        # TC: O(K); SC: O(K)
+        data = list(data)
+
+        for task in data:
+            self._check_priority(task.priority)
+        self._check_not_held([task.id for task in data])
+
+        self._extend(data)
+        if self.wal is not None:
+            self.wal.write(Op.EXTEND, data)
+        self._validate()
+
+    def _extend(self, data: list[Task]) -> None:
+        # the list validates all ids before any subqueue is touched
+        self.tasks.extend(data)
+
+        tasks_by_priority = dict()
+        for task in data:
+            tasks_by_priority.setdefault(task.priority, []).append(
+                (task, self.next_seq())
+            )
+
+        for priority, tasks in tasks_by_priority.items():
+            subq = self.subqueues[priority - 1]
+            ids = [task.id for task, _ in tasks]
+            self._enter(subq, ids)
+            subq.index.extend(
+                ids, [task.resources for task, _ in tasks], [seq for _, seq in tasks]
+            )
+            self.nonempty |= 1 << (priority - 1)
+
     def pop(self, id: int) -> Node:
         curr_node = self.tasks.pop(id)
         self.pop_task_id_from_subqueue(id, curr_node.item.priority)
+        if self.wal is not None:
+            self.wal.write(Op.POP, id)
+        self._validate()
         return curr_node
 
     def pop_right(self) -> Node:
         curr_node = self.tasks.pop_right()
         self.pop_task_id_from_subqueue(curr_node.item.id, curr_node.item.priority)
+        if self.wal is not None:
+            self.wal.write(Op.POP, curr_node.item.id)
+        self._validate()
         return curr_node
 
     def pop_left(self) -> Node:
         curr_node = self.tasks.pop_left()
         self.pop_task_id_from_subqueue(curr_node.item.id, curr_node.item.priority)
+        if self.wal is not None:
+            self.wal.write(Op.POP, curr_node.item.id)
+        self._validate()
         return curr_node
 
     def insert_at_index(self, index: int, data: Task) -> None:
-        self.insert_task_id_to_subqueue(data.id, data.priority)
+        self._check_priority(data.priority)
+        self._check_not_held([data.id])
         curr_node = self.tasks.insert_at_index(index, data)
+        self.insert_task_id_to_subqueue(data.id, data.priority, data.resources)
+        if self.wal is not None:
+            self.wal.write(Op.INSERT, index, data)
+        self._validate()
         return curr_node
 
     def pop_at_index(self, index: int) -> Node:
         curr_node = self.tasks.pop_at_index(index)
         self.pop_task_id_from_subqueue(curr_node.item.id, curr_node.item.priority)
+        if self.wal is not None:
+            self.wal.write(Op.POP, curr_node.item.id)
+        self._validate()
         return curr_node
 
     def get_node_by_id(self, id: int) -> Node:
         return self.tasks.get(id)
 
+    def _get_task(self, id: int) -> Task:
+        node = self.tasks.get(id)
+        if node is None:
+            raise ValueError(f"id {id} not found in tasks")
+        return node.item
+
+    def _move_in_list(self, task: Task, other_id: int, before: bool) -> None:
+        # relink the task next to other_id; TC: depends on list_cls
+        self.tasks.pop(task.id)
+        if before:
+            self.tasks.insert_before(other_id, task)
+        else:
+            self.tasks.insert_after(other_id, task)
+
+    def change_priority(self, id: int, priority: int, position: str = "keep") -> None:
+        # move a task to another subqueue (or within its own one)
+        # position:
+        # - "keep": the task keeps its place in the list and its enqueue order,
+        #   i.e. it goes behind the tasks of the new subqueue enqueued before it
+        # - "front": the task becomes the first one of the new subqueue
+        # - "back": the task becomes the last one of the new subqueue
+        # TC: O(N / B + B) with B = ResourceIndex.block_size (+ list relinking)
+        self._check_priority(priority)
+
+        if position not in Positions:
+            raise ValueError(f"position {position} is not one of {Positions}")
+
+        task = self._get_task(id)
+        old_subq = self.subqueue(task.priority)
+        seq = old_subq.index.seq_of(id)
+        self.pop_task_id_from_subqueue(id, task.priority)
+
+        task.priority = priority
+        subq = self.subqueue(priority)
+        self._enter(subq, [id])
+        self.nonempty |= 1 << (priority - 1)
+
+        if position == "keep":
+            if not subq.index.has_room_at(seq):
+                (seq,) = self._respace(priority, [seq])
+            subq.index.insert_by_seq(id, task.resources, seq)
+        elif position == "front":
+            first_id = subq.index.first()
+            subq.index.append_left(id, task.resources, self.next_front_seq())
+            if first_id is not None:
+                self._move_in_list(task, first_id, before=True)
+        else:
+            last_id = subq.index.last()
+            subq.index.append(id, task.resources, self.next_seq())
+            if last_id is not None:
+                self._move_in_list(task, last_id, before=False)
+
+        if self.wal is not None:
+            self.wal.write(Op.CHANGE_PRIORITY, id, priority, position)
+        self._validate()
+
+    def _move_next_to(self, id: int, other_id: int, before: bool) -> None:
+        if id == other_id:
+            raise ValueError("task cannot be moved next to itself")
+
+        task, other_task = self._get_task(id), self._get_task(other_id)
+        if task.priority != other_task.priority:
+            raise ValueError("tasks of different priorities")
+
+        subq = self.subqueue(task.priority)
+        subq.index.remove(id)
+        # at either end the task gets a fresh key, as with append_left / append
+        if before and other_id == subq.index.first():
+            subq.index.append_left(id, task.resources, self.next_front_seq())
+        elif not before and other_id == subq.index.last():
+            subq.index.append(id, task.resources, self.next_seq())
+        else:
+            if not subq.index.has_room_next_to(other_id, before):
+                self._respace(task.priority)
+            if before:
+                subq.index.insert_before(other_id, id, task.resources)
+            else:
+                subq.index.insert_after(other_id, id, task.resources)
+
+        self._move_in_list(task, other_id, before)
+        if self.wal is not None:
+            self.wal.write(Op.MOVE_BEFORE if before else Op.MOVE_AFTER, id, other_id)
+        self._validate()
+
+    def _respace(self, priority: int, seqs: list[float] = ()) -> list[float]:
+        # spread the keys of a subqueue evenly over their span, once moves have
+        # used up the floats between two of them; keys of leased tasks of the
+        # subqueue and seqs are respaced along, so they keep their places, and
+        # the new seqs are returned. fresh keys are handed out if the span is
+        # too narrow. TC: O(N + L log L) with L leases
+        index = self.subqueues[priority - 1].index
+        leases = [
+            lease for lease in self.leases.values() if lease.task.priority == priority
+        ]
+        outside = [lease.seq for lease in leases] + list(seqs)
+
+        # a key outside the index follows an entry with the same key
+        _, index_seqs = index.columns()
+        merged = list(
+            heapq.merge(
+                zip(index_seqs, repeat(0), range(len(index_seqs))),
+                sorted(zip(outside, repeat(1), range(len(outside)))),
+            )
+        )
+
+        low, high = merged[0][0], merged[-1][0]
+        step = (high - low) / (len(merged) - 1)
+        keys = [low + ii * step for ii in range(len(merged))]
+        if not all(a < (a + b) / 2 < b for a, b in zip(keys, keys[1:])):
+            keys = [self.next_seq() for _ in merged]
+
+        new_index_seqs, new_outside = [], [None] * len(outside)
+        for key, (_, is_outside, ii) in zip(keys, merged):
+            if is_outside:
+                new_outside[ii] = key
+            else:
+                new_index_seqs.append(key)
+
+        index.respace(new_index_seqs)
+        for lease, seq in zip(leases, new_outside):
+            lease.seq = seq
+        return new_outside[len(leases) :]
+
+    def move_before(self, id: int, other_id: int) -> None:
+        # move a task right in front of another task of the same priority
+        # TC: O(N / B + B) with B = ResourceIndex.block_size (+ list relinking)
+        self._move_next_to(id, other_id, before=True)
+
+    def move_after(self, id: int, other_id: int) -> None:
+        # move a task right behind another task of the same priority
+        # TC: O(N / B + B) with B = ResourceIndex.block_size (+ list relinking)
+        self._move_next_to(id, other_id, before=False)
+
+    def index_of(self, id: int) -> int:
+        # position of the task in the queue; TC: depends on list_cls
+        return self.tasks.index_of(id)
+
 
 class TaskQueue(Queue):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.snapshots = dict()  # pid -> checkpoint of a background snapshot
+
+    def _to_snapshot(self, checkpoint: int) -> Snapshot:
+        # TC: O(N); SC: O(N)
+        # leased tasks are saved as queued ones at their place, so they are
+        # not lost if the queue is restored after a crash
+        leased = [[] for _ in self.subqueues]
+        for lease in self.leases.values():
+            leased[lease.task.priority - 1].append((lease.seq, lease.task.id))
+
+        # delayed tasks come last, in due order, with wall-clock due times
+        delayed = sorted(self.delayed.values())
+        offset = time.time() - self.clock()
+
+        tasks = list(self.tasks) + [lease.task for lease in self.leases.values()]
+        tasks.extend(task for _, _, task in delayed)
+        position = {task.id: ii for ii, task in enumerate(tasks)}
+
+        level_counts, dispatch, seqs = [], [], []
+        for subq, level_leased in zip(self.subqueues, leased):
+            subq_ids, subq_seqs = subq.index.columns()
+            if level_leased:
+                # a leased task goes behind a queued one with the same key,
+                # as on nack, and gets a key right above it
+                merged = heapq.merge(
+                    zip(subq_seqs, repeat(0), subq_ids),
+                    sorted((seq, 1, id) for seq, id in level_leased),
+                )
+                subq_seqs, subq_ids = [], []
+                for seq, _, id in merged:
+                    if subq_seqs and seq <= subq_seqs[-1]:
+                        seq = math.nextafter(subq_seqs[-1], math.inf)
+                    subq_seqs.append(seq)
+                    subq_ids.append(id)
+            level_counts.append(len(subq_ids))
+            dispatch.extend(map(position.__getitem__, subq_ids))
+            seqs.extend(subq_seqs)
+
+        resources = [task.resources for task in tasks]
+        return Snapshot(
+            id=self.id,
+            name=self.name,
+            levels=self.levels,
+            seq=self.seq,
+            checkpoint=checkpoint,
+            ids=[task.id for task in tasks],
+            priorities=[task.priority for task in tasks],
+            ram=[entry.ram for entry in resources],
+            cpu_cores=[entry.cpu_cores for entry in resources],
+            gpu_count=[entry.gpu_count for entry in resources],
+            contents=[task.content for task in tasks],
+            results=[task.result for task in tasks],
+            level_counts=level_counts,
+            dispatch=dispatch,
+            seqs=seqs,
+            not_before=[not_before + offset for not_before, _, _ in delayed],
+        )
+
+    def _restore(self, snapshot: Snapshot) -> None:
+        # fill an empty queue from snapshot columns; TC: O(N); SC: O(N)
+        # tuple.__new__ skips argument parsing of Resources.__new__
+        resources = list(
+            map(
+                tuple.__new__,
+                repeat(Resources),
+                zip(snapshot.ram, snapshot.cpu_cores, snapshot.gpu_count),
+            )
+        )
+        tasks = list(
+            map(
+                Task,
+                snapshot.ids,
+                snapshot.priorities,
+                resources,
+                snapshot.contents,
+                snapshot.results,
+            )
+        )
+        nqueued = len(tasks) - len(snapshot.not_before)
+        self.tasks.extend(tasks[:nqueued])
+
+        start = 0
+        for priority, count in enumerate(snapshot.level_counts, start=1):
+            positions = snapshot.dispatch[start : start + count]
+            ids = [snapshot.ids[pos] for pos in positions]
+
+            subq = self.subqueues[priority - 1]
+            self._enter(subq, ids)
+            subq.index.extend(
+                ids,
+                [resources[pos] for pos in positions],
+                snapshot.seqs[start : start + count],
+            )
+            if count:
+                self.nonempty |= 1 << (priority - 1)
+
+            start += count
+
+        self.seq = snapshot.seq
+
+        for task, not_before in zip(tasks[nqueued:], snapshot.not_before):
+            self.restore_delayed(task, not_before)
+
+    def snapshot(self, path: str, background: bool = False) -> int | None:
+        # save the whole queue state to path, see snapshot.py
+        # background: fork and let the child process write the snapshot from
+        # its copy-on-write view of the queue, which keeps serving right after
+        # the fork; returns the pid of the child, to pass to finish_snapshot
+        checkpoint = time.time_ns()
+        if self.wal is not None:
+            # logged changes up to here are part of the snapshot
+            self.wal.write(Op.CHECKPOINT, checkpoint)
+            self.wal.sync()
+
+        if background:
+            pid = os.fork()
+            if pid != 0:
+                self.snapshots[pid] = checkpoint
+                return pid
+
+            try:
+                write_snapshot(path, self._to_snapshot(checkpoint))
+            except BaseException:
+                traceback.print_exc()
+                os._exit(1)
+            os._exit(0)
+
+        write_snapshot(path, self._to_snapshot(checkpoint))
+        if self.wal is not None:
+            self.wal.truncate()
+        return None
+
+    def finish_snapshot(self, pid: int) -> None:
+        # wait for the child of a background snapshot, then drop the logged
+        # changes it holds, i.e. those up to its checkpoint; changes made since
+        # the fork stay in the log. the log is kept whole if the child failed
+        checkpoint = self.snapshots.pop(pid, None)
+        if checkpoint is None:
+            raise ValueError(f"no background snapshot with pid {pid}")
+
+        _, status = os.waitpid(pid, 0)
+        if status != 0:
+            raise ValueError(f"background snapshot {pid} failed")
+
+        if self.wal is not None:
+            self.wal.truncate_through(checkpoint)
+
+    @classmethod
+    def load(cls, path: str, wal: WriteAheadLog | None = None, **kwargs) -> "TaskQueue":
+        # rebuild a queue saved by snapshot and apply the changes logged after
+        # it; kwargs go to the constructor, e.g. list_cls; TC: O(N); SC: O(N)
+        gc_is_enabled = gc.isenabled()
+        # millions of new objects would trigger useless full collections
+        gc.disable()
+        try:
+            snapshot = read_snapshot(path)
+            queue = cls(snapshot.id, snapshot.name, levels=snapshot.levels, **kwargs)
+            queue._restore(snapshot)
+        finally:
+            if gc_is_enabled:
+                gc.enable()
+
+        if wal is not None:
+            wal.replay(queue, snapshot.checkpoint)
+            queue.wal = wal
+
+        queue._validate()
+        return queue
 
     def is_valid_with_resources(
         self, task: Task, available_resources: Resources
@@ -127,24 +666,305 @@ class TaskQueue(Queue):
         return False
 
     def get_task_from_subq(self, priority: int, available_resources: Resources) -> Task:
-        subq = getattr(self, PriorityIntToName[priority])
+        # earliest task of the subqueue that fits; TC: O(N / B + B); SC: O(1)
+        subq = self.subqueue(priority)
 
-        for task_id in subq.tasks.keys():
-            task_node = self.get_node_by_id(task_id)
-            if self.is_valid_with_resources(task_node.item, available_resources):
-                valid_task_node = self.pop(task_id)
-                return valid_task_node.item
+        # the resource frontier rules out the whole subqueue in O(1)
+        if not subq.index.may_fit(available_resources):
+            return False
 
-        return False
+        task_id = subq.index.find_first(available_resources)
+        if task_id is None:
+            return False
+
+        valid_task_node = self.pop(task_id)
+        return valid_task_node.item
+
+    def add_task(
+        self,
+        task: Task,
+        not_before: float | None = None,
+        dedup_key: Hashable | None = None,
+    ) -> Task | None:
+        # not_before: time of self.clock (time.monotonic by default) before
+        # which the task is not dispatched, e.g. queue.clock() + backoff. until
+        # then the task waits in a heap of due times outside its subqueue, so
+        # eligible tasks are dispatched as if it was not there; it joins the end
+        # of its subqueue when it becomes due. TC: O(log D) with D delayed tasks
+        # dedup_key: key of the logical job, for a queue with a Deduplicator; a
+        # task with a key added within the dedup window is not added, the task
+        # added first with that key is returned instead. a key known only by
+        # the Bloom filter may be new: the task is added, or dropped with None
+        # returned if the Deduplicator has reject_maybe. returns the task added
+        if dedup_key is not None:
+            if self.dedup is None:
+                raise ValueError("the queue has no Deduplicator for dedup keys")
+            seen, existing = self.dedup.find(dedup_key)
+            if existing is not None or (seen and self.dedup.reject_maybe):
+                return existing
+
+        self._add_task(task, not_before)
+        if dedup_key is not None:
+            self.dedup.add(dedup_key, task)
+        return task
+
+    def _add_task(self, task: Task, not_before: float | None) -> None:
+        if not_before is None or not_before <= self.clock():
+            self.append(task)
+            return
+
+        self._check_priority(task.priority)
+        if self.tasks.get(task.id) is not None:
+            raise ValueError("duplicate id in tasks")
+        self._check_not_held([task.id])
+
+        self._delay(task, not_before)
+        if self.wal is not None:
+            # a monotonic time means nothing after a restart
+            self.wal.write(Op.DELAY, not_before + time.time() - self.clock(), task)
+        self._validate()
+
+    def add_tasks(self, tasks) -> None:
+        self.extend(tasks)
+
+    def min_resources(self, priority: int) -> Resources | None:
+        # per-dimension minima of task resources of a subqueue; TC: O(1) amortized
+        subq = self.subqueue(priority)
+        return subq.index.min_resources()
+
+    def get_tasks_from_subq(
+        self, priority: int, available_resources: Resources, max_tasks: int
+    ) -> tuple[list[Task], Resources]:
+        # tasks of the subqueue that fit available resources together
+        subq = self.subqueue(priority)
+
+        if max_tasks <= 0 or not subq.index.may_fit(available_resources):
+            return [], available_resources
+
+        task_ids, leftover_resources = subq.index.pack(available_resources, max_tasks)
+        tasks = [self.pop(task_id).item for task_id in task_ids]
+
+        return tasks, leftover_resources
 
-    def add_task(self, task):
-        self.append(task)
+    def get_tasks(
+        self, available_resources: Resources, max_tasks: int
+    ) -> tuple[list[Task], Resources]:
+        # fill available resources with up to max_tasks tasks in a single pass;
+        # higher priorities are packed first, first-fit within every priority
+        self._promote_due()
+        self._expire_leases()
+        self.age()
+        tasks = []
+        for priority_int in self.nonempty_priorities():
+            subq_tasks, available_resources = self.get_tasks_from_subq(
+                priority_int, available_resources, max_tasks - len(tasks)
+            )
+            tasks.extend(subq_tasks)
+
+        return tasks, available_resources
 
     def get_task(self, available_resources: Resources) -> Task:
-        # start from high to low priority
-        for priority_int in PriorityIntToName.keys():
+        self._promote_due()
+        self._expire_leases()
+        self.age()
+        return self._dispatch(available_resources)
+
+    def _dispatch(self, available_resources: Resources) -> Task:
+        # start from high to low priority, skipping empty subqueues
+        for priority_int in self.nonempty_priorities():
             valid_task = self.get_task_from_subq(priority_int, available_resources)
             if valid_task is not False:
                 return valid_task
 
         return None
+
+    def lease_task(
+        self, available_resources: Resources, ttl: float
+    ) -> tuple[Task, int] | None:
+        # like get_task, but the task is only invisible until ack(token); it
+        # goes back to its place (priority and enqueue order) on nack(token) or
+        # once ttl seconds have passed. returns the task and its lease token
+        # TC: get_task + O(log L) with L leases
+        self._promote_due()
+        self._expire_leases()
+        self.age()
+
+        for priority in self.nonempty_priorities():
+            index = self.subqueues[priority - 1].index
+            if not index.may_fit(available_resources):
+                continue
+
+            id = index.find_first(available_resources)
+            if id is None:
+                continue
+
+            seq = index.seq_of(id)
+            task = self.pop(id).item
+            self.lease_token += 1
+            token = self.lease_token
+            self._lease(token, task, seq, self.clock() + ttl)
+            if self.wal is not None:
+                self.wal.write(Op.LEASE, token, seq, task)
+            return task, token
+
+        return None
+
+    def _lease(self, token: int, task: Task, seq: float, deadline: float) -> None:
+        self.leases[token] = Lease(task, seq, deadline)
+        self.leased_ids[task.id] = token
+        heapq.heappush(self.lease_deadlines, (deadline, token))
+
+    def restore_lease(self, token: int, seq: float, task: Task) -> None:
+        # a lease replayed from the log; its holder is gone, so it expires
+        # right away
+        self.lease_token = max(self.lease_token, token)
+        self._lease(token, task, seq, float("-inf"))
+
+    def _lease_of(self, token: int) -> Lease:
+        lease = self.leases.get(token)
+        if lease is None:
+            raise ValueError(f"lease {token} not found, it may have expired")
+        return lease
+
+    def ack(self, token: int) -> Task:
+        # the leased task is done and leaves the queue for good; TC: O(1)
+        lease = self._lease_of(token)
+        del self.leases[token]
+        del self.leased_ids[lease.task.id]
+        if self.wal is not None:
+            self.wal.write(Op.ACK, token, lease.task.id)
+        return lease.task
+
+    def renew(self, token: int, ttl: float) -> None:
+        # keep the task leased for ttl more seconds from now; TC: O(log L)
+        lease = self._lease_of(token)
+        lease.deadline = self.clock() + ttl
+        heapq.heappush(self.lease_deadlines, (lease.deadline, token))
+
+    def nack(self, token: int) -> Task:
+        # give the leased task back to its place right away
+        lease = self._lease_of(token)
+        self._requeue(token, lease)
+        return lease.task
+
+    def _requeue(self, token: int, lease: Lease) -> bool:
+        # TC: O(N / B + B) with B = ResourceIndex.block_size
+        del self.leases[token]
+        task = lease.task
+        del self.leased_ids[task.id]
+        if self.tasks.get(task.id) is not None:
+            # ids of leased tasks are rejected, but a log written before may
+            # reuse one; the queued task wins
+            if self.wal is not None:
+                self.wal.write(Op.ACK, token, task.id)
+            return False
+
+        self.tasks.append(task)
+
+        subq = self.subqueues[task.priority - 1]
+        self._enter(subq, [task.id])
+        seq = lease.seq
+        if not subq.index.has_room_at(seq):
+            (seq,) = self._respace(task.priority, [seq])
+        subq.index.insert_by_seq(task.id, task.resources, seq)
+        self.nonempty |= 1 << (task.priority - 1)
+
+        if self.wal is not None:
+            self.wal.write(Op.REQUEUE, token, task.id)
+        self._validate()
+        return True
+
+    def expire_leases(self) -> int:
+        # requeue tasks of expired leases, returns their number; done by
+        # get_task, get_tasks and lease_task too, call it e.g. from a timer
+        # when nothing else touches the queue for long
+        return self._expire_leases()
+
+    def _expire_leases(self) -> int:
+        # deadlines of acked or renewed leases are dropped lazily when they
+        # come up; TC: O(log L) per deadline popped
+        deadlines = self.lease_deadlines
+        if not deadlines:
+            return 0
+
+        now = self.clock()
+        expired = 0
+        while deadlines and deadlines[0][0] <= now:
+            deadline, token = heapq.heappop(deadlines)
+            lease = self.leases.get(token)
+            if lease is not None and lease.deadline == deadline:
+                self._requeue(token, lease)
+                expired += 1
+
+        return expired
+
+    def _delay(self, task: Task, not_before: float) -> None:
+        self.delayed_count += 1
+        entry = (not_before, self.delayed_count, task)
+        self.delayed[task.id] = entry
+        heapq.heappush(self.delayed_heap, entry)
+
+    def restore_delayed(self, task: Task, not_before: float) -> None:
+        # a delayed task from the log or a snapshot, due at a wall-clock time
+        self._delay(task, not_before - time.time() + self.clock())
+
+    def _forget_delayed(self) -> None:
+        # entries of promoted or cancelled tasks are left in the heap; it is
+        # rebuilt once they make up more than half of it. TC: O(1) amortized
+        if len(self.delayed_heap) > 2 * len(self.delayed):
+            self.delayed_heap = list(self.delayed.values())
+            heapq.heapify(self.delayed_heap)
+
+    def cancel_delayed(self, id: int) -> Task:
+        # remove a task that is not due yet; TC: O(1) amortized
+        entry = self.delayed.pop(id, None)
+        if entry is None:
+            raise ValueError(f"id {id} not found in delayed tasks")
+
+        self._forget_delayed()
+        if self.wal is not None:
+            self.wal.write(Op.CANCEL_DELAYED, id)
+        return entry[2]
+
+    def promote(self, ids) -> None:
+        # make delayed tasks eligible right away, in the given order
+        ids = list(ids)
+        for id in ids:
+            if id not in self.delayed:
+                raise ValueError(f"id {id} not found in delayed tasks")
+
+        tasks = [self.delayed.pop(id)[2] for id in ids]
+        self._forget_delayed()
+        self._promote(tasks)
+
+    def _promote(self, tasks: list[Task]) -> None:
+        # tasks join their subqueues as if they were added now; TC: O(K)
+        self._extend(tasks)
+        if self.wal is not None:
+            self.wal.write(Op.PROMOTE, [task.id for task in tasks])
+        self._validate()
+
+    def promote_due(self) -> int:
+        # promote delayed tasks that are due, returns their number; done by
+        # get_task, get_tasks and lease_task too, call it e.g. from a timer
+        # when nothing else touches the queue for long
+        return self._promote_due()
+
+    def _promote_due(self) -> int:
+        # TC: O(1) with nothing due, O(K log D) for K entries popped
+        heap = self.delayed_heap
+        if not heap:
+            return 0
+
+        now = self.clock()
+        due = []
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            task = entry[2]
+            if self.delayed.get(task.id) is entry:
+                del self.delayed[task.id]
+                due.append(task)
+
+        if due:
+            self._promote(due)
+        return len(due)
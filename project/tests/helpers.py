@@ -0,0 +1,26 @@
+from project.doubly_linked_list import DoublyLinkedList
+from project.resources import Resources
+from project.task import Task
+
+
+# manual clock for the time-based features, moved by setting `now`
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_task(
+    id: int, priority: int = 1, resources=Resources(1, 1, 0), content="some-content"
+) -> Task:
+    return Task(id, priority, resources, content, None)
+
+
+def linked_list_ids(dll: DoublyLinkedList) -> list[int]:
+    ids, node = [], dll.start_node
+    while node is not None:
+        ids.append(node.item.id)
+        node = node.next_item
+    return ids
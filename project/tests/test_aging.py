@@ -0,0 +1,119 @@
+import unittest
+
+from project.aging import AgingPolicy
+from project.resources import Resources
+from project.task_queue import TaskQueue
+from project.tests.helpers import Clock, make_task
+
+
+class TestAgingPolicy(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.tq = TaskQueue(1, "q1", validate=True)
+        self.aging = AgingPolicy(self.tq, interval=10, buckets=5, clock=self.clock)
+
+    def test_promotion_after_interval(self):
+        """Test a task is promoted once it has waited the interval"""
+        self.tq.add_task(make_task(1, 3))
+
+        self.clock.now = 11.9
+        self.assertEqual(self.aging.tick(), 0, msg="task promoted too early")
+        self.assertEqual(self.tq.get_node_by_id(1).item.priority, 3)
+
+        # the task entered in the first epoch [0, 2), which expires once its
+        # end is an interval ago
+        self.clock.now = 12.0
+        self.assertEqual(self.aging.tick(), 1, msg="task not promoted")
+        self.assertEqual(self.tq.get_node_by_id(1).item.priority, 2)
+
+        self.clock.now = 23.9
+        self.assertEqual(self.aging.tick(), 0, msg="task promoted twice")
+        self.clock.now = 24.0
+        self.assertEqual(self.aging.tick(), 1, msg="task not promoted again")
+        self.assertEqual(self.tq.get_node_by_id(1).item.priority, 1)
+
+        self.clock.now = 100.0
+        self.assertEqual(self.aging.tick(), 0, msg="highest task promoted")
+        self.assertEqual(self.aging.promoted, 2, msg="wrong promotion count")
+
+    def test_promoted_task_keeps_enqueue_order(self):
+        """Test a promoted task goes in front of later tasks of its new level"""
+        self.tq.add_task(make_task(1, 5))
+        self.clock.now = 5.0
+        self.tq.add_tasks([make_task(2, 4), make_task(3, 4)])
+
+        self.clock.now = 12.0
+        ids = [self.tq.get_task(Resources(1, 1, 0)).id for _ in range(3)]
+        self.assertEqual(ids, [1, 2, 3], msg="wrong order after promotion")
+
+    def test_no_promotion_before_interval(self):
+        """Test a task added in the middle of an epoch waits the whole interval"""
+        tq = TaskQueue(1, "q2", validate=True)
+        aging = AgingPolicy(tq, interval=10, buckets=2, clock=self.clock)
+        self.clock.now = 4.9
+        tq.add_task(make_task(1, 3))
+
+        for now in (9.9, 10.0, 14.8):
+            self.clock.now = now
+            self.assertEqual(aging.tick(), 0, msg="task promoted too early")
+
+        self.clock.now = 15.0
+        self.assertEqual(aging.tick(), 1, msg="task not promoted")
+
+    def test_starved_task_reaches_the_top(self):
+        """Test a lowest task overtakes a steady stream of higher tasks"""
+        self.tq.add_task(make_task(0, 5))
+
+        ids = []
+        for step in range(1, 60):
+            self.clock.now = step
+            self.tq.add_task(make_task(step, 1))
+            ids.append(self.tq.get_task(Resources(1, 1, 0)).id)
+
+        self.assertIn(0, ids, msg="lowest task starved")
+        self.assertLessEqual(ids.index(0), 47, msg="lowest task promoted too late")
+
+    def test_tasks_that_left_are_not_promoted(self):
+        """Test a task popped and added again waits the whole interval again"""
+        self.tq.add_task(make_task(1, 4))
+        self.clock.now = 6.0
+        self.tq.pop(1)
+        self.tq.add_task(make_task(1, 4))
+        self.tq.change_priority(1, 4)
+
+        self.clock.now = 10.0
+        self.assertEqual(self.aging.tick(), 0, msg="re-added task promoted early")
+        self.clock.now = 17.9
+        self.assertEqual(self.aging.tick(), 0, msg="re-added task promoted early")
+        self.clock.now = 18.0
+        self.assertEqual(self.aging.tick(), 1, msg="re-added task not promoted")
+        self.assertEqual(self.tq.get_node_by_id(1).item.priority, 3)
+        self.assertEqual(
+            [len(subq.entries) for subq in self.tq.subqueues],
+            [0, 0, 1, 0, 0],
+            msg="expired entries are kept",
+        )
+
+    def test_attach_and_detach(self):
+        """Test queued tasks age from attaching on and stop at detaching"""
+        tq = TaskQueue(1, "q2", validate=True)
+        tq.add_tasks(make_task(ii, 5) for ii in range(3))
+
+        clock = Clock()
+        clock.now = 100.0
+        aging = AgingPolicy(tq, interval=1, clock=clock)
+        clock.now = 101.125
+        self.assertEqual(aging.tick(), 3, msg="queued tasks not promoted")
+
+        aging.detach()
+        self.assertIsNone(tq.aging, msg="policy still attached")
+        clock.now = 110.0
+        tq.get_task(Resources(0, 0, 0))
+        self.assertEqual(tq.subq_len(4), 3, msg="tasks promoted after detach")
+
+        with self.assertRaises(ValueError):
+            AgingPolicy(tq, interval=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import random
+import unittest
+
+from project.array_linked_list import EMPTY, ArrayDoublyLinkedList
+from project.doubly_linked_list import DoublyLinkedList
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+from project.tests.helpers import linked_list_ids, make_task
+
+
+def array_list_ids(dll: ArrayDoublyLinkedList) -> list[int]:
+    ids, slot = [], dll.start_slot
+    while slot != EMPTY:
+        ids.append(dll.items[slot].id)
+        slot = dll.next_items[slot]
+
+    # the backward links must describe the same order
+    backward_ids, slot = [], dll.end_slot
+    while slot != EMPTY:
+        backward_ids.append(dll.items[slot].id)
+        slot = dll.prev_items[slot]
+
+    assert backward_ids[::-1] == ids, "prev and next links disagree"
+    return ids
+
+
+class TestArrayDoublyLinkedList(unittest.TestCase):
+    def test_append_and_pop(self):
+        """Test appending and popping from both ends and by id"""
+        dll = ArrayDoublyLinkedList(capacity=2)
+        self.assertTrue(dll.is_empty(), msg="doubly_linked_list is not empty")
+        self.assertIsNone(dll.pop_left(), msg="pop from an empty list")
+
+        for ii in range(5):
+            dll.append(make_task(ii))
+        dll.append_left(make_task(10))
+
+        self.assertEqual(array_list_ids(dll), [10, 0, 1, 2, 3, 4])
+        self.assertEqual(dll.get(3).item.id, 3, msg="wrong node by id")
+        self.assertIsNone(dll.get(30), msg="node found for a missing id")
+
+        self.assertEqual(dll.pop_left().item.id, 10, msg="wrong popped task")
+        self.assertEqual(dll.pop_right().item.id, 4, msg="wrong popped task")
+        self.assertEqual(dll.pop(2).item.id, 2, msg="wrong popped task")
+        self.assertEqual(array_list_ids(dll), [0, 1, 3])
+
+        with self.assertRaises(ValueError):
+            dll.append(make_task(1))
+        with self.assertRaises(ValueError):
+            dll.pop(2)
+
+    def test_slots_are_reused(self):
+        """Test released slots are reused before the buffers grow"""
+        dll = ArrayDoublyLinkedList(capacity=4)
+        for ii in range(4):
+            dll.append(make_task(ii))
+
+        dll.pop(1)
+        dll.pop(2)
+        dll.append(make_task(4))
+        dll.append(make_task(5))
+
+        self.assertEqual(len(dll.items), 4, msg="buffers grew with free slots")
+        self.assertEqual(array_list_ids(dll), [0, 3, 4, 5])
+
+        dll.append(make_task(6))
+        self.assertEqual(len(dll.items), 16, msg="buffers did not grow")
+
+    def test_no_node_per_operation(self):
+        """Test operations return the same view instead of new nodes"""
+        dll = ArrayDoublyLinkedList()
+        tasks = [make_task(ii) for ii in range(3)]
+        extended = tasks[:2]
+        self.assertIs(dll.extend(extended), extended, msg="extend created nodes")
+
+        view = dll.append(tasks[2])
+        self.assertIs(dll.get(1), view, msg="get allocated a node")
+        self.assertEqual(view.item, tasks[1], msg="view of a wrong task")
+        self.assertIs(dll.pop_left(), view, msg="pop_left allocated a node")
+        self.assertEqual(view.item, tasks[0], msg="view of a wrong task")
+        self.assertIs(dll.pop_right(), view, msg="pop_right allocated a node")
+        self.assertEqual(view.item, tasks[2], msg="view of a wrong task")
+        self.assertIs(dll.pop(1), view, msg="pop allocated a node")
+
+    def test_same_behaviour_as_doubly_linked_list(self):
+        """Test random operations against DoublyLinkedList"""
+        rng = random.Random(3)
+        dll, array_dll = DoublyLinkedList(), ArrayDoublyLinkedList(capacity=1)
+        next_id = 0
+
+        for _ in range(3000):
+            operation = rng.choice(
+                ["append", "append_left", "extend", "insert_at_index"]
+                + ["pop", "pop_left", "pop_right", "pop_at_index"]
+            )
+            args = []
+            if operation in ("append", "append_left"):
+                args = [make_task(next_id)]
+                next_id += 1
+            elif operation == "extend":
+                args = [[make_task(next_id + ii) for ii in range(rng.randint(0, 3))]]
+                next_id += len(args[0])
+            elif operation == "insert_at_index":
+                if len(dll) == 0:
+                    continue
+                args = [rng.randrange(len(dll)), make_task(next_id)]
+                next_id += 1
+            elif operation == "pop":
+                if len(dll) == 0:
+                    continue
+                args = [rng.choice(linked_list_ids(dll))]
+            elif operation == "pop_at_index":
+                if len(dll) == 0:
+                    continue
+                args = [rng.randrange(len(dll))]
+
+            expected = getattr(dll, operation)(*args)
+            result = getattr(array_dll, operation)(*args)
+
+            if operation.startswith("pop") and expected is not None:
+                self.assertEqual(result.item, expected.item, msg=operation)
+
+            self.assertEqual(array_list_ids(array_dll), linked_list_ids(dll))
+
+    def test_task_queue_engine(self):
+        """Test TaskQueue running on the array engine"""
+        tq = TaskQueue(1, "q1", list_cls=ArrayDoublyLinkedList)
+        tasks = [
+            Task(ii, ii % 5 + 1, Resources(ii, ii, ii), "c", 0) for ii in range(20)
+        ]
+        tq.add_tasks(tasks[:10])
+        for task in tasks[10:]:
+            tq.add_task(task)
+
+        self.assertIsInstance(tq.tasks, ArrayDoublyLinkedList)
+        self.assertEqual(len(tq), 20, msg="wrong queue length")
+        self.assertEqual(tq.get_task(Resources(7, 7, 7)), tasks[0])
+        self.assertEqual(tq.get_task(Resources(7, 7, 7)), tasks[5])
+        self.assertEqual(tq.pop(1).item, tasks[1], msg="wrong popped task")
+        self.assertEqual(len(tq), 17, msg="wrong queue length")
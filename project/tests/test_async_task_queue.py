@@ -0,0 +1,132 @@
+import asyncio
+import unittest
+
+from project.aging import AgingPolicy
+from project.async_task_queue import AsyncTaskQueue
+from project.resources import Resources
+from project.task import Task
+from project.tests.helpers import Clock
+
+
+class TestAsyncTaskQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_get_task(self):
+        """Test getting an already queued task"""
+        tq = AsyncTaskQueue(1, "q1")
+        task = Task(1, 1, Resources(2, 2, 2), "some-content", 123)
+        await tq.add_task(task)
+
+        self.assertIsNone(tq.get_task_nowait(Resources(1, 1, 1)))
+        self.assertEqual(await tq.get_task(Resources(2, 2, 2)), task)
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
+
+    async def test_get_task_timeout(self):
+        """Test waiting for a task returns None after the timeout"""
+        tq = AsyncTaskQueue(1, "q1")
+        await tq.add_task(Task(1, 1, Resources(2, 2, 2), "some-content", 123))
+
+        self.assertIsNone(await tq.get_task(Resources(1, 1, 1), timeout=0.01))
+        self.assertEqual(tq.waiters, [], msg="timed out waiter is not removed")
+        self.assertEqual(len(tq), 1, msg="wrong queue length")
+
+    async def test_waiter_gets_fitting_task(self):
+        """Test a waiting consumer is resumed only by a task that fits it"""
+        tq = AsyncTaskQueue(1, "q1")
+        consumer = asyncio.create_task(tq.get_task(Resources(2, 2, 0)))
+        await asyncio.sleep(0)
+
+        large_task = Task(1, 1, Resources(8, 8, 1), "some-content", 123)
+        await tq.add_task(large_task)
+        await asyncio.sleep(0)
+        self.assertFalse(consumer.done(), msg="consumer resumed by a large task")
+
+        small_task = Task(2, 3, Resources(1, 1, 0), "some-content", 123)
+        await tq.add_task(small_task)
+
+        self.assertEqual(await consumer, small_task, msg="wrong task handed over")
+        self.assertEqual(len(tq), 1, msg="wrong queue length")
+
+    async def test_cancelled_waiter(self):
+        """Test a cancelled consumer neither leaks a waiter nor loses a task"""
+        tq = AsyncTaskQueue(1, "q1")
+        consumer = asyncio.create_task(tq.get_task(Resources(2, 2, 0)))
+        await asyncio.sleep(0)
+
+        consumer.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await consumer
+        self.assertEqual(tq.waiters, [], msg="cancelled waiter is not removed")
+
+        # cancel right after a task was handed over
+        consumer = asyncio.create_task(tq.get_task(Resources(2, 2, 0)))
+        await asyncio.sleep(0)
+        task = Task(1, 1, Resources(1, 1, 0), "some-content", 123)
+        await tq.add_task(task)
+        consumer.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await consumer
+
+        self.assertEqual(len(tq), 1, msg="handed over task is lost")
+        self.assertEqual(tq.get_task_nowait(Resources(1, 1, 0)), task)
+
+    async def test_hand_over_at_timeout(self):
+        """Test a task handed over as the wait times out is not lost"""
+        tq = AsyncTaskQueue(1, "q1")
+        consumer = asyncio.create_task(tq.get_task(Resources(1, 1, 0), timeout=0))
+        await asyncio.sleep(0)
+
+        task = Task(1, 1, Resources(1, 1, 0), "some-content", 123)
+        await tq.add_task(task)
+        results = [await consumer, tq.get_task_nowait(Resources(1, 1, 0))]
+
+        self.assertIn(task, results, msg="handed over task is lost")
+        self.assertEqual(tq.waiters, [], msg="timed out waiter is not removed")
+
+    async def test_stream(self):
+        """Test consuming tasks with async for"""
+        tq = AsyncTaskQueue(1, "q1", chunk_size=3)
+        tasks = [Task(ii, 1, Resources(1, 1, 0), "c", None) for ii in range(10)]
+
+        received = []
+
+        async def consume():
+            async for task in tq.stream(Resources(1, 1, 0)):
+                received.append(task)
+                if len(received) == len(tasks):
+                    return
+
+        consumer = asyncio.create_task(consume())
+        await tq.add_tasks(tasks[:5])
+        await asyncio.sleep(0)
+        await tq.add_tasks(tasks[5:])
+        await asyncio.wait_for(consumer, 1)
+
+        self.assertEqual(received, tasks, msg="wrong streamed tasks")
+
+    async def test_get_tasks(self):
+        """Test batch dispatch of the async queue"""
+        tq = AsyncTaskQueue(1, "q1")
+        await tq.add_tasks(
+            [Task(ii, ii % 5 + 1, Resources(2, 2, 0), "c", None) for ii in range(10)]
+        )
+
+        tasks, leftover = await tq.get_tasks(Resources(10, 10, 0), 10)
+        self.assertEqual([task.id for task in tasks], [0, 5, 1, 6, 2])
+        self.assertEqual(leftover, Resources(0, 0, 0), msg="wrong leftover")
+
+    async def test_get_tasks_runs_timers(self):
+        """Test batch dispatch promotes due tasks, expires leases and ages tasks"""
+        clock = Clock()
+        tq = AsyncTaskQueue(1, "q1")
+        tq.queue.clock = clock
+        AgingPolicy(tq.queue, interval=10, buckets=1, clock=clock)
+
+        await tq.add_task(Task(1, 1, Resources(1, 1, 0), "c", None))
+        _, token = tq.queue.lease_task(Resources(1, 1, 0), ttl=5)
+        tq.queue.add_task(Task(2, 1, Resources(1, 1, 0), "c", None), not_before=5)
+        await tq.add_task(Task(3, 5, Resources(1, 1, 0), "c", None))
+
+        clock.now = 20
+        tasks, _ = await tq.get_tasks(Resources(2, 2, 0), 2)
+        self.assertEqual([task.id for task in tasks], [1, 2], msg="wrong tasks")
+        self.assertEqual(tq.queue.leases, dict(), msg="lease did not expire")
+        self.assertEqual(tq.queue.subq_len(4), 1, msg="task not promoted")
@@ -0,0 +1,121 @@
+import unittest
+
+from project.backfill import BackfillScheduler
+from project.resources import Resources
+from project.task_queue import TaskQueue
+from project.tests.helpers import Clock, make_task
+
+
+class TestBackfillScheduler(unittest.TestCase):
+    def setUp(self):
+        # the expected runtime of a task is kept in its content
+        self.clock = Clock()
+        self.tq = TaskQueue(1, "q1", validate=True)
+        self.scheduler = BackfillScheduler(
+            self.tq,
+            Resources(8, 8, 0),
+            runtime=lambda task: task.content,
+            clock=self.clock,
+        )
+
+    def start_all(self) -> list[int]:
+        ids = []
+        while (task := self.scheduler.get_task()) is not None:
+            ids.append(task.id)
+        return ids
+
+    def test_head_first(self):
+        """Test tasks are started in priority order while they fit"""
+        self.tq.add_tasks(
+            [
+                make_task(1, 3, Resources(2, 2, 0), 1.0),
+                make_task(2, 1, Resources(4, 4, 0), 1.0),
+                make_task(3, 2, Resources(2, 2, 0), 1.0),
+            ]
+        )
+
+        self.assertEqual(self.start_all(), [2, 3, 1], msg="wrong start order")
+        self.assertEqual(self.scheduler.free(), Resources(0, 0, 0))
+        self.assertEqual(self.scheduler.backfilled, 0, msg="wrong backfill count")
+
+        self.scheduler.finish(2)
+        self.assertEqual(self.scheduler.free(), Resources(4, 4, 0))
+        with self.assertRaises(KeyError):
+            self.scheduler.finish(2)
+
+    def test_backfill_does_not_delay_the_head(self):
+        """Test only tasks that end by the shadow time or fit the extra start"""
+        self.tq.add_task(make_task(1, 1, Resources(6, 6, 0), 10.0))
+        self.assertEqual(self.start_all(), [1])
+
+        # the head needs 8 cores, available at time 10
+        self.tq.add_tasks(
+            [
+                make_task(2, 1, Resources(8, 8, 0), 5.0),
+                make_task(3, 2, Resources(2, 2, 0), 20.0),
+                make_task(4, 3, Resources(1, 1, 0), 10.0),
+                make_task(5, 3, Resources(1, 1, 0), 5.0),
+            ]
+        )
+        self.assertEqual(self.start_all(), [4, 5], msg="wrong backfilled tasks")
+        self.assertEqual(self.scheduler.backfilled, 2, msg="wrong backfill count")
+
+        self.clock.now = 10.0
+        for id in (1, 4, 5):
+            self.scheduler.finish(id)
+        self.assertEqual(self.start_all(), [2], msg="head did not start in time")
+
+    def test_backfill_into_extra_resources(self):
+        """Test a long task starts if it only uses resources the head leaves"""
+        self.tq.add_task(make_task(1, 1, Resources(6, 6, 0), 10.0))
+        self.assertEqual(self.start_all(), [1])
+
+        # at time 10 the head uses 4 of 8 cores, 2 of the extra ones are free
+        self.tq.add_tasks(
+            [
+                make_task(2, 1, Resources(4, 4, 0), 5.0),
+                make_task(3, 2, Resources(2, 2, 0), 100.0),
+                make_task(4, 2, Resources(1, 1, 0), 9),
+            ]
+        )
+        self.assertEqual(self.start_all(), [3], msg="wrong backfilled tasks")
+
+        self.clock.now = 10.0
+        self.scheduler.finish(1)
+        self.assertEqual(self.start_all(), [2, 4], msg="wrong start order")
+
+    def test_head_larger_than_capacity(self):
+        """Test tasks are started first-fit when the head can never fit"""
+        self.tq.add_tasks(
+            [
+                make_task(1, 1, Resources(16, 16, 0), 1.0),
+                make_task(2, 2, Resources(2, 2, 0), 100.0),
+            ]
+        )
+
+        self.assertEqual(self.start_all(), [2], msg="wrong started tasks")
+        self.assertEqual(self.scheduler.backfilled, 0, msg="wrong backfill count")
+        self.assertEqual(len(self.tq), 1, msg="wrong queue length")
+
+    def test_depth(self):
+        """Test at most `depth` fitting tasks are considered for backfill"""
+        self.scheduler.depth = 2
+        self.tq.add_task(make_task(1, 1, Resources(6, 6, 0), 10.0))
+        self.start_all()
+
+        self.tq.add_tasks(
+            [
+                make_task(2, 1, Resources(8, 8, 0), 5.0),
+                make_task(3, 2, Resources(1, 1, 0), 50.0),
+                make_task(4, 2, Resources(1, 1, 0), 50.0),
+                make_task(5, 2, Resources(1, 1, 0), 5.0),
+            ]
+        )
+        self.assertEqual(self.start_all(), [], msg="deep task backfilled")
+
+        self.scheduler.depth = 3
+        self.assertEqual(self.start_all(), [5], msg="task not backfilled")
+
+
+if __name__ == "__main__":
+    unittest.main()
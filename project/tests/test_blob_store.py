@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+
+from project.blob_store import BlobHandle, BlobStore
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = self.dir.name
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_put_and_view(self):
+        """Test blobs are read back as read-only views of the mapping"""
+        with BlobStore(self.path, segment_size=4096) as store:
+            payloads = [b"", b"x", os.urandom(1000), "ünïcode".encode()]
+            handles = [store.put(payload) for payload in payloads]
+            handles.append(store.put("ünïcode"))
+
+            for handle, payload in zip(handles, payloads + ["ünïcode".encode()]):
+                view = store.view(handle)
+                self.assertEqual(view, payload, msg="wrong blob")
+                self.assertTrue(view.readonly, msg="view is writable")
+                view.release()
+
+            offsets = [handle.offset for handle in handles]
+            self.assertTrue(all(offset % 8 == 0 for offset in offsets))
+            self.assertEqual(len(set(offsets)), len(offsets), msg="blobs overlap")
+
+    def test_views_share_memory(self):
+        """Test a view is no copy: it sees changes of the mapping"""
+        with BlobStore(self.path, segment_size=4096) as store:
+            handle = store.put(b"abcd")
+            view = store.view(handle)
+            store.views[handle.segment][handle.offset] = ord("z")
+            self.assertEqual(bytes(view), b"zbcd", msg="view is a copy")
+            view.release()
+
+    def test_segments(self):
+        """Test blobs go to new segments when full, large ones to their own"""
+        with BlobStore(self.path, segment_size=4096) as store:
+            small = [store.put(b"s" * 1000) for _ in range(5)]
+            large = store.put(b"l" * 10000)
+            after = store.put(b"a" * 100)
+
+            self.assertEqual([handle.segment for handle in small], [0, 0, 0, 0, 1])
+            self.assertEqual(large.segment, 2, msg="large blob not on its own")
+            # the rest of segment 1 is reused before a new segment is added
+            self.assertEqual(after.segment, 1, msg="free space not reused")
+            self.assertEqual(store.view(large), b"l" * 10000, msg="wrong blob")
+            self.assertEqual(len(os.listdir(self.path)), 3, msg="wrong files")
+
+    def test_free_and_reuse(self):
+        """Test freed extents are merged and reused best-fit"""
+        with BlobStore(self.path, segment_size=1 << 16) as store:
+            handles = [store.put(bytes([ii]) * 100) for ii in range(6)]
+
+            store.free(handles[1])
+            store.free(handles[3])
+            store.free(handles[2])
+            self.assertEqual(list(store.free_at.values()), [312], msg="not merged")
+
+            # best fit: the merged extent of 312 bytes, not the end
+            reused = store.put(b"r" * 300)
+            self.assertEqual(reused.offset, handles[1].offset, msg="not reused")
+            self.assertEqual(store.view(handles[4]), bytes([4]) * 100)
+
+            # freeing the last blob gives its space back to the end
+            used = store.used[0]
+            store.free(handles[5])
+            self.assertEqual(store.used[0], used - 104, msg="end not lowered")
+            self.assertEqual(store.stats(), (6 * 104 - 104, 312 - 304))
+
+    def test_double_free(self):
+        """Test freeing a blob twice or a wrong handle raises"""
+        with BlobStore(self.path, segment_size=1 << 16) as store:
+            handles = [store.put(bytes([ii]) * 100) for ii in range(4)]
+
+            store.free(handles[1])
+            store.free(handles[2])
+            for handle in (
+                handles[1],
+                handles[2],
+                BlobHandle(0, handles[1].offset + 8, 50),
+                BlobHandle(0, store.used[0], 8),
+                BlobHandle(1, 8, 8),
+            ):
+                with self.assertRaises(ValueError):
+                    store.free(handle)
+
+            # the end of the segment is given back, its blob cannot be freed again
+            store.free(handles[3])
+            with self.assertRaises(ValueError):
+                store.free(handles[3])
+
+            self.assertEqual(list(store.free_at.values()), [], msg="wrong extents")
+            store.free(handles[0])
+            self.assertEqual(store.stats(), (0, 0), msg="wrong stats")
+
+    def test_reopen(self):
+        """Test a reopened store keeps its blobs and appends after them"""
+        with BlobStore(self.path, segment_size=4096) as store:
+            handles = [store.put(bytes([ii]) * 3000) for ii in range(3)]
+            store.sync()
+
+        with BlobStore(self.path, segment_size=4096) as store:
+            for ii, handle in enumerate(handles):
+                self.assertEqual(store.view(handle), bytes([ii]) * 3000)
+            handle = store.put(b"new")
+            self.assertNotIn(
+                (handle.segment, handle.offset),
+                [(handle.segment, handle.offset) for handle in handles],
+            )
+
+    def test_wrong_segment_size(self):
+        """Test a segment must be larger than its header"""
+        with self.assertRaises(ValueError):
+            BlobStore(self.path, segment_size=8)
+
+    def test_handles_in_a_queue(self):
+        """Test tasks carry handles through the queue and a snapshot"""
+        snapshot_path = os.path.join(self.path, "queue.snapshot")
+        with BlobStore(os.path.join(self.path, "blobs")) as store:
+            tq = TaskQueue(1, "q1")
+            payloads = [os.urandom(10_000) for _ in range(3)]
+            tq.add_tasks(
+                Task(ii, 1, Resources(1, 1, 0), store.put(payload), None)
+                for ii, payload in enumerate(payloads)
+            )
+            tq.snapshot(snapshot_path)
+            self.assertLess(os.path.getsize(snapshot_path), 1000)
+
+            loaded = TaskQueue.load(snapshot_path)
+            for payload in payloads:
+                task = loaded.get_task(Resources(1, 1, 0))
+                self.assertIsInstance(task.content, BlobHandle)
+                self.assertEqual(store.view(task.content), payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
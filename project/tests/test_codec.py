@@ -0,0 +1,62 @@
+import unittest
+
+from project.blob_store import BlobHandle
+from project.codec import decode_task, decode_value, encode_task, encode_value
+from project.resources import Resources
+from project.task import Task
+
+
+class TestCodec(unittest.TestCase):
+    def test_values(self):
+        """Test encoding and decoding values of every tag"""
+        values = [None, 0, -(2**63), 2**63 - 1, 2**70, "", "ünïcode", b"\x00\x01"]
+        values += [{"key": [1, 2.5]}, 1.5]
+
+        for value in values:
+            encoded = encode_value(value)
+            decoded, offset = decode_value(encoded)
+            self.assertEqual(decoded, value, msg="wrong decoded value")
+            self.assertEqual(offset, len(encoded), msg="wrong offset")
+
+    def test_blob_handle(self):
+        """Test a BlobHandle is encoded as a handle, not as a pickle"""
+        handle = BlobHandle(1, 4096, 5 << 20)
+        encoded = encode_value(handle)
+        decoded, offset = decode_value(encoded)
+
+        self.assertIsInstance(decoded, BlobHandle, msg="wrong decoded type")
+        self.assertEqual(decoded, handle, msg="wrong decoded handle")
+        self.assertEqual(len(encoded), 25, msg="handle is not compact")
+        self.assertEqual(offset, len(encoded), msg="wrong offset")
+
+    def test_untrusted(self):
+        """Test untrusted decoding refuses pickled values and keeps the others"""
+        task = Task(1, 1, Resources(1, 2, 3), "some-content", 123)
+        self.assertEqual(decode_task(encode_task(task), trusted=False)[0], task)
+
+        for task in (
+            Task(2, 1, Resources(1, 1, 1), {"a": 1}, None),
+            Task(3, 1, Resources(1, 1, 1), "some-content", [1, 2]),
+        ):
+            with self.assertRaises(ValueError, msg="pickled value is decoded"):
+                decode_task(encode_task(task), trusted=False)
+
+    def test_concatenated_tasks(self):
+        """Test decoding tasks one after another from a single buffer"""
+        tasks = [
+            Task(1, 1, Resources(1, 2, 3), "some-content", 123),
+            Task(-2, 5, Resources(0, 0, 0), b"raw", None),
+            Task(3, 2, Resources(2**40, 1, 0), {"a": 1}, "done"),
+        ]
+        buf = memoryview(b"".join(encode_task(task) for task in tasks))
+
+        offset = 0
+        for task in tasks:
+            decoded, offset = decode_task(buf, offset)
+            self.assertEqual(decoded, task, msg="wrong decoded task")
+        self.assertEqual(offset, len(buf), msg="wrong offset")
+
+    def test_truncated(self):
+        """Test a truncated value is detected"""
+        with self.assertRaises(ValueError):
+            decode_value(encode_value("some-content")[:-1])
@@ -0,0 +1,240 @@
+import threading
+import time
+import unittest
+
+from project.concurrent_task_queue import ConcurrentTaskQueue, Waiter
+from project.resources import Resources
+from project.task import Task
+from project.tests.helpers import Clock
+
+
+class TestConcurrentTaskQueue(unittest.TestCase):
+    def test_get_task_without_blocking(self):
+        """Test non-blocking get_task behaves like TaskQueue.get_task"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        task = Task(1, 1, Resources(2, 2, 2), "some-content", 123)
+        tq.add_task(task)
+
+        self.assertIsNone(tq.get_task(Resources(1, 1, 1), block=False))
+        self.assertEqual(tq.get_task(Resources(2, 2, 2), block=False), task)
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
+
+    def test_get_task_timeout(self):
+        """Test blocking get_task returns None after the timeout"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        tq.add_task(Task(1, 1, Resources(2, 2, 2), "some-content", 123))
+
+        start = time.monotonic()
+        self.assertIsNone(tq.get_task(Resources(1, 1, 1), timeout=0.05))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+        self.assertEqual(tq.waiters, [], msg="timed out waiter is not removed")
+        self.assertEqual(len(tq), 1, msg="wrong queue length")
+
+    def test_blocked_consumer_gets_fitting_task(self):
+        """Test a blocked consumer is woken only by a task that fits it"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        results = []
+
+        consumer = threading.Thread(
+            target=lambda: results.append(tq.get_task(Resources(2, 2, 0), timeout=5))
+        )
+        consumer.start()
+        while not tq.waiters:
+            time.sleep(0.001)
+
+        waiter = tq.waiters[0]
+        large_task = Task(1, 1, Resources(8, 8, 1), "some-content", 123)
+        tq.add_task(large_task)
+        self.assertFalse(waiter.event.is_set(), msg="waiter woken by a large task")
+
+        small_task = Task(2, 3, Resources(1, 1, 0), "some-content", 123)
+        tq.add_task(small_task)
+        consumer.join(timeout=5)
+
+        self.assertEqual(results, [small_task], msg="wrong task handed over")
+        self.assertEqual(len(tq), 1, msg="wrong queue length")
+        self.assertEqual(tq.get_task(Resources(8, 8, 1), block=False), large_task)
+
+    def test_due_task_is_handed_over(self):
+        """Test a delayed task is handed over to a waiter once it is due"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        task = Task(1, 1, Resources(1, 1, 0), "some-content", 123)
+        tq.add_task(task, not_before=tq.clock() + 0.05)
+
+        results = []
+        consumer = threading.Thread(
+            target=lambda: results.append(tq.get_task(Resources(1, 1, 0), timeout=5))
+        )
+        consumer.start()
+        while not tq.waiters:
+            time.sleep(0.001)
+
+        time.sleep(0.05)
+        self.assertEqual(tq.promote_due(), 1, msg="task not promoted")
+        consumer.join(timeout=5)
+
+        self.assertEqual(results, [task], msg="wrong task handed over")
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
+
+    def test_inserts_are_handed_over(self):
+        """Test a task inserted by any method is handed over to a waiter"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        tq.add_task(Task(100, 1, Resources(8, 8, 1), "some-content", 123))
+        inserts = [
+            lambda task: tq.append_left(task),
+            lambda task: tq.insert_at_index(0, task),
+            lambda task: tq.extend([task]),
+        ]
+
+        for id, insert in enumerate(inserts):
+            results = []
+            consumer = threading.Thread(
+                target=lambda: results.append(
+                    tq.get_task(Resources(1, 1, 0), timeout=5)
+                )
+            )
+            consumer.start()
+            while not tq.waiters:
+                time.sleep(0.001)
+
+            task = Task(id, 1, Resources(1, 1, 0), "some-content", 123)
+            insert(task)
+            consumer.join(timeout=5)
+            self.assertEqual(results, [task], msg="wrong task handed over")
+            self.assertEqual(len(tq), 1, msg="wrong queue length")
+
+    def test_concurrent_moves(self):
+        """Test concurrent moves and priority changes keep the queue consistent"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        tq.extend(
+            Task(ii, 1, Resources(1, 1, 0), "some-content", None) for ii in range(400)
+        )
+
+        def worker(start):
+            for ii in range(start, 400, 4):
+                try:
+                    tq.move_before(ii, (ii + 1) % 400)
+                    tq.move_after(ii, (ii + 2) % 400)
+                except ValueError:
+                    pass  # the other task has another priority by now
+                tq.change_priority(ii, ii % 3 + 1, ("keep", "front", "back")[ii % 3])
+                if ii % 8 == 0:
+                    tq.pop(ii)
+                    tq.append_left(
+                        Task(ii, 2, Resources(1, 1, 0), "some-content", None)
+                    )
+
+        threads = [threading.Thread(target=worker, args=(ii,)) for ii in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        tq.check_invariants()
+        self.assertEqual(len(tq), 400, msg="wrong queue length")
+
+    def test_update_waiter(self):
+        """Test a waiter with grown resources gets a queued task right away"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        task = Task(1, 1, Resources(4, 4, 0), "some-content", 123)
+        tq.add_task(task)
+
+        waiter = Waiter(Resources(2, 2, 0))
+        results = []
+        consumer = threading.Thread(
+            target=lambda: results.append(
+                tq.get_task(waiter.available_resources, timeout=5, waiter=waiter)
+            )
+        )
+        consumer.start()
+        while not tq.waiters:
+            time.sleep(0.001)
+
+        tq.update_waiter(waiter, Resources(4, 4, 0))
+        consumer.join(timeout=5)
+
+        self.assertEqual(results, [task], msg="wrong task handed over")
+        self.assertEqual(tq.waiters, [], msg="waiter is not removed")
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
+
+    def test_update_waiter_with_timers(self):
+        """Test a waiter given a due task by update_waiter gets only that task"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        clock = Clock()
+        tq.clock = clock
+        delayed_task = Task(1, 1, Resources(1, 1, 0), "some-content", 123)
+        tq.add_task(delayed_task, not_before=10)
+        leased_task = Task(2, 1, Resources(1, 1, 0), "some-content", 123)
+        tq.add_task(leased_task)
+        tq.lease_task(Resources(1, 1, 0), ttl=10)
+
+        waiter = Waiter(Resources(0, 0, 0))
+        results = []
+        consumer = threading.Thread(
+            target=lambda: results.append(
+                tq.get_task(waiter.available_resources, timeout=5, waiter=waiter)
+            )
+        )
+        consumer.start()
+        while not tq.waiters:
+            time.sleep(0.001)
+
+        clock.now = 20
+        tq.update_waiter(waiter, Resources(1, 1, 0))
+        consumer.join(timeout=5)
+
+        self.assertEqual(results, [delayed_task], msg="wrong task handed over")
+        self.assertEqual(tq.waiters, [], msg="waiter is not removed")
+        self.assertEqual(len(tq), 1, msg="requeued task is lost")
+        self.assertEqual(tq.get_task(Resources(1, 1, 0), block=False), leased_task)
+
+    def test_nacked_task_is_handed_over(self):
+        """Test a task back from a lease wakes a blocked consumer"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        tq.add_task(Task(1, 1, Resources(1, 1, 0), "some-content", 123))
+        task, token = tq.lease_task(Resources(1, 1, 0), ttl=60)
+
+        results = []
+        consumer = threading.Thread(
+            target=lambda: results.append(tq.get_task(Resources(1, 1, 0), timeout=5))
+        )
+        consumer.start()
+        while not tq.waiters:
+            time.sleep(0.001)
+
+        tq.nack(token)
+        consumer.join(timeout=5)
+        self.assertEqual(results, [task], msg="task not handed over")
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
+
+    def test_many_producers_and_consumers(self):
+        """Test every task is delivered exactly once under concurrency"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        ntasks, nproducers, nconsumers = 2000, 4, 4
+        received = []
+        received_lock = threading.Lock()
+
+        def produce(offset):
+            for ii in range(offset, ntasks, nproducers):
+                tq.add_task(Task(ii, ii % 5 + 1, Resources(1, 1, 0), "c", None))
+
+        def consume():
+            while True:
+                task = tq.get_task(Resources(1, 1, 0), timeout=0.2)
+                if task is None:
+                    return
+                with received_lock:
+                    received.append(task.id)
+
+        threads = [threading.Thread(target=consume) for _ in range(nconsumers)]
+        threads += [
+            threading.Thread(target=produce, args=(ii,)) for ii in range(nproducers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        self.assertEqual(sorted(received), list(range(ntasks)))
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
@@ -0,0 +1,153 @@
+import unittest
+
+from project.concurrent_task_queue import ConcurrentTaskQueue
+from project.dedup import BloomFilter, Deduplicator
+from project.resources import Resources
+from project.task_queue import TaskQueue
+from project.tests.helpers import Clock, make_task
+
+
+class TestDeduplicator(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.tq = TaskQueue(1, "q1", validate=True)
+        self.tq.clock = self.clock
+        self.dedup = Deduplicator(self.tq, window=10, clock=self.clock)
+
+    def test_duplicate_returns_existing_task(self):
+        """Test a duplicate add returns the task added first with the key"""
+        task = make_task(1)
+        self.assertIs(self.tq.add_task(task, dedup_key="job-1"), task)
+        self.assertIs(self.tq.add_task(make_task(2), dedup_key="job-1"), task)
+        self.assertIs(self.tq.add_task(make_task(1), dedup_key="job-1"), task)
+        self.assertEqual(len(self.tq), 1, msg="duplicate is queued")
+
+        # the key outlives the task in the queue until the window ends
+        self.tq.get_task(Resources(1, 1, 0))
+        self.assertIs(self.tq.add_task(make_task(3), dedup_key="job-1"), task)
+        self.assertEqual(len(self.tq), 0, msg="duplicate is queued")
+
+    def test_window(self):
+        """Test a key is forgotten once its window has passed"""
+        self.tq.add_task(make_task(1), dedup_key="job-1")
+        self.clock.now = 5
+        self.tq.add_task(make_task(2), dedup_key="job-2")
+
+        self.clock.now = 10
+        task = make_task(3)
+        self.assertIs(self.tq.add_task(task, dedup_key="job-1"), task)
+        self.assertIsNot(self.tq.add_task(make_task(4), dedup_key="job-2"), None)
+        self.assertEqual([id for id in self.tq.QHIGHEST.index], [1, 2, 3])
+        self.assertEqual(len(self.dedup), 2, msg="expired key is kept")
+
+    def test_failed_add_is_not_remembered(self):
+        """Test a key is not remembered when its task is not added"""
+        self.tq.add_task(make_task(1))
+        with self.assertRaises(ValueError):
+            self.tq.add_task(make_task(1), dedup_key="job-1")
+
+        task = make_task(2)
+        self.assertIs(self.tq.add_task(task, dedup_key="job-1"), task)
+
+    def test_delayed_task(self):
+        """Test a delayed task is deduplicated too"""
+        task = make_task(1)
+        self.tq.add_task(task, not_before=5, dedup_key="job-1")
+        self.assertIs(self.tq.add_task(make_task(2), 5, "job-1"), task)
+        self.assertEqual(list(self.tq.delayed), [1], msg="duplicate is delayed")
+
+    def test_max_keys(self):
+        """Test the oldest keys are evicted beyond max_keys"""
+        tq = TaskQueue(1, "q1")
+        dedup = Deduplicator(tq, window=10, max_keys=3, clock=self.clock)
+        for ii in range(5):
+            tq.add_task(make_task(ii), dedup_key=ii)
+
+        self.assertEqual(list(dedup.keys), [2, 3, 4], msg="wrong keys kept")
+        self.assertEqual(dedup.evicted, 2, msg="wrong number evicted")
+        self.assertIsNotNone(tq.add_task(make_task(5), dedup_key=0))
+
+    def test_bloom_filter_keeps_evicted_keys(self):
+        """Test keys evicted early are still caught by the Bloom filter"""
+        tq = TaskQueue(1, "q1")
+        dedup = Deduplicator(
+            tq,
+            window=10,
+            max_keys=10,
+            bloom_keys=1000,
+            reject_maybe=True,
+            clock=self.clock,
+        )
+        for ii in range(100):
+            self.clock.now = ii / 20
+            tq.add_task(make_task(ii), dedup_key=f"job-{ii}")
+
+        self.assertEqual(len(dedup), 10, msg="index is not bounded")
+        self.clock.now = 9
+        for ii in range(90):
+            self.assertIsNone(tq.add_task(make_task(1000 + ii), dedup_key=f"job-{ii}"))
+        self.assertEqual(len(tq), 100, msg="duplicate is queued")
+
+        # two windows later the Bloom filter has forgotten the keys
+        self.clock.now = 25
+        task = make_task(1000)
+        self.assertIs(tq.add_task(task, dedup_key="job-0"), task)
+
+    def test_bloom_filter_maybe_is_added(self):
+        """Test a key found only by the Bloom filter is added by default"""
+        tq = TaskQueue(1, "q1")
+        dedup = Deduplicator(
+            tq, window=10, max_keys=1, bloom_keys=1000, clock=self.clock
+        )
+        tq.add_task(make_task(1), dedup_key="job-1")
+        tq.add_task(make_task(2), dedup_key="job-2")
+
+        task = make_task(3)
+        self.assertIs(tq.add_task(task, dedup_key="job-1"), task)
+        self.assertEqual(dedup.maybe_duplicates, 1, msg="maybe is not counted")
+        self.assertEqual(len(tq), 3, msg="maybe is not queued")
+
+    def test_detach(self):
+        """Test keys are ignored once the deduplicator is detached"""
+        self.dedup.detach()
+        with self.assertRaises(ValueError):
+            self.tq.add_task(make_task(1), dedup_key="job-1")
+
+    def test_concurrent_queue(self):
+        """Test ConcurrentTaskQueue returns the existing task on a duplicate"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        Deduplicator(tq, window=10)
+        task = make_task(1)
+        self.assertIs(tq.add_task(task, dedup_key="job-1"), task)
+        self.assertIs(tq.add_task(make_task(2), dedup_key="job-1"), task)
+        self.assertEqual(len(tq), 1, msg="duplicate is queued")
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives(self):
+        """Test every added key is found"""
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for ii in range(1000):
+            bloom.add(f"key-{ii}")
+
+        for ii in range(1000):
+            self.assertIn(f"key-{ii}", bloom, msg="added key not found")
+
+    def test_false_positive_rate(self):
+        """Test the false positive rate is near the configured one at capacity"""
+        bloom = BloomFilter(10_000, error_rate=0.01)
+        for ii in range(10_000):
+            bloom.add(ii)
+
+        false_positives = sum(ii in bloom for ii in range(10_000, 60_000))
+        self.assertLess(false_positives / 50_000, 0.02, msg="too many positives")
+
+    def test_wrong_parameters(self):
+        """Test a filter needs a positive capacity and an error rate below 1"""
+        for capacity, error_rate in ((0, 0.01), (10, 0), (10, 1)):
+            with self.assertRaises(ValueError):
+                BloomFilter(capacity, error_rate)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -578,3 +578,44 @@ class TestDoublyLinkedList(unittest.TestCase):
 
         self.assertEqual(dll.end_node, nodes[2], msg="end_node was not updated")
         self.assertIsNone(dll.end_node.next_item, msg="end_node.next_item is not None")
+
+    def test_extend(self):
+        """Test appending many objects to a DLL at once"""
+        dll = DoublyLinkedList()
+        self.assertEqual(dll.extend([]), [], msg="nodes created for no tasks")
+
+        tasks = [Task(ii, 1, Resources(1, 1, 1), "some content", 0) for ii in range(3)]
+        nodes = dll.extend(tasks[:1])
+        self.assertEqual(dll.start_node, nodes[0], msg="wrong start_node")
+        self.assertIsNone(dll.end_node, msg="single node list has an end_node")
+
+        nodes += dll.extend(tasks[1:])
+        self.assertEqual(len(dll), 3, msg="wrong count of nodes in doubly_linked_list")
+        self.assertEqual(dll.start_node, nodes[0], msg="wrong start_node")
+        self.assertEqual(dll.end_node, nodes[2], msg="wrong end_node")
+
+        for ii in range(3):
+            prev_item = nodes[ii - 1] if ii > 0 else None
+            next_item = nodes[ii + 1] if ii < 2 else None
+            self.assertEqual(nodes[ii].prev_item, prev_item, msg="wrong prev_item")
+            self.assertEqual(nodes[ii].next_item, next_item, msg="wrong next_item")
+            self.assertEqual(dll.get(ii), nodes[ii], msg="wrong node by id")
+
+        self.assertEqual(dll.pop_left().item, tasks[0], msg="wrong popped task")
+        self.assertEqual(dll.pop_right().item, tasks[2], msg="wrong popped task")
+
+    def test_extend_with_duplicates(self):
+        """Test a batch with a duplicate id leaves the DLL untouched"""
+        dll = DoublyLinkedList()
+        dll.append(Task(1, 1, Resources(1, 1, 1), "some content", 0))
+        dll.append(Task(2, 1, Resources(1, 1, 1), "some content", 0))
+        end_node = dll.end_node
+
+        for ids in ([3, 4, 1], [3, 4, 3]):
+            tasks = [Task(ii, 1, Resources(1, 1, 1), "some content", 0) for ii in ids]
+            with self.assertRaises(ValueError):
+                dll.extend(tasks)
+
+            self.assertEqual(len(dll), 2, msg="wrong count of nodes")
+            self.assertEqual(dll.end_node, end_node, msg="wrong end_node")
+            self.assertIsNone(end_node.next_item, msg="end_node has next_item")
@@ -0,0 +1,146 @@
+import threading
+import time
+import unittest
+
+from project.concurrent_task_queue import ConcurrentTaskQueue
+from project.executor import LocalExecutor
+from project.resources import Resources
+from project.result_store import ResultStore
+from project.task import Task
+
+
+def square(content: str) -> str:
+    return str(int(content) ** 2)
+
+
+def nap(content: str) -> str:
+    time.sleep(float(content))
+    return content
+
+
+def fail(content: str) -> str:
+    raise RuntimeError(content)
+
+
+class TestLocalExecutor(unittest.TestCase):
+    def test_runs_tasks(self):
+        """Test every task runs once and gets its result written back"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        tasks = [
+            Task(ii, ii % 5 + 1, Resources(1, ii % 2 + 1, 0), str(ii), None)
+            for ii in range(20)
+        ]
+        done = []
+
+        with LocalExecutor(
+            tq, Resources(4, 4, 0), square, on_done=lambda t, e: done.append(t.id)
+        ) as executor:
+            tq.add_tasks(tasks)
+            self.assertTrue(executor.wait_idle(timeout=30), msg="tasks left")
+
+        self.assertEqual(sorted(done), list(range(20)), msg="wrong tasks done")
+        for task in tasks:
+            self.assertEqual(task.result, str(task.id**2), msg="wrong result")
+        self.assertEqual((executor.finished, executor.failed), (20, 0))
+
+    def test_budget_is_respected(self):
+        """Test the resources in use never exceed the budget"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        budget = Resources(8, 3, 1)
+        tq.add_tasks(
+            Task(ii, 1, Resources(ii % 4 + 1, ii % 3 + 1, ii % 2), "0.01", None)
+            for ii in range(20)
+        )
+
+        with LocalExecutor(tq, budget, nap, max_workers=4) as executor:
+            self.assertTrue(executor.wait_idle(timeout=30), msg="tasks left")
+
+        self.assertEqual(executor.finished, 20, msg="wrong number of tasks run")
+        for _, in_use in executor.samples:
+            for amount, limit in zip(in_use, budget):
+                self.assertLessEqual(amount, limit, msg="budget exceeded")
+        self.assertEqual(executor.in_use, Resources(0, 0, 0), msg="not released")
+
+    def test_wakes_up_on_new_and_finished_tasks(self):
+        """Test a waiting dispatcher is woken by added and finished tasks"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        finished = threading.Event()
+
+        def on_done(task, error):
+            if task.id == 2:
+                finished.set()
+
+        with LocalExecutor(tq, Resources(2, 2, 0), nap, on_done=on_done) as executor:
+            self.assertTrue(executor.wait_idle(timeout=5), msg="not idle")
+
+            # task 2 fits only once task 1 has released its resources
+            tq.add_task(Task(1, 1, Resources(2, 2, 0), "0.2", None))
+            tq.add_task(Task(2, 1, Resources(2, 1, 0), "0", None))
+            self.assertTrue(finished.wait(timeout=10), msg="task 2 did not run")
+            self.assertTrue(executor.wait_idle(timeout=5), msg="not idle")
+
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
+
+    def test_results_go_to_a_store(self):
+        """Test results are put into a ResultStore instead of the tasks"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        results = ResultStore()
+        tasks = [Task(ii, 1, Resources(1, 1, 0), str(ii), None) for ii in range(5)]
+
+        with LocalExecutor(tq, Resources(2, 2, 0), square, results=results) as executor:
+            tq.add_tasks(tasks)
+            self.assertTrue(executor.wait_idle(timeout=30), msg="tasks left")
+
+        for task in tasks:
+            self.assertIsNone(task.result, msg="result written to the task")
+            self.assertEqual(results.wait_result(task.id, 5), str(task.id**2))
+
+    def test_failed_task(self):
+        """Test an exception of a task is reported and the executor goes on"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        errors = []
+        tq.add_task(Task(1, 1, Resources(1, 1, 0), "boom", None))
+
+        with LocalExecutor(
+            tq, Resources(1, 1, 0), fail, on_done=lambda t, e: errors.append(e)
+        ) as executor:
+            self.assertTrue(executor.wait_idle(timeout=30), msg="tasks left")
+
+        self.assertEqual(str(errors[0]), "boom", msg="wrong error")
+        self.assertEqual((executor.finished, executor.failed), (1, 1))
+
+    def test_shutdown_keeps_queued_tasks(self):
+        """Test tasks that were not dispatched stay queued after shutdown"""
+        tq = ConcurrentTaskQueue(1, "q1")
+        executor = LocalExecutor(tq, Resources(1, 1, 0), nap)
+        executor.start()
+        tq.add_tasks(Task(ii, 1, Resources(1, 1, 0), "0.05", None) for ii in range(5))
+        time.sleep(0.02)
+        executor.shutdown()
+
+        self.assertEqual(executor.finished + len(tq), 5, msg="task lost")
+        self.assertLess(len(tq), 5, msg="no task dispatched")
+
+    def test_utilization(self):
+        """Test utilization is the time-weighted mean of the budget in use"""
+        executor = LocalExecutor(ConcurrentTaskQueue(1, "q1"), Resources(4, 2, 0), nap)
+        now = time.monotonic()
+        executor.samples.extend(
+            [
+                (now - 4, Resources(0, 0, 0)),
+                (now - 3, Resources(4, 2, 0)),
+                (now - 1, Resources(2, 1, 0)),
+            ]
+        )
+
+        utilization = executor.utilization()
+        self.assertAlmostEqual(utilization.ram, 0.625, places=2)
+        self.assertAlmostEqual(utilization.cpu_cores, 0.625, places=2)
+        self.assertEqual(utilization.gpu_count, 0.0, msg="wrong gpu utilization")
+
+        utilization = executor.utilization(since=now - 1)
+        self.assertAlmostEqual(utilization.ram, 0.5, places=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import random
+import unittest
+
+from project.doubly_linked_list import DoublyLinkedList
+from project.indexed_linked_list import IndexedDoublyLinkedList
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+from project.tests.helpers import linked_list_ids, make_task
+
+
+def indexed_list_ids(dll: IndexedDoublyLinkedList) -> list[int]:
+    ids, node = [], dll.start_node
+    while node is not None:
+        ids.append(node.item.id)
+        node = node.next_item
+
+    # every link on every level must skip exactly `width` positions
+    positions = {id(dll.head): -1, id(dll.tail): len(ids)}
+    positions.update({id(dll.get(task_id)): ii for ii, task_id in enumerate(ids)})
+    for level in range(dll.level):
+        node = dll.head
+        while node is not dll.tail:
+            next_node = node.next_items[level]
+            width = positions[id(next_node)] - positions[id(node)]
+            assert node.widths[level] == width, "wrong link width"
+            assert next_node.prev_items[level] is node, "wrong prev link"
+            node = next_node
+
+    return ids
+
+
+class TestIndexedDoublyLinkedList(unittest.TestCase):
+    def test_positional_operations(self):
+        """Test getting, inserting and popping by index"""
+        dll = IndexedDoublyLinkedList(seed=1)
+        self.assertTrue(dll.is_empty(), msg="doubly_linked_list is not empty")
+        self.assertIsNone(dll.start_node, msg="empty list has a start_node")
+
+        for ii in range(100):
+            dll.append(make_task(ii))
+
+        for ii in range(100):
+            self.assertEqual(dll.get_at_index(ii).item.id, ii, msg="wrong node")
+            self.assertEqual(dll.index_of(ii), ii, msg="wrong index of id")
+
+        dll.insert_at_index(0, make_task(1000))
+        dll.insert_at_index(50, make_task(1001))
+        self.assertEqual(dll.index_of(1000), 0, msg="wrong index of id")
+        self.assertEqual(dll.index_of(1001), 51, msg="wrong index of id")
+        self.assertEqual(dll.index_of(99), 101, msg="wrong index of id")
+
+        self.assertEqual(dll.pop_at_index(51).item.id, 1001, msg="wrong popped task")
+        self.assertEqual(dll.pop_at_index(0).item.id, 1000, msg="wrong popped task")
+        self.assertEqual(indexed_list_ids(dll), list(range(100)))
+
+        with self.assertRaises(ValueError):
+            dll.get_at_index(100)
+        with self.assertRaises(ValueError):
+            dll.index_of(1000)
+        with self.assertRaises(ValueError):
+            dll.append(make_task(5))
+
+    def test_same_behaviour_as_doubly_linked_list(self):
+        """Test random operations against DoublyLinkedList"""
+        rng = random.Random(5)
+        dll, indexed_dll = DoublyLinkedList(), IndexedDoublyLinkedList(seed=5)
+        next_id = 0
+
+        for _ in range(2000):
+            operation = rng.choice(
+                ["append", "append_left", "extend", "insert_at_index"]
+                + ["pop", "pop_left", "pop_right", "pop_at_index"]
+            )
+            args = []
+            if operation in ("append", "append_left"):
+                args = [make_task(next_id)]
+                next_id += 1
+            elif operation == "extend":
+                args = [[make_task(next_id + ii) for ii in range(rng.randint(0, 3))]]
+                next_id += len(args[0])
+            elif operation == "insert_at_index":
+                if len(dll) == 0:
+                    continue
+                args = [rng.randrange(len(dll)), make_task(next_id)]
+                next_id += 1
+            elif operation == "pop":
+                if len(dll) == 0:
+                    continue
+                args = [rng.choice(linked_list_ids(dll))]
+            elif operation == "pop_at_index":
+                if len(dll) == 0:
+                    continue
+                args = [rng.randrange(len(dll))]
+
+            expected = getattr(dll, operation)(*args)
+            result = getattr(indexed_dll, operation)(*args)
+
+            if operation.startswith("pop") and expected is not None:
+                self.assertEqual(result.item, expected.item, msg=operation)
+
+            ids = linked_list_ids(dll)
+            self.assertEqual(indexed_list_ids(indexed_dll), ids)
+            if ids:
+                task_id = rng.choice(ids)
+                self.assertEqual(indexed_dll.index_of(task_id), dll.index_of(task_id))
+
+    def test_task_queue_engine(self):
+        """Test TaskQueue running on the indexed engine"""
+        tq = TaskQueue(1, "q1", list_cls=IndexedDoublyLinkedList)
+        tasks = [
+            Task(ii, ii % 5 + 1, Resources(ii, ii, ii), "c", 0) for ii in range(20)
+        ]
+        tq.add_tasks(tasks)
+
+        self.assertEqual(tq.index_of(7), 7, msg="wrong index of id")
+        self.assertEqual(tq.get_task(Resources(7, 7, 7)), tasks[0])
+        self.assertEqual(tq.index_of(7), 6, msg="wrong index of id")
+        self.assertEqual(tq.pop_at_index(6).item, tasks[7], msg="wrong popped task")
+        self.assertEqual(len(tq), 18, msg="wrong queue length")
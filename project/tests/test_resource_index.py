@@ -0,0 +1,253 @@
+import random
+import unittest
+
+from project.resource_index import ResourceIndex
+from project.resources import Resources, fits
+
+
+class TestResourceIndex(unittest.TestCase):
+    def test_append(self):
+        """Test appending entries to the index keeps insertion order"""
+        index = ResourceIndex(block_size=4)
+
+        for ii in range(10):
+            index.append(ii, Resources(ii, ii, ii))
+            self.assertEqual(len(index), ii + 1, msg="wrong index length")
+
+        self.assertEqual(list(index), list(range(10)), msg="wrong index order")
+        self.assertEqual(len(index.blocks), 3, msg="wrong count of blocks")
+
+        with self.assertRaises(ValueError):
+            index.append(3, Resources(1, 1, 1))
+
+    def test_append_left(self):
+        """Test appending entries to the beginning of the index"""
+        index = ResourceIndex(block_size=4)
+
+        for ii in range(10):
+            index.append_left(ii, Resources(ii, ii, ii))
+
+        self.assertEqual(list(index), list(range(9, -1, -1)), msg="wrong index order")
+        seqs = [index.seq_of(id) for id in index]
+        self.assertEqual(seqs, list(range(-9, 1)), msg="keys are not increasing")
+        for block in index.blocks:
+            self.assertLessEqual(len(block), 4, msg="block exceeds block_size")
+
+    def test_remove(self):
+        """Test removing entries from the index updates block minima"""
+        index = ResourceIndex(block_size=4)
+
+        for ii in range(8):
+            index.append(ii, Resources(ii, 10 - ii, 1))
+
+        index.remove(0)
+        self.assertNotIn(0, index, msg="removed id found in the index")
+        self.assertEqual(index.blocks[0].min_ram, 1, msg="wrong block minimum")
+        self.assertEqual(index.blocks[0].min_cpu_cores, 7, msg="wrong block minimum")
+
+        for ii in range(1, 4):
+            index.remove(ii)
+
+        self.assertEqual(len(index.blocks), 1, msg="empty block is not removed")
+        self.assertEqual(list(index), [4, 5, 6, 7], msg="wrong index order")
+
+        with self.assertRaises(ValueError):
+            index.remove(100)
+
+        index.discard(100)
+        self.assertEqual(len(index), 4, msg="wrong index length")
+
+    def test_find_first(self):
+        """Test finding the earliest entry that fits available resources"""
+        index = ResourceIndex(block_size=4)
+
+        for ii in range(20):
+            index.append(ii, Resources(100, 100, 10))
+
+        index.append(20, Resources(10, 1, 0))
+        index.append(21, Resources(1, 10, 0))
+        index.append(22, Resources(1, 1, 1))
+
+        self.assertEqual(index.find_first(Resources(100, 100, 10)), 0)
+        self.assertEqual(index.find_first(Resources(10, 10, 0)), 20)
+        self.assertEqual(index.find_first(Resources(5, 10, 0)), 21)
+        self.assertEqual(index.find_first(Resources(1, 1, 1)), 22)
+        self.assertIsNone(index.find_first(Resources(0, 0, 0)))
+
+        index.remove(21)
+        self.assertIsNone(index.find_first(Resources(5, 10, 0)))
+
+    def test_find_first_after_changes(self):
+        """Test random changes against a scan of all entries"""
+        rng = random.Random(5)
+        index = ResourceIndex(block_size=4)
+        entries = dict()
+
+        for step in range(1000):
+            op = rng.randrange(6)
+            id = step + 1000
+            resources = Resources(rng.randrange(8), rng.randrange(8), rng.randrange(2))
+            if op == 0 or not entries:
+                index.append(id, resources, step)
+            elif op == 1:
+                index.append_left(id, resources)
+            elif op == 2:
+                index.insert_before(rng.choice(list(entries)), id, resources)
+            elif op == 3:
+                index.insert_after(rng.choice(list(entries)), id, resources)
+            else:
+                id = rng.choice(list(entries))
+                index.remove(id)
+                del entries[id]
+                id = None
+            if id is not None:
+                entries[id] = resources
+
+            available = Resources(rng.randrange(8), rng.randrange(8), rng.randrange(2))
+            expected = next((id for id in index if fits(entries[id], available)), None)
+            self.assertEqual(index.find_first(available), expected, msg="wrong entry")
+            index.check()
+
+    def test_fitting(self):
+        """Test iterating over all entries that fit available resources"""
+        index = ResourceIndex(block_size=4)
+        for ii in range(12):
+            index.append(ii, Resources(ii % 3, 4 - ii // 4, 0))
+
+        fitting = list(index.fitting(Resources(1, 3, 0)))
+        self.assertEqual(fitting, [4, 6, 7, 9, 10], msg="wrong fitting entries")
+        self.assertEqual(list(index.fitting(Resources(0, 0, 0))), [])
+
+    def test_min_resources(self):
+        """Test the resource frontier follows appends and removals"""
+        index = ResourceIndex(block_size=4)
+        self.assertIsNone(index.min_resources(), msg="empty index has minima")
+
+        index.append(1, Resources(10, 2, 3))
+        index.append(2, Resources(5, 8, 3))
+        index.append_left(3, Resources(7, 7, 1))
+        self.assertEqual(index.min_resources(), Resources(5, 2, 1))
+
+        index.remove(2)
+        self.assertEqual(index.min_resources(), Resources(7, 2, 1))
+
+        index.remove(3)
+        index.append(4, Resources(20, 20, 20))
+        self.assertEqual(index.min_resources(), Resources(10, 2, 3))
+
+        index.remove(1)
+        index.remove(4)
+        self.assertIsNone(index.min_resources(), msg="empty index has minima")
+
+    def test_may_fit(self):
+        """Test the resource frontier rules out indexes without a fitting entry"""
+        index = ResourceIndex(block_size=4)
+        self.assertFalse(index.may_fit(Resources(100, 100, 100)))
+
+        index.append(1, Resources(10, 1, 0))
+        index.append(2, Resources(1, 10, 0))
+
+        self.assertFalse(index.may_fit(Resources(0, 10, 0)))
+        self.assertFalse(index.may_fit(Resources(10, 0, 0)))
+        # minima fit although no single entry does
+        self.assertTrue(index.may_fit(Resources(1, 1, 0)))
+        self.assertIsNone(index.find_first(Resources(1, 1, 0)))
+
+        index.remove(1)
+        self.assertTrue(index.may_fit(Resources(1, 10, 0)))
+        self.assertFalse(index.may_fit(Resources(1, 9, 0)))
+
+    def test_pack(self):
+        """Test packing entries into available resources in dispatch order"""
+        index = ResourceIndex(block_size=4)
+
+        index.append(1, Resources(50, 50, 5))
+        index.append(2, Resources(40, 10, 0))
+        index.append(3, Resources(20, 20, 2))
+        index.append(4, Resources(10, 10, 1))
+        index.append(5, Resources(5, 5, 5))
+        index.append(6, Resources(1, 1, 0))
+
+        ids, leftover = index.pack(Resources(100, 100, 8), 10)
+        self.assertEqual(ids, [1, 2, 4], msg="wrong packed ids")
+        self.assertEqual(leftover, Resources(0, 30, 2), msg="wrong leftover")
+        self.assertEqual(len(index), 6, msg="pack removed entries")
+
+        ids, leftover = index.pack(Resources(100, 100, 8), 2)
+        self.assertEqual(ids, [1, 2], msg="wrong packed ids")
+        self.assertEqual(leftover, Resources(10, 40, 3), msg="wrong leftover")
+
+        ids, leftover = index.pack(Resources(0, 0, 0), 10)
+        self.assertEqual(ids, [], msg="wrong packed ids")
+
+    def test_extend(self):
+        """Test appending many entries to the index at once"""
+        index = ResourceIndex(block_size=4)
+        index.append(0, Resources(5, 5, 5))
+
+        index.extend(list(range(1, 10)), [Resources(ii, 10, 10) for ii in range(1, 10)])
+        self.assertEqual(list(index), list(range(10)), msg="wrong index order")
+        self.assertEqual(len(index.blocks), 3, msg="wrong count of blocks")
+        self.assertEqual(index.blocks[0].min_ram, 1, msg="wrong block minimum")
+        self.assertEqual(index.blocks[2].min_ram, 8, msg="wrong block minimum")
+        self.assertEqual(index.min_resources(), Resources(1, 5, 5))
+        self.assertEqual(index.find_first(Resources(4, 10, 10)), 1)
+
+        with self.assertRaises(ValueError):
+            index.extend([10, 5], [Resources(1, 1, 1), Resources(1, 1, 1)])
+        with self.assertRaises(ValueError):
+            index.extend([10, 10], [Resources(1, 1, 1), Resources(1, 1, 1)])
+
+        self.assertEqual(len(index), 10, msg="wrong index length")
+
+    def test_insert_before_and_after(self):
+        """Test inserting entries next to other entries keeps keys ordered"""
+        index = ResourceIndex(block_size=4)
+        index.extend(list(range(8)), [Resources(1, 1, 1)] * 8, list(range(8)))
+
+        index.insert_before(0, 10, Resources(1, 1, 1))
+        index.insert_before(4, 11, Resources(1, 1, 1))
+        index.insert_after(3, 12, Resources(1, 1, 1))
+        index.insert_after(7, 13, Resources(1, 1, 1))
+
+        self.assertEqual(list(index), [10, 0, 1, 2, 3, 12, 11, 4, 5, 6, 7, 13])
+        seqs = [index.seq_of(id) for id in index]
+        self.assertEqual(seqs, sorted(set(seqs)), msg="keys are not increasing")
+        self.assertEqual(index.first(), 10, msg="wrong first entry")
+        self.assertEqual(index.last(), 13, msg="wrong last entry")
+
+        with self.assertRaises(ValueError):
+            index.insert_before(100, 14, Resources(1, 1, 1))
+
+    def test_insert_by_seq(self):
+        """Test inserting an entry at the position of its key"""
+        index = ResourceIndex(block_size=4)
+        index.extend(list(range(0, 20, 2)), [Resources(1, 1, 1)] * 10, range(0, 20, 2))
+
+        index.insert_by_seq(5, Resources(1, 1, 1), 5)
+        index.insert_by_seq(-1, Resources(1, 1, 1), -1)
+        index.insert_by_seq(30, Resources(1, 1, 1), 30)
+        index.insert_by_seq(7, Resources(1, 1, 1), 6)
+
+        self.assertEqual(list(index), [-1, 0, 2, 4, 5, 6, 7, 8, 10, 12, 14, 16, 18, 30])
+        self.assertEqual(index.seq_of(7), 7, msg="a taken key is not moved up")
+        index.check()
+
+    def test_respace(self):
+        """Test inserts into one gap until its keys run out and a respace"""
+        index = ResourceIndex(block_size=4)
+        index.extend(list(range(8)), [Resources(1, 1, 1)] * 8, list(range(8)))
+
+        id = 100
+        while index.has_room_next_to(4, before=True):
+            index.insert_before(4, id, Resources(1, 1, 1))
+            id += 1
+        self.assertGreater(id, 140, msg="keys run out too early")
+        with self.assertRaises(ValueError):
+            index.insert_before(4, id, Resources(1, 1, 1))
+
+        ids = list(index)
+        index.respace(range(len(ids)))
+        index.insert_before(4, id, Resources(1, 1, 1))
+        self.assertEqual(list(index), ids[:-4] + [id] + ids[-4:], msg="wrong order")
+        index.check()
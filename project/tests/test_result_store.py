@@ -0,0 +1,126 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from project.codec import encode_value
+from project.result_store import ResultStore
+from project.tests.helpers import Clock
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.spill_path = os.path.join(self.dir.name, "results.spill")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_put_and_get(self):
+        """Test results of any encodable type are returned by id"""
+        store = ResultStore()
+        values = ["some-result", 123, b"raw", {"key": [1, 2]}, None]
+        for id, value in enumerate(values):
+            store.put_result(id, value)
+
+        for id, value in enumerate(values):
+            self.assertEqual(store.get_result(id), value, msg="wrong result")
+        self.assertEqual(len(store), 5, msg="wrong number of results")
+
+        store.put_result(0, "new-result")
+        self.assertEqual(store.pop_result(0), "new-result", msg="not replaced")
+        self.assertNotIn(0, store, msg="popped result is kept")
+        with self.assertRaises(ValueError):
+            store.get_result(0)
+
+    def test_lru_eviction(self):
+        """Test the least recently used results are dropped over max_bytes"""
+        size = len(encode_value("x" * 100))
+        store = ResultStore(max_bytes=3 * size)
+        for id in range(3):
+            store.put_result(id, "x" * 100)
+
+        store.get_result(0)
+        store.put_result(3, "x" * 100)
+        self.assertEqual(list(store.memory), [2, 0, 3], msg="wrong results kept")
+        self.assertEqual(store.memory_bytes, 3 * size, msg="wrong size")
+        self.assertEqual(store.evicted, 1, msg="wrong number evicted")
+        with self.assertRaises(ValueError):
+            store.get_result(1)
+
+    def test_ttl(self):
+        """Test results are dropped ttl seconds after put"""
+        clock = Clock()
+        store = ResultStore(ttl=10, clock=clock)
+        store.put_result(1, "first")
+        clock.now = 5
+        store.put_result(2, "second")
+        store.put_result(1, "first-again")
+
+        clock.now = 10
+        self.assertEqual(store.get_result(1), "first-again", msg="wrong expiry")
+        self.assertEqual(store.get_result(2), "second", msg="expired early")
+        clock.now = 15
+        self.assertNotIn(1, store, msg="result did not expire")
+        self.assertNotIn(2, store, msg="result did not expire")
+        self.assertEqual(len(store.expiries), 0, msg="expiries are kept")
+
+    def test_spill(self):
+        """Test evicted results are spilled to disk and read back"""
+        size = len(encode_value("x" * 100))
+        with ResultStore(max_bytes=10 * size, spill_path=self.spill_path) as store:
+            for id in range(100):
+                store.put_result(id, f"{id:03}" + "x" * 97)
+
+            self.assertEqual((len(store.memory), len(store.spilled)), (10, 90))
+            for id in range(100):
+                self.assertEqual(store.get_result(id), f"{id:03}" + "x" * 97)
+
+            store.pop_result(5)
+            self.assertNotIn(5, store, msg="spilled result is kept")
+            self.assertEqual(store.spill_bytes, 89 * size, msg="wrong size")
+
+        self.assertFalse(os.path.exists(self.spill_path), msg="file is kept")
+
+    def test_spill_bound_and_compaction(self):
+        """Test the spill file is bounded and rewritten with live records"""
+        value = b"x" * 4096
+        size = len(encode_value(value))
+        with ResultStore(
+            max_bytes=0, spill_path=self.spill_path, max_spill_bytes=100 * size
+        ) as store:
+            for id in range(1000):
+                store.put_result(id, value)
+
+            self.assertEqual(list(store.spilled), list(range(900, 1000)))
+            self.assertLess(os.path.getsize(self.spill_path), 2 * 100 * size + 2**20)
+            for id in range(900, 1000):
+                self.assertEqual(store.get_result(id), value, msg="wrong result")
+
+    def test_wait_result(self):
+        """Test wait_result returns a result put later and times out"""
+        store = ResultStore()
+        results = []
+        waiters = [
+            threading.Thread(target=lambda: results.append(store.wait_result(1, 5)))
+            for _ in range(2)
+        ]
+        for waiter in waiters:
+            waiter.start()
+        while not store.waiting:
+            time.sleep(0.001)
+
+        store.put_result(1, "some-result")
+        for waiter in waiters:
+            waiter.join(timeout=5)
+        self.assertEqual(results, ["some-result"] * 2, msg="wrong results")
+
+        self.assertEqual(store.wait_result(1, timeout=0), "some-result")
+        with self.assertRaises(TimeoutError):
+            store.wait_result(2, timeout=0.01)
+        self.assertEqual(store.waiting, dict(), msg="waiter is kept")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from project.async_task_queue import AsyncTaskQueue
+from project.client import TaskQueueClient
+from project.codec import encode_task
+from project.protocol import FRAME_HEADER, Request, Status, frame, read_frame
+from project.resources import Resources
+from project.server import TaskQueueServer
+from project.task import Task
+
+
+class TestTaskQueueServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.queue = AsyncTaskQueue(1, "q1")
+        self.server = TaskQueueServer(self.queue)
+        await self.server.start("127.0.0.1", 0)
+        self.client = await TaskQueueClient.connect(*self.server.address)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def test_add_and_get(self):
+        """Test adding and getting tasks over the network"""
+        task = Task(1, 2, Resources(2, 2, 0), "some-content", 123)
+        await self.client.add_task(task)
+
+        self.assertEqual(await self.client.length(), 1, msg="wrong queue length")
+        self.assertIsNone(await self.client.get_task(Resources(1, 1, 0), timeout=0))
+        self.assertEqual(await self.client.get_task(Resources(2, 2, 0)), task)
+        self.assertEqual(await self.client.length(), 0, msg="wrong queue length")
+
+    async def test_errors(self):
+        """Test a rejected request raises on the client and keeps the connection"""
+        task = Task(1, 2, Resources(2, 2, 0), "some-content", 123)
+        await self.client.add_task(task)
+
+        with self.assertRaises(ValueError):
+            await self.client.add_task(task)
+        with self.assertRaises(ValueError):
+            await self.client.add_task(Task(2, 9, Resources(1, 1, 1), "", None))
+
+        self.assertEqual(await self.client.length(), 1, msg="wrong queue length")
+
+    async def test_pipelining(self):
+        """Test many requests in flight on a single connection"""
+        tasks = [
+            Task(ii, ii % 5 + 1, Resources(1, 1, 0), f"task-{ii}", None)
+            for ii in range(200)
+        ]
+        await asyncio.gather(*(self.client.add_task(task) for task in tasks))
+        self.assertEqual(len(self.queue), 200, msg="wrong queue length")
+
+        received = await asyncio.gather(
+            *(self.client.get_task(Resources(1, 1, 0), timeout=0) for _ in tasks)
+        )
+        self.assertEqual(
+            sorted(task.id for task in received),
+            list(range(200)),
+            msg="wrong tasks received",
+        )
+
+    async def test_waiting_get_does_not_block(self):
+        """Test a waiting get lets later pipelined requests through"""
+        consumer = asyncio.create_task(self.client.get_task(Resources(4, 4, 0)))
+        await asyncio.sleep(0.01)
+
+        await self.client.add_task(Task(1, 1, Resources(8, 8, 0), "large", None))
+        self.assertFalse(consumer.done(), msg="consumer got a large task")
+
+        task = Task(2, 3, Resources(4, 4, 0), "small", None)
+        await self.client.add_task(task)
+        self.assertEqual(await consumer, task, msg="wrong task handed over")
+
+    async def test_get_batch_and_cancel(self):
+        """Test batch get and cancel"""
+        for ii in range(6):
+            await self.client.add_task(
+                Task(ii, ii % 2 + 1, Resources(2, 1, 0), "some-content", None)
+            )
+
+        self.assertEqual((await self.client.cancel(0)).id, 0, msg="wrong task")
+        self.assertIsNone(await self.client.cancel(0), msg="task cancelled twice")
+
+        tasks, leftover = await self.client.get_tasks(Resources(7, 7, 0), 4)
+        self.assertEqual([task.id for task in tasks], [2, 4, 1], msg="wrong tasks")
+        self.assertEqual(leftover, Resources(1, 4, 0), msg="wrong leftover")
+
+    async def test_disconnect_returns_task(self):
+        """Test a waiting get of a closed connection gives up without a task"""
+        client = await TaskQueueClient.connect(*self.server.address)
+        consumer = asyncio.create_task(client.get_task(Resources(1, 1, 1)))
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(self.queue.waiters), 1, msg="consumer is not waiting")
+
+        await client.close()
+        with self.assertRaises(ConnectionError):
+            await consumer
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.queue.waiters, [], msg="waiter is not removed")
+
+        await self.client.add_task(Task(1, 1, Resources(1, 1, 1), "", None))
+        self.assertEqual(len(self.queue), 1, msg="task handed to a closed client")
+
+    async def test_pickle_refused(self):
+        """Test a task with a pickled value is rejected without unpickling it"""
+
+        class Payload:
+            def __reduce__(self):
+                return (exec, ("raise SystemExit('unpickled')",))
+
+        with self.assertRaises(ValueError, msg="pickled task is accepted"):
+            await self.client.add_task(Task(1, 1, Resources(1, 1, 1), Payload(), None))
+        self.assertEqual(await self.client.length(), 0, msg="wrong queue length")
+
+    async def test_malformed_task(self):
+        """Test a malformed task is rejected and keeps the connection"""
+        reader, writer = await asyncio.open_connection(*self.server.address)
+        header = encode_task(Task(1, 1, Resources(1, 1, 1), "", None))[:-2]
+        for payload in (b"", header, header + b"\x09", header + b"\x02\xff"):
+            writer.write(frame(7, Request.ADD, payload))
+            request_id, status, _ = await read_frame(reader)
+            self.assertEqual(
+                (request_id, status), (7, Status.ERROR), msg="task is accepted"
+            )
+        writer.close()
+
+        self.assertEqual(await self.client.length(), 0, msg="wrong queue length")
+
+    async def test_malformed_frame(self):
+        """Test a malformed frame closes only its own connection"""
+        reader, writer = await asyncio.open_connection(*self.server.address)
+        writer.write(FRAME_HEADER.pack(1, 1, 1))
+        self.assertEqual(await reader.read(), b"", msg="connection is kept")
+        writer.close()
+
+        self.assertEqual(await self.client.length(), 0, msg="wrong queue length")
+
+    async def test_unix_socket(self):
+        """Test serving on a unix socket"""
+        with tempfile.TemporaryDirectory() as dir:
+            path = os.path.join(dir, "queue.sock")
+            server = TaskQueueServer(self.queue)
+            await server.start(path=path)
+
+            async with await TaskQueueClient.connect_unix(path) as client:
+                await client.add_task(Task(1, 1, Resources(1, 1, 1), "", None))
+                self.assertEqual(await self.client.length(), 1)
+
+            await server.close()
@@ -0,0 +1,188 @@
+import threading
+import unittest
+
+from project.resources import Resources
+from project.sharded_task_queue import ShardedTaskQueue
+from project.tests.helpers import Clock, make_task
+
+
+class TestShardedTaskQueue(unittest.TestCase):
+    def test_hash_placement(self):
+        """Test tasks are spread over the shards by the hash of their id"""
+        tq = ShardedTaskQueue(1, "q1", shards=4)
+        tq.add_tasks(make_task(ii, 1) for ii in range(8))
+
+        self.assertEqual(len(tq), 8, msg="wrong queue length")
+        for index, shard in enumerate(tq.shards):
+            self.assertEqual(len(shard), 2, msg=f"wrong length of shard {index}")
+            for task in shard.tasks:
+                self.assertEqual(hash(task.id) % 4, index)
+
+    def test_priority_across_shards(self):
+        """Test a higher priority task of another shard is taken first"""
+        tq = ShardedTaskQueue(1, "q1", shards=4)
+        tq.add_task(make_task(0, 3))
+        tq.add_task(make_task(1, 2))
+        tq.add_task(make_task(2, 1))
+
+        resources = Resources(1, 1, 0)
+        ids = [tq.get_task(resources, preferred=0).id for _ in range(3)]
+        self.assertEqual(ids, [2, 1, 0], msg="priority is not respected")
+        self.assertIsNone(tq.get_task(resources, preferred=0))
+
+    def test_preferred_shard_on_tie(self):
+        """Test the preferred shard is used among tasks of the same priority"""
+        tq = ShardedTaskQueue(1, "q1", shards=4)
+        tq.add_tasks(make_task(ii, 2) for ii in range(8))
+
+        task = tq.get_task(Resources(1, 1, 0), preferred=3)
+        self.assertEqual(task.id, 3, msg="task not taken from the preferred shard")
+
+        # shard 3 is left with task 7, then shard 0 is next
+        ids = [tq.get_task(Resources(1, 1, 0), preferred=3).id for _ in range(2)]
+        self.assertEqual(ids, [7, 0], msg="wrong steal order")
+
+    def test_steal_fitting_task(self):
+        """Test a task is stolen when nothing of the preferred shard fits"""
+        tq = ShardedTaskQueue(1, "q1", shards=2)
+        tq.add_task(make_task(0, 1, Resources(8, 8, 1)))
+        tq.add_task(make_task(1, 1, Resources(1, 1, 0)))
+        tq.add_task(make_task(2, 3, Resources(1, 1, 0)))
+
+        task = tq.get_task(Resources(2, 2, 0), preferred=0)
+        self.assertEqual(task.id, 1, msg="fitting task not stolen")
+        self.assertEqual(tq.get_task(Resources(2, 2, 0), preferred=0).id, 2)
+        self.assertIsNone(tq.get_task(Resources(2, 2, 0), preferred=0))
+
+    def test_get_tasks(self):
+        """Test get_tasks packs tasks of all shards by priority"""
+        tq = ShardedTaskQueue(1, "q1", shards=3)
+        tq.add_tasks(make_task(ii, ii % 3 + 1) for ii in range(9))
+
+        tasks, leftover = tq.get_tasks(Resources(5, 10, 0), 10, preferred=0)
+        self.assertEqual([task.priority for task in tasks], [1, 1, 1, 2, 2])
+        self.assertEqual(leftover, Resources(0, 5, 0), msg="wrong leftover")
+
+        tasks, _ = tq.get_tasks(Resources(100, 100, 0), 2, preferred=0)
+        self.assertEqual(len(tasks), 2, msg="max_tasks is not respected")
+        self.assertEqual(len(tq), 2, msg="wrong queue length")
+
+    def test_round_robin_placement(self):
+        """Test round-robin placement, pop and reuse of ids"""
+        tq = ShardedTaskQueue(1, "q1", shards=3, placement="round_robin")
+        tq.add_tasks(make_task(ii * 3, 1) for ii in range(6))
+
+        lengths = [len(shard) for shard in tq.shards]
+        self.assertEqual(lengths, [2, 2, 2], msg="tasks are not spread evenly")
+
+        self.assertEqual(tq.pop(9).id, 9, msg="wrong task popped")
+        self.assertNotIn(9, tq.shard_of, msg="popped id is still placed")
+        with self.assertRaises(ValueError):
+            tq.pop(9)
+
+        tq.add_task(make_task(9, 2))
+        self.assertEqual(len(tq), 6, msg="wrong queue length")
+
+    def test_duplicates_and_wrong_priorities(self):
+        """Test duplicate ids and wrong priorities leave the queue unchanged"""
+        for placement in ("hash", "round_robin"):
+            tq = ShardedTaskQueue(1, "q1", shards=2, placement=placement)
+            tq.add_task(make_task(1, 1))
+
+            with self.assertRaises(ValueError):
+                tq.add_task(make_task(1, 2))
+            with self.assertRaises(ValueError):
+                tq.add_tasks([make_task(2, 1), make_task(3, 6)])
+            with self.assertRaises(ValueError):
+                tq.add_task(make_task(4, 0))
+
+            self.assertEqual(len(tq), 1, msg=f"wrong queue length, {placement}")
+            tq.add_tasks([make_task(2, 1), make_task(3, 5), make_task(4, 1)])
+            self.assertEqual(len(tq), 4, msg=f"wrong queue length, {placement}")
+
+        with self.assertRaises(ValueError):
+            ShardedTaskQueue(1, "q1", shards=0)
+        with self.assertRaises(ValueError):
+            ShardedTaskQueue(1, "q1", placement="random")
+
+    def test_add_tasks_is_all_or_nothing(self):
+        """Test a duplicate id in a later shard leaves every shard untouched"""
+        tq = ShardedTaskQueue(1, "q1", shards=2)
+        shard_of = {id: hash(id) % 2 for id in range(10)}
+        first = next(id for id in range(10) if shard_of[id] == 0)
+        second = next(id for id in range(10) if shard_of[id] == 1)
+        tq.add_task(make_task(second, 1))
+
+        for tasks in (
+            [make_task(first, 1), make_task(second, 2)],
+            [make_task(first, 1), make_task(second + 2, 1), make_task(second + 2, 3)],
+        ):
+            with self.assertRaises(ValueError):
+                tq.add_tasks(tasks)
+            self.assertEqual(len(tq.shards[0]), 0, msg="first shard is changed")
+            self.assertEqual(len(tq), 1, msg="wrong queue length")
+
+        tq.add_tasks([make_task(first, 1)])
+        self.assertEqual(len(tq), 2, msg="wrong queue length")
+
+    def test_timers_of_shards(self):
+        """Test get_task brings back due tasks and expired leases of the shards"""
+        tq = ShardedTaskQueue(1, "q1", shards=2)
+        clock = Clock()
+        for shard in tq.shards:
+            shard.clock = clock
+
+        tq.shards[0].add_task(make_task(1, 1), not_before=10)
+        tq.shards[1].add_task(make_task(2, 2))
+        leased, _ = tq.shards[1].lease_task(Resources(1, 1, 0), ttl=10)
+        self.assertIsNone(tq.get_task(Resources(1, 1, 0)), msg="task before due")
+
+        clock.now = 20
+        self.assertEqual(tq.get_task(Resources(1, 1, 0)).id, 1, msg="not promoted")
+        self.assertEqual(tq.get_task(Resources(1, 1, 0)), leased, msg="not requeued")
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
+
+    def test_shard_order(self):
+        """Test shards are tried from the preferred one on"""
+        tq = ShardedTaskQueue(1, "q1", shards=4)
+        self.assertEqual(tq.shard_order(2), [2, 3, 0, 1], msg="wrong order")
+        self.assertEqual(sorted(tq.shard_order()), [0, 1, 2, 3], msg="wrong shards")
+
+    def test_many_producers_and_consumers(self):
+        """Test every task is delivered exactly once under concurrency"""
+        for placement in ("hash", "round_robin"):
+            tq = ShardedTaskQueue(1, "q1", shards=4, placement=placement)
+            ntasks, nthreads = 2000, 4
+            delivered = []
+            lock = threading.Lock()
+
+            def produce(first_id):
+                for ii in range(first_id, ntasks, nthreads):
+                    tq.add_task(make_task(ii, ii % 5 + 1))
+
+            def consume():
+                got = []
+                while len(got) < ntasks // nthreads:
+                    task = tq.get_task(Resources(1, 1, 0))
+                    if task is not None:
+                        got.append(task.id)
+                with lock:
+                    delivered.extend(got)
+
+            threads = [
+                threading.Thread(target=produce, args=(ii,)) for ii in range(nthreads)
+            ]
+            threads += [threading.Thread(target=consume) for _ in range(nthreads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=30)
+
+            self.assertEqual(sorted(delivered), list(range(ntasks)), msg=placement)
+            self.assertEqual(len(tq), 0, msg="wrong queue length")
+            for shard in tq.shards:
+                shard.check_invariants()
+
+
+if __name__ == "__main__":
+    unittest.main()
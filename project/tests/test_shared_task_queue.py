@@ -0,0 +1,140 @@
+import multiprocessing
+import random
+import unittest
+
+from project.blob_store import BlobHandle
+from project.resources import Resources
+from project.shared_task_queue import SharedTaskQueue
+from project.task import Task
+
+
+def add_tasks_in_child(tq: SharedTaskQueue, first_id: int, ntasks: int) -> None:
+    for ii in range(first_id, first_id + ntasks):
+        tq.add_task(Task(ii, ii % 5 + 1, Resources(1, 1, 0), f"task-{ii}", ii))
+    tq.close()
+
+
+def get_tasks_in_child(tq: SharedTaskQueue, ntasks: int, results) -> None:
+    for _ in range(ntasks):
+        task = tq.get_task(Resources(1, 1, 0))
+        results.put(None if task is None else (task.id, task.content, task.result))
+    tq.close()
+
+
+class TestSharedTaskQueue(unittest.TestCase):
+    def setUp(self):
+        self.tq = SharedTaskQueue(capacity=64, content_size=32)
+
+    def tearDown(self):
+        self.tq.close()
+        self.tq.unlink()
+
+    def test_add_task_and_get_task(self):
+        """Test priority order and first fit within a priority"""
+        tq = self.tq
+        tasks = [
+            Task(1, 3, Resources(1, 1, 0), "c1", None),
+            Task(2, 1, Resources(9, 9, 9), "c2", None),
+            Task(3, 1, Resources(2, 2, 0), "c3", None),
+            Task(4, 1, Resources(1, 1, 0), "c4", None),
+        ]
+        for task in tasks:
+            tq.add_task(task)
+
+        self.assertEqual(len(tq), 4, msg="wrong queue length")
+        self.assertEqual(tq.get_task(Resources(2, 2, 0)), tasks[2])
+        self.assertEqual(tq.get_task(Resources(2, 2, 0)), tasks[3])
+        self.assertEqual(tq.get_task(Resources(2, 2, 0)), tasks[0])
+        self.assertIsNone(tq.get_task(Resources(2, 2, 0)))
+        self.assertEqual(tq.get_task(Resources(9, 9, 9)), tasks[1])
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
+
+    def test_errors(self):
+        """Test duplicates, full queue, wrong priority and large content"""
+        tq = self.tq
+        tq.add_task(Task(1, 1, Resources(1, 1, 0), "c", None))
+
+        with self.assertRaises(ValueError):
+            tq.add_task(Task(1, 2, Resources(1, 1, 0), "c", None))
+        with self.assertRaises(ValueError):
+            tq.add_task(Task(2, 6, Resources(1, 1, 0), "c", None))
+        with self.assertRaises(ValueError):
+            tq.add_task(Task(2, 1, Resources(1, 1, 0), "c" * 33, None))
+        with self.assertRaises(ValueError):
+            tq.pop(2)
+
+        for ii in range(2, 65):
+            tq.add_task(Task(ii, 1, Resources(1, 1, 0), "c", None))
+        with self.assertRaises(ValueError):
+            tq.add_task(Task(100, 1, Resources(1, 1, 0), "c", None))
+
+        self.assertEqual(len(tq), 64, msg="wrong queue length")
+
+    def test_results(self):
+        """Test results are kept, values that would be pickled are refused"""
+        tq = self.tq
+        results = [None, 123, -(2**63), "done", b"\x00raw"]
+        for id, result in enumerate(results):
+            tq.add_task(Task(id, 1, Resources(1, 1, 0), "c", result))
+
+        self.assertEqual([tq.pop(id).result for id in range(5)], results)
+
+        with self.assertRaises(ValueError):
+            tq.add_task(Task(10, 1, Resources(1, 1, 0), "c", {"key": 1}))
+        with self.assertRaises(ValueError):
+            tq.add_task(Task(11, 1, Resources(1, 1, 0), "c", "r" * 64))
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
+
+    def test_blob_handle_content_is_refused(self):
+        """Test a BlobHandle as content is refused, contents are str"""
+        with self.assertRaises(ValueError):
+            self.tq.add_task(Task(1, 1, Resources(1, 1, 0), BlobHandle(0, 8, 3), None))
+        self.assertEqual(len(self.tq), 0, msg="wrong queue length")
+
+    def test_random_operations(self):
+        """Test the queue against a model under random adds and pops"""
+        tq = self.tq
+        rng = random.Random(7)
+        model = dict()
+
+        for _ in range(2000):
+            if len(model) < 64 and (not model or rng.random() < 0.55):
+                id = rng.randrange(10_000)
+                if id in model:
+                    continue
+                task = Task(id, rng.randint(1, 5), Resources(1, 1, 0), str(id), None)
+                tq.add_task(task)
+                model[id] = task
+            else:
+                id = rng.choice(list(model))
+                self.assertEqual(tq.pop(id), model.pop(id), msg="wrong popped task")
+
+            self.assertEqual(len(tq), len(model), msg="wrong queue length")
+
+    def test_multiple_processes(self):
+        """Test producers and consumers in other processes share the queue"""
+        tq = self.tq
+        producers = [
+            multiprocessing.Process(target=add_tasks_in_child, args=(tq, ii * 16, 16))
+            for ii in range(2)
+        ]
+        for process in producers:
+            process.start()
+        for process in producers:
+            process.join(timeout=30)
+
+        self.assertEqual(len(tq), 32, msg="wrong queue length")
+
+        results = multiprocessing.Queue()
+        consumer = multiprocessing.Process(
+            target=get_tasks_in_child, args=(tq, 20, results)
+        )
+        consumer.start()
+        received = [results.get(timeout=30) for _ in range(20)]
+        consumer.join(timeout=30)
+
+        self.assertEqual(len(tq), 12, msg="wrong queue length")
+        self.assertEqual(len(set(received)), 20, msg="task received twice")
+        for id, content, result in received:
+            self.assertEqual(content, f"task-{id}", msg="wrong task content")
+            self.assertEqual(result, id, msg="wrong task result")
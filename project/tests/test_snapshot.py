@@ -0,0 +1,205 @@
+import os
+import tempfile
+import unittest
+
+from project.array_linked_list import ArrayDoublyLinkedList
+from project.concurrent_task_queue import ConcurrentTaskQueue
+from project.doubly_linked_list import DoublyLinkedList
+from project.indexed_linked_list import IndexedDoublyLinkedList
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+from project.wal import WriteAheadLog
+
+
+def dispatch_order(tq: TaskQueue) -> list[list[int]]:
+    return [list(subq.index) for subq in tq.subqueues]
+
+
+class TestSnapshot(unittest.TestCase):
+    list_classes = (DoublyLinkedList, ArrayDoublyLinkedList, IndexedDoublyLinkedList)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "queue.snapshot")
+        self.wal_path = os.path.join(self.dir.name, "queue.wal")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def fill(self, tq: TaskQueue) -> None:
+        tq.add_tasks(
+            Task(ii, ii % 3 + 1, Resources(ii, 2 * ii, ii % 2), f"task-{ii}", None)
+            for ii in range(10)
+        )
+        tq.append_left(Task(10, 2, Resources(1, 1, 1), "ünïcode", 123))
+        tq.insert_at_index(4, Task(11, 1, Resources(3, 3, 3), "some-content", None))
+        tq.change_priority(4, 1, position="front")
+        tq.change_priority(8, 2)
+        tq.move_before(9, 0)
+        tq.get_task(Resources(1, 2, 1))
+
+    def assert_same_queue(self, tq: TaskQueue, loaded: TaskQueue) -> None:
+        self.assertEqual((loaded.id, loaded.name), (tq.id, tq.name))
+        self.assertEqual(loaded.levels, tq.levels, msg="wrong levels")
+        self.assertEqual(list(loaded.tasks), list(tq.tasks), msg="wrong list order")
+        self.assertEqual(dispatch_order(loaded), dispatch_order(tq))
+        self.assertEqual(loaded.nonempty, tq.nonempty, msg="wrong bitmap")
+        loaded.check_invariants()
+
+    def test_round_trip(self):
+        """Test a loaded queue equals the saved one with every list class"""
+        for list_cls in self.list_classes:
+            tq = TaskQueue(3, "tq3", list_cls=list_cls, levels=4)
+            self.fill(tq)
+            tq.snapshot(self.path)
+
+            loaded = TaskQueue.load(self.path, list_cls=list_cls, validate=True)
+            self.assert_same_queue(tq, loaded)
+
+            # both queues keep behaving the same way after the load
+            for queue in (tq, loaded):
+                queue.change_priority(1, 1, position="keep")
+                queue.add_task(Task(12, 1, Resources(0, 0, 0), {"a": 1}, b"raw"))
+            self.assertEqual(dispatch_order(loaded), dispatch_order(tq))
+            self.assertEqual(
+                [loaded.get_task(Resources(9, 9, 9)) for _ in range(len(loaded))],
+                [tq.get_task(Resources(9, 9, 9)) for _ in range(len(tq))],
+                msg="wrong dispatch after load",
+            )
+
+    def test_empty_queue(self):
+        """Test saving and loading an empty queue"""
+        tq = TaskQueue(1, "tq1")
+        tq.snapshot(self.path)
+
+        loaded = TaskQueue.load(self.path)
+        self.assertEqual(len(loaded), 0, msg="wrong queue length")
+        self.assertIsNone(loaded.get_task(Resources(1, 1, 1)))
+
+    def test_not_a_snapshot(self):
+        """Test loading a file that is not a snapshot"""
+        with open(self.path, "wb") as file:
+            file.write(bytes(128))
+
+        with self.assertRaises(ValueError):
+            TaskQueue.load(self.path)
+
+    def test_snapshot_truncates_log(self):
+        """Test a snapshot replaces the log and later changes are replayed"""
+        with WriteAheadLog(self.wal_path) as wal:
+            tq = TaskQueue(1, "tq1", wal=wal)
+            self.fill(tq)
+            tq.snapshot(self.path)
+            self.assertEqual(os.path.getsize(self.wal_path), 0, msg="log is kept")
+
+            tq.add_task(Task(20, 3, Resources(1, 1, 1), "some-content", None))
+            tq.pop(5)
+
+        with WriteAheadLog(self.wal_path) as wal:
+            loaded = TaskQueue.load(self.path, wal=wal)
+            self.assert_same_queue(tq, loaded)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_leased_tasks_are_saved(self):
+        """Test tasks leased at snapshot time are saved as queued ones"""
+        wal = WriteAheadLog(self.wal_path)
+        tq = TaskQueue(1, "tq1", wal=wal)
+        self.fill(tq)
+        leases = [tq.lease_task(Resources(9, 9, 9), ttl=60) for _ in range(4)]
+        tq.snapshot(self.path)
+
+        # after the snapshot: one lease is acked, one nacked, two stay open
+        tq.ack(leases[0][1])
+        tq.nack(leases[1][1])
+        wal.close()
+
+        with WriteAheadLog(self.wal_path) as wal:
+            loaded = TaskQueue.load(self.path, wal=wal, validate=True)
+
+        self.assertEqual(loaded.leases, dict(), msg="leases are restored")
+        tq.wal = None
+        for _, token in leases[2:]:
+            tq.nack(token)
+        self.assert_same_queue(tq, loaded)
+
+    def test_leased_tasks_keep_their_place(self):
+        """Test tasks leased from the front of a subqueue are saved at their place"""
+        tq = TaskQueue(1, "tq1")
+        for id in range(3):
+            tq.append_left(Task(id, 1, Resources(1, 1, 1), "some-content", None))
+        tq.lease_task(Resources(1, 1, 1), ttl=60)
+        tq.lease_task(Resources(1, 1, 1), ttl=60)
+        tq.snapshot(self.path)
+
+        loaded = TaskQueue.load(self.path, validate=True)
+        self.assertEqual(list(loaded.QHIGHEST.index), [2, 1, 0], msg="wrong order")
+
+    def test_leased_task_with_a_taken_key(self):
+        """Test a leased task whose key was reused is saved behind its holder"""
+        tq = TaskQueue(1, "tq1")
+        for id, ram in enumerate((8, 1, 8, 8)):
+            tq.append(Task(id, 1, Resources(ram, 1, 1), "some-content", None))
+        tq.lease_task(Resources(1, 1, 1), ttl=60)
+        tq.move_before(3, 2)
+        tq.snapshot(self.path)
+
+        loaded = TaskQueue.load(self.path, validate=True)
+        self.assertEqual(list(loaded.QHIGHEST.index), [0, 3, 1, 2], msg="wrong order")
+
+    def test_finish_background_snapshot(self):
+        """Test finishing a forked snapshot drops only the changes it holds"""
+        with WriteAheadLog(self.wal_path) as wal:
+            tq = TaskQueue(1, "tq1", wal=wal)
+            self.fill(tq)
+            pid = tq.snapshot(self.path, background=True)
+
+            tq.add_task(Task(20, 3, Resources(1, 1, 1), "some-content", None))
+            tq.change_priority(20, 1, position="front")
+            tq.finish_snapshot(pid)
+            tq.pop(5)
+
+            with self.assertRaises(ValueError):
+                tq.finish_snapshot(pid)
+
+        with WriteAheadLog(self.wal_path) as wal:
+            loaded = TaskQueue.load(self.path, validate=True)
+            self.assertEqual(wal.replay(loaded), 3, msg="log is not trimmed")
+            self.assert_same_queue(tq, loaded)
+
+    def test_delayed_tasks_are_saved(self):
+        """Test delayed tasks are saved with their due times"""
+        tq = TaskQueue(1, "tq1")
+        self.fill(tq)
+        now = tq.clock()
+        for ii in range(20, 25):
+            task = Task(ii, ii % 3 + 1, Resources(1, 1, 0), f"task-{ii}", None)
+            tq.add_task(task, not_before=now + 3600 * (25 - ii))
+        tq.snapshot(self.path)
+
+        loaded = TaskQueue.load(self.path, validate=True)
+        self.assert_same_queue(tq, loaded)
+        self.assertEqual(list(loaded.delayed), [24, 23, 22, 21, 20])
+        for id, (not_before, _, task) in loaded.delayed.items():
+            self.assertEqual(task, tq.delayed[id][2], msg="wrong task")
+            self.assertAlmostEqual(not_before, tq.delayed[id][0], delta=1)
+
+    def test_background_snapshot(self):
+        """Test a forked snapshot holds the state at the time of the fork"""
+        with WriteAheadLog(self.wal_path) as wal:
+            tq = ConcurrentTaskQueue(1, "tq1", wal=wal)
+            self.fill(tq)
+            pid = tq.snapshot(self.path, background=True)
+
+            # changes right after the fork are not in the snapshot
+            tq.add_task(Task(20, 3, Resources(1, 1, 1), "some-content", None))
+            tq.change_priority(20, 1, position="front")
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(status, 0, msg="snapshot process failed")
+
+        self.assertEqual(len(TaskQueue.load(self.path)), len(tq) - 1)
+
+        # the log still holds everything, the load replays only the tail of it
+        with WriteAheadLog(self.wal_path) as wal:
+            loaded = ConcurrentTaskQueue.load(self.path, wal=wal)
+            self.assert_same_queue(tq, loaded)
@@ -48,3 +48,21 @@ class TestSubQueue(unittest.TestCase):
         keys = ["t1", "t2"]
         for ii, k in enumerate(subqueue.tasks.keys()):
             self.assertEqual(keys[ii], k)
+
+    def test_expire(self):
+        """Test expire returns ids that have stayed since an old enough epoch"""
+        subqueue = SubQueue(name="somename", tasks=dict())
+        for epoch, ids in ((0, [1, 2]), (0, [3]), (1, [4]), (3, [5])):
+            subqueue.tasks.update(dict.fromkeys(ids, epoch))
+            subqueue.enter(ids, epoch)
+
+        # task 2 left, task 3 left and entered again in epoch 3
+        subqueue.tasks.pop(2)
+        subqueue.tasks.pop(3)
+        subqueue.tasks[3] = 3
+        subqueue.enter([3], 3)
+
+        self.assertEqual(subqueue.expire(0), [1], msg="wrong ids of epoch 0")
+        self.assertEqual(subqueue.expire(2), [4], msg="wrong ids of epoch 1")
+        self.assertEqual(len(subqueue.entries), 1, msg="wrong number of epochs")
+        self.assertEqual(subqueue.expire(3), [5, 3], msg="wrong ids of epoch 3")
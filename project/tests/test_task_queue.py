@@ -1,15 +1,19 @@
 from collections import defaultdict
 import unittest
 
+from project.array_linked_list import ArrayDoublyLinkedList
+from project.doubly_linked_list import DoublyLinkedList
+from project.indexed_linked_list import IndexedDoublyLinkedList
 from project.resources import Resources
 from project.task import Task
 from project.task_queue import PriorityIntToName, Queue, TaskQueue
+from project.tests.helpers import Clock
 
 
 class TestQueue(unittest.TestCase):
     def test_len(self):
         """Test queue length"""
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
         resources = Resources(1, 1, 1)
 
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -36,7 +40,7 @@ class TestQueue(unittest.TestCase):
 
     def test_subq_len(self):
         """Test subqueue length"""
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
         resources = Resources(1, 1, 1)
 
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -60,7 +64,7 @@ class TestQueue(unittest.TestCase):
 
     def test_insert_task_id_to_subqueue(self):
         """Test inserting an object into a subqueue"""
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
         resources = Resources(1, 1, 1)
 
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -84,7 +88,7 @@ class TestQueue(unittest.TestCase):
     def test_pop_task_id_from_subqueue(self):
         """Test popping an object from a subqueue via object id"""
 
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
 
         self.assertEqual(len(q), 0, msg="wrong queue length")
 
@@ -100,7 +104,7 @@ class TestQueue(unittest.TestCase):
     def test_append(self):
         """Test inserting an object into a queue at the right (end of the queue)"""
 
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
 
         resources = Resources(1, 1, 1)
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -123,7 +127,7 @@ class TestQueue(unittest.TestCase):
     def test_append_left(self):
         """Test inserting an object into a queue at the right (beginning of the queue)"""
 
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
 
         resources = Resources(1, 1, 1)
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -146,7 +150,7 @@ class TestQueue(unittest.TestCase):
     def test_append_right(self):
         """Test inserting an object into a queue at the right (end of the queue)"""
 
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
 
         resources = Resources(1, 1, 1)
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -168,7 +172,7 @@ class TestQueue(unittest.TestCase):
 
     def test_pop(self):
         """Test popping an object from a queue by using object id"""
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
 
         resources = Resources(1, 1, 1)
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -195,7 +199,7 @@ class TestQueue(unittest.TestCase):
     def test_pop_right(self):
         """Test popping an object from a queue from right (end of the queue)"""
 
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
 
         resources = Resources(1, 1, 1)
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -227,7 +231,7 @@ class TestQueue(unittest.TestCase):
     def test_pop_left(self):
         """Test popping an object from a queue from left (beginning of the queue)"""
 
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
 
         resources = Resources(1, 1, 1)
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -259,7 +263,7 @@ class TestQueue(unittest.TestCase):
     def test_insert_at_index(self):
         """Test inserting an object into a queue at index"""
 
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
 
         resources = Resources(1, 1, 1)
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -292,7 +296,7 @@ class TestQueue(unittest.TestCase):
     def test_pop_at_index(self):
         """Test popping an object from at index"""
 
-        q = Queue(1, "q1")
+        q = Queue(1, "q1", validate=True)
 
         resources = Resources(1, 1, 1)
         self.assertEqual(len(q), 0, msg="wrong queue length")
@@ -319,7 +323,7 @@ class TestQueue(unittest.TestCase):
 class TestTaskQueue(unittest.TestCase):
     def test_is_valid_with_resources(self):
         """Test checking whether the consumer has available resources for a task"""
-        tq = TaskQueue(1, "q1")
+        tq = TaskQueue(1, "q1", validate=True)
         available_resources = Resources(100, 100, 10)
 
         invalid_resources = [
@@ -352,7 +356,7 @@ class TestTaskQueue(unittest.TestCase):
 
     def test_append(self):
         """Test appending tasks to a queue"""
-        tq = TaskQueue(1, "q1")
+        tq = TaskQueue(1, "q1", validate=True)
 
         resources = Resources(1, 1, 1)
         self.assertEqual(len(tq), 0, msg="wrong queue length")
@@ -375,7 +379,7 @@ class TestTaskQueue(unittest.TestCase):
     def test_get_task_from_subq(self):
         """Test getting tasks from subqueue"""
 
-        tq = TaskQueue(1, "q1")
+        tq = TaskQueue(1, "q1", validate=True)
         available_resources = Resources(10, 10, 10)
 
         # get tasks with valid resources
@@ -422,7 +426,7 @@ class TestTaskQueue(unittest.TestCase):
     def test_get_task(self):
         """Check functionality of get_task with constant resources for every priority"""
 
-        tq = TaskQueue(1, "q1")
+        tq = TaskQueue(1, "q1", validate=True)
         task_resources = {
             1: Resources(100, 100, 10),
             2: Resources(50, 50, 10),
@@ -480,7 +484,7 @@ class TestTaskQueue(unittest.TestCase):
     def test_get_task_with_varying_task_resources_for_priority(self):
         """Check functionality of get_task with constant resources for every priority"""
 
-        tq = TaskQueue(1, "q1")
+        tq = TaskQueue(1, "q1", validate=True)
         task_resources = {
             1: Resources(100, 100, 10),
             2: Resources(50, 50, 10),
@@ -523,7 +527,7 @@ class TestTaskQueue(unittest.TestCase):
 
     def test_get_no_task_due_to_low_available_resources(self):
         """Test getting no task since consumer does not fit task resources"""
-        tq = TaskQueue(1, "q1")
+        tq = TaskQueue(1, "q1", validate=True)
         task_resources = Resources(3, 3, 3)
         tasks = []
 
@@ -604,8 +608,597 @@ class TestTaskQueueWithManyTasks(unittest.TestCase):
 
         self.assertEqual(len(tq), ntasks - n, msg="wrong queue length")
         self.assertEqual(len(tasks), n, msg="wrong tasks length")
+        tq.check_invariants()
 
         # get full list
         n2 = 200
         available_resources = Resources(100 * n2, 100 * n2, 100 * n2)
         tasks = self.get_tasks_from_queue(tq, 5000, available_resources)
+
+
+class TestTaskQueueFirstFit(unittest.TestCase):
+    def test_get_task_skips_large_tasks(self):
+        """Test small consumers get the earliest small task behind large ones"""
+        tq = TaskQueue(1, "q1", validate=True)
+
+        for ii in range(500):
+            tq.add_task(Task(ii, 1, Resources(100, 100, 8), "some-content", 123))
+
+        small_tasks = []
+        for ii in range(500, 505):
+            task = Task(ii, 1, Resources(1, 1, 0), "some-content", 123)
+            tq.add_task(task)
+            small_tasks.append(task)
+
+        for task in small_tasks:
+            self.assertEqual(
+                tq.get_task(Resources(2, 2, 0)),
+                task,
+                msg="retrieved task is not the earliest fitting one",
+            )
+
+        self.assertIsNone(tq.get_task(Resources(2, 2, 0)))
+        self.assertEqual(len(tq), 500, msg="wrong queue length")
+
+    def test_append_left_is_dispatched_first(self):
+        """Test a task appended from the left is the first one of its subqueue"""
+        tq = TaskQueue(1, "q1", validate=True)
+        resources = Resources(1, 1, 1)
+
+        for ii in range(3):
+            tq.add_task(Task(ii, 2, resources, "some-content", 123))
+
+        task = Task(100, 2, resources, "some-content", 123)
+        tq.append_left(task)
+
+        self.assertEqual(tq.get_task(resources), task, msg="wrong retrieved task")
+
+    def test_duplicate_id_does_not_reach_subqueue(self):
+        """Test a rejected duplicate leaves subqueues untouched"""
+        tq = TaskQueue(1, "q1", validate=True)
+        tq.add_task(Task(1, 1, Resources(1, 1, 1), "some-content", 123))
+        tq.add_task(Task(2, 1, Resources(1, 1, 1), "some-content", 123))
+
+        with self.assertRaises(ValueError):
+            tq.add_task(Task(1, 3, Resources(1, 1, 1), "some-content", 123))
+
+        self.assertEqual(tq.subq_len(3), 0, msg="wrong sub queue length")
+        self.assertEqual(len(tq), 2, msg="wrong queue length")
+
+    def test_min_resources(self):
+        """Test subqueue resource frontier through queue operations"""
+        tq = TaskQueue(1, "q1", validate=True)
+        self.assertIsNone(tq.min_resources(1), msg="empty subqueue has minima")
+
+        tq.append(Task(1, 1, Resources(8, 2, 1), "some-content", 123))
+        tq.append_left(Task(2, 1, Resources(4, 4, 0), "some-content", 123))
+        tq.insert_at_index(1, Task(3, 1, Resources(6, 1, 2), "some-content", 123))
+        self.assertEqual(tq.min_resources(1), Resources(4, 1, 0))
+
+        tq.pop(2)
+        self.assertEqual(tq.min_resources(1), Resources(6, 1, 1))
+
+        tq.pop_at_index(1)
+        self.assertEqual(tq.min_resources(1), Resources(8, 2, 1))
+
+        tq.pop_left()
+        self.assertIsNone(tq.min_resources(1), msg="empty subqueue has minima")
+
+
+class TestTaskQueueBatchDispatch(unittest.TestCase):
+    def test_get_tasks(self):
+        """Test filling available resources respects priority order"""
+        tq = TaskQueue(1, "q1", validate=True)
+
+        tasks = {
+            1: Task(1, 3, Resources(8, 8, 0), "some-content", 123),
+            2: Task(2, 1, Resources(32, 32, 4), "some-content", 123),
+            3: Task(3, 1, Resources(64, 64, 8), "some-content", 123),
+            4: Task(4, 2, Resources(16, 16, 2), "some-content", 123),
+            5: Task(5, 5, Resources(8, 8, 2), "some-content", 123),
+            6: Task(6, 5, Resources(4, 4, 0), "some-content", 123),
+        }
+        for task in tasks.values():
+            tq.add_task(task)
+
+        batch, leftover = tq.get_tasks(Resources(64, 64, 8), 10)
+
+        self.assertEqual(
+            batch,
+            [tasks[2], tasks[4], tasks[1], tasks[5]],
+            msg="wrong batch of tasks",
+        )
+        self.assertEqual(leftover, Resources(0, 0, 0), msg="wrong leftover")
+        self.assertEqual(len(tq), 2, msg="wrong queue length")
+        self.assertEqual(tq.subq_len(1), 1, msg="wrong sub queue length")
+
+    def test_get_tasks_with_max_tasks(self):
+        """Test batch dispatch stops at max_tasks"""
+        tq = TaskQueue(1, "q1", validate=True)
+        resources = Resources(1, 1, 1)
+
+        for ii in range(20):
+            tq.add_task(Task(ii, ii % 5 + 1, resources, "some-content", 123))
+
+        batch, leftover = tq.get_tasks(Resources(100, 100, 100), 7)
+
+        self.assertEqual(len(batch), 7, msg="wrong batch length")
+        self.assertEqual(
+            [task.priority for task in batch],
+            [1, 1, 1, 1, 2, 2, 2],
+            msg="wrong priorities in batch",
+        )
+        self.assertEqual(leftover, Resources(93, 93, 93), msg="wrong leftover")
+        self.assertEqual(len(tq), 13, msg="wrong queue length")
+
+        batch, leftover = tq.get_tasks(Resources(0, 0, 0), 7)
+        self.assertEqual(batch, [], msg="wrong batch")
+        self.assertEqual(leftover, Resources(0, 0, 0), msg="wrong leftover")
+
+
+class TestTaskQueueBulkEnqueue(unittest.TestCase):
+    def test_add_tasks(self):
+        """Test bulk enqueue keeps the same order as a loop of add_task"""
+        tq = TaskQueue(1, "q1", validate=True)
+        tq_loop = TaskQueue(2, "q2", validate=True)
+
+        tasks = [
+            Task(ii, ii % 5 + 1, Resources(ii, ii, ii), "some-content", 123)
+            for ii in range(200)
+        ]
+        tq.add_tasks(iter(tasks[:1]))
+        tq.add_tasks(tasks[1:])
+        for task in tasks:
+            tq_loop.add_task(task)
+
+        self.assertEqual(len(tq), 200, msg="wrong queue length")
+        for priority_int in PriorityIntToName:
+            self.assertEqual(tq.subq_len(priority_int), 40, msg="wrong subq length")
+
+        for _ in range(200):
+            self.assertEqual(
+                tq.get_task(Resources(150, 150, 150)),
+                tq_loop.get_task(Resources(150, 150, 150)),
+                msg="bulk and looped enqueue differ",
+            )
+
+    def test_add_tasks_is_atomic(self):
+        """Test a batch with a duplicate id or a wrong priority is rejected"""
+        tq = TaskQueue(1, "q1", validate=True)
+        tq.add_task(Task(1, 1, Resources(1, 1, 1), "some-content", 123))
+
+        batches = [
+            [
+                Task(2, 2, Resources(1, 1, 1), "c", 0),
+                Task(1, 3, Resources(1, 1, 1), "c", 0),
+            ],
+            [
+                Task(2, 2, Resources(1, 1, 1), "c", 0),
+                Task(2, 3, Resources(1, 1, 1), "c", 0),
+            ],
+            [
+                Task(2, 2, Resources(1, 1, 1), "c", 0),
+                Task(3, 9, Resources(1, 1, 1), "c", 0),
+            ],
+        ]
+        for batch in batches:
+            with self.assertRaises(ValueError):
+                tq.add_tasks(batch)
+
+            self.assertEqual(len(tq), 1, msg="wrong queue length")
+            for priority_int in (2, 3):
+                self.assertEqual(tq.subq_len(priority_int), 0, msg="wrong subq length")
+
+
+class TestQueueReordering(unittest.TestCase):
+    list_classes = (DoublyLinkedList, ArrayDoublyLinkedList, IndexedDoublyLinkedList)
+
+    def make_queue(self, list_cls: type) -> tuple[TaskQueue, list[Task]]:
+        tq = TaskQueue(1, "q1", list_cls=list_cls, validate=True)
+        tasks = [
+            Task(ii, ii % 2 + 1, Resources(1, 1, 1), "some-content", 123)
+            for ii in range(10)
+        ]
+        tq.add_tasks(tasks)
+        return tq, tasks
+
+    def dispatch_order(self, tq: TaskQueue) -> list[int]:
+        order = []
+        while len(tq) > 0:
+            order.append(tq.get_task(Resources(1, 1, 1)).id)
+        return order
+
+    def test_change_priority_keep(self):
+        """Test changing priority keeps the enqueue order in the new subqueue"""
+        for list_cls in self.list_classes:
+            tq, _ = self.make_queue(list_cls)
+
+            tq.change_priority(5, 1)
+            tq.change_priority(2, 5)
+
+            self.assertEqual(tq.subq_len(1), 5, msg="wrong sub queue length")
+            self.assertEqual(tq.subq_len(5), 1, msg="wrong sub queue length")
+            self.assertEqual(tq.index_of(5), 5, msg="task moved in the list")
+            self.assertEqual(self.dispatch_order(tq), [0, 4, 5, 6, 8, 1, 3, 7, 9, 2])
+
+    def test_change_priority_front_and_back(self):
+        """Test changing priority to the front or the back of a subqueue"""
+        for list_cls in self.list_classes:
+            tq, _ = self.make_queue(list_cls)
+
+            tq.change_priority(9, 1, position="front")
+            tq.change_priority(0, 1, position="back")
+            tq.change_priority(4, 3, position="front")
+
+            self.assertEqual(tq.index_of(9), 0, msg="wrong position in the list")
+            self.assertEqual(tq.index_of(0), 9, msg="wrong position in the list")
+            self.assertEqual(self.dispatch_order(tq), [9, 2, 6, 8, 0, 1, 3, 5, 7, 4])
+
+    def test_move_before_and_after(self):
+        """Test moving a task next to another task of the same priority"""
+        for list_cls in self.list_classes:
+            tq, _ = self.make_queue(list_cls)
+
+            tq.move_before(8, 0)
+            tq.move_after(1, 7)
+            tq.move_before(6, 4)
+
+            self.assertEqual(tq.index_of(8), 0, msg="wrong position in the list")
+            self.assertEqual(tq.index_of(1), 8, msg="wrong position in the list")
+            self.assertEqual(self.dispatch_order(tq), [8, 0, 2, 6, 4, 3, 5, 7, 1, 9])
+
+    def test_many_moves_into_one_gap(self):
+        """Test keys stay unique when many moves go into the same gap"""
+        tq = TaskQueue(1, "q1", validate=True)
+        tq.add_tasks(
+            Task(ii, 1, Resources(1, 1, 1), "some-content", 123) for ii in range(200)
+        )
+
+        for ii in range(3, 100):
+            tq.move_before(ii, 2)
+        tq.pop(0)
+        tq.pop(1)
+        task, token = tq.lease_task(Resources(1, 1, 1), ttl=60)
+        self.assertEqual(task.id, 3, msg="wrong task leased")
+        for ii in range(100, 200):
+            tq.move_before(ii, 2)
+
+        tq.change_priority(199, 2)
+        tq.change_priority(199, 1)
+        tq.nack(token)
+
+        ids, seqs = tq.subqueue(1).index.columns()
+        self.assertEqual(len(set(seqs)), len(seqs), msg="keys are not unique")
+        self.assertEqual(self.dispatch_order(tq), list(range(3, 200)) + [2])
+
+    def test_reordering_errors(self):
+        """Test reordering with wrong arguments leaves the queue untouched"""
+        tq, _ = self.make_queue(DoublyLinkedList)
+
+        with self.assertRaises(ValueError):
+            tq.change_priority(1, 6)
+        with self.assertRaises(ValueError):
+            tq.change_priority(1, 2, position="middle")
+        with self.assertRaises(ValueError):
+            tq.change_priority(100, 2)
+        with self.assertRaises(ValueError):
+            tq.move_before(1, 2)
+        with self.assertRaises(ValueError):
+            tq.move_after(1, 1)
+
+        self.assertEqual(self.dispatch_order(tq), [0, 2, 4, 6, 8, 1, 3, 5, 7, 9])
+
+
+class TestTaskQueueLevels(unittest.TestCase):
+    def test_default_levels(self):
+        """Test the default five levels keep their named subqueues"""
+        tq = TaskQueue(1, "tq1", validate=True)
+
+        self.assertEqual(tq.levels, len(PriorityIntToName), msg="wrong levels")
+        for priority_int, priority_name in PriorityIntToName.items():
+            self.assertIs(
+                getattr(tq, priority_name),
+                tq.subqueue(priority_int),
+                msg="named subqueue differs from the indexed one",
+            )
+
+    def test_many_levels(self):
+        """Test dispatch order with many priority levels"""
+        tq = TaskQueue(1, "tq1", levels=100, validate=True)
+        resources = Resources(1, 1, 1)
+
+        for ii, priority_int in enumerate([100, 37, 64, 1, 37]):
+            tq.add_task(Task(ii, priority_int, resources, "some-content", 123))
+
+        self.assertFalse(hasattr(tq, "QHIGHEST"), msg="named subqueue exists")
+        self.assertEqual(list(tq.nonempty_priorities()), [1, 37, 64, 100])
+        self.assertEqual(
+            [tq.get_task(resources).id for _ in range(5)],
+            [3, 1, 4, 2, 0],
+            msg="wrong dispatch order",
+        )
+        self.assertIsNone(tq.get_task(resources), msg="queue is not empty")
+        self.assertEqual(tq.nonempty, 0, msg="empty levels are still marked")
+
+    def test_nonempty_bitmap(self):
+        """Test the bitmap follows non-empty levels"""
+        tq = TaskQueue(1, "tq1", levels=16, validate=True)
+        resources = Resources(1, 1, 1)
+
+        tq.add_tasks(
+            Task(ii, priority_int, resources, "some-content", 123)
+            for ii, priority_int in enumerate([16, 3, 3])
+        )
+        tq.append_left(Task(3, 9, resources, "some-content", 123))
+        self.assertEqual(list(tq.nonempty_priorities()), [3, 9, 16])
+
+        tq.change_priority(0, 3)
+        tq.pop(3)
+        self.assertEqual(list(tq.nonempty_priorities()), [3])
+
+    def test_wrong_levels(self):
+        """Test wrong levels and priorities"""
+        with self.assertRaises(ValueError):
+            TaskQueue(1, "tq1", levels=0)
+
+        tq = TaskQueue(1, "tq1", levels=3, validate=True)
+        with self.assertRaises(ValueError):
+            tq.add_task(Task(0, 4, Resources(1, 1, 1), "some-content", 123))
+        with self.assertRaises(ValueError):
+            tq.add_tasks([Task(0, 0, Resources(1, 1, 1), "some-content", 123)])
+
+        self.assertEqual(len(tq), 0, msg="wrong queue length")
+
+
+class TestQueueCounters(unittest.TestCase):
+    def test_subq_resources(self):
+        """Test summed resources of subqueues follow every change"""
+        tq = TaskQueue(1, "tq1", validate=True)
+
+        tq.add_tasks(
+            Task(ii, ii % 2 + 1, Resources(ii, 2 * ii, 1), "some-content", 123)
+            for ii in range(10)
+        )
+        self.assertEqual(tq.subq_resources(1), Resources(20, 40, 5))
+        self.assertEqual(tq.subq_resources(2), Resources(25, 50, 5))
+
+        tq.change_priority(9, 1)
+        tq.pop(0)
+        tq.append_left(Task(10, 3, Resources(7, 7, 7), "some-content", 123))
+        self.assertEqual(tq.subq_resources(1), Resources(29, 58, 5))
+        self.assertEqual(tq.subq_resources(2), Resources(16, 32, 4))
+        self.assertEqual(tq.subq_resources(3), Resources(7, 7, 7))
+
+        while tq.get_task(Resources(100, 100, 100)) is not None:
+            pass
+        for priority_int in range(1, tq.levels + 1):
+            self.assertEqual(tq.subq_resources(priority_int), Resources(0, 0, 0))
+            self.assertEqual(tq.subq_len(priority_int), 0, msg="wrong subq length")
+
+    def test_check_invariants(self):
+        """Test the consistency check catches structures out of sync"""
+        tq = TaskQueue(1, "tq1")
+        resources = Resources(1, 1, 1)
+        tq.add_tasks(Task(ii, 1, resources, "some-content", 123) for ii in range(3))
+        tq.check_invariants()
+
+        tq.tasks.pop(1)
+        self.assertEqual(len(tq), 2, msg="wrong queue length")
+        with self.assertRaises(ValueError):
+            tq.check_invariants()
+
+        tq = TaskQueue(1, "tq1")
+        tq.add_tasks(Task(ii, 1, resources, "some-content", 123) for ii in range(3))
+        tq.QHIGHEST.index.remove(2)
+        with self.assertRaises(ValueError):
+            tq.check_invariants()
+
+        tq = TaskQueue(1, "tq1", validate=True)
+        tq.add_task(Task(0, 1, resources, "some-content", 123))
+        tq.QHIGH.tasks[5] = True
+        with self.assertRaises(ValueError):
+            tq.add_task(Task(1, 1, resources, "some-content", 123))
+
+
+class TestTaskQueueLeases(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.tq = TaskQueue(1, "tq1", validate=True)
+        self.tq.clock = self.clock
+        self.tq.add_tasks(
+            Task(ii, ii % 2 + 1, Resources(1, 1, 0), "some-content", None)
+            for ii in range(6)
+        )
+
+    def test_ack(self):
+        """Test an acked task leaves the queue for good"""
+        task, token = self.tq.lease_task(Resources(1, 1, 0), ttl=10)
+        self.assertEqual(task.id, 0, msg="wrong task leased")
+        self.assertEqual(len(self.tq), 5, msg="leased task is still visible")
+
+        self.assertEqual(self.tq.ack(token), task, msg="wrong task acked")
+        self.clock.now = 100
+        self.assertEqual(self.tq.expire_leases(), 0, msg="acked lease expired")
+        self.assertEqual(len(self.tq), 5, msg="wrong queue length")
+
+        with self.assertRaises(ValueError):
+            self.tq.ack(token)
+        self.assertIsNone(self.tq.lease_task(Resources(0, 0, 0), ttl=10))
+
+    def test_nack_and_expiry_keep_the_place(self):
+        """Test a task comes back to its place on nack and on expiry"""
+        _, token_0 = self.tq.lease_task(Resources(1, 1, 0), ttl=10)
+        _, token_2 = self.tq.lease_task(Resources(1, 1, 0), ttl=5)
+        self.tq.add_task(Task(6, 1, Resources(1, 1, 0), "some-content", None))
+
+        self.tq.nack(token_0)
+        self.assertEqual(list(self.tq.QHIGHEST.index), [0, 4, 6])
+
+        self.clock.now = 4.9
+        self.assertEqual(self.tq.expire_leases(), 0, msg="lease expired early")
+        self.clock.now = 5.0
+        ids = [self.tq.get_task(Resources(1, 1, 0)).id for _ in range(3)]
+        self.assertEqual(ids, [0, 2, 4], msg="expired task not back in place")
+
+        with self.assertRaises(ValueError):
+            self.tq.ack(token_2)
+
+    def test_nack_keeps_the_place_at_the_front(self):
+        """Test tasks put in front of their subqueue come back to their place"""
+        resources = Resources(1, 1, 0)
+        self.tq.append_left(Task(10, 1, resources, "some-content", None))
+        self.tq.append_left(Task(11, 1, resources, "some-content", None))
+        self.tq.move_before(4, 11)
+        self.tq.change_priority(1, 1, "front")
+        order = [1, 4, 11, 10, 0, 2]
+        self.assertEqual(list(self.tq.QHIGHEST.index), order, msg="wrong order")
+
+        tokens = [self.tq.lease_task(resources, ttl=10)[1] for _ in range(5)]
+        for token in [tokens[2], tokens[0], tokens[4], tokens[1], tokens[3]]:
+            self.tq.nack(token)
+        self.assertEqual(list(self.tq.QHIGHEST.index), order, msg="wrong place")
+
+        self.tq.move_after(11, 2)
+        self.tq.move_before(2, 1)
+        _, token = self.tq.lease_task(resources, ttl=10)
+        self.tq.nack(token)
+        self.assertEqual(list(self.tq.QHIGHEST.index), [2, 1, 4, 10, 0, 11])
+
+    def test_renew(self):
+        """Test a renewed lease expires at its new deadline only"""
+        task, token = self.tq.lease_task(Resources(1, 1, 0), ttl=5)
+        self.clock.now = 4
+        self.tq.renew(token, ttl=5)
+
+        self.clock.now = 8
+        self.assertEqual(self.tq.expire_leases(), 0, msg="renewed lease expired")
+        self.clock.now = 9
+        self.assertEqual(self.tq.expire_leases(), 1, msg="lease did not expire")
+        self.assertEqual(self.tq.QHIGHEST.index.first(), task.id)
+
+    def test_leased_id_is_rejected(self):
+        """Test the id of a leased task cannot be added until it is acked"""
+        task, token = self.tq.lease_task(Resources(1, 1, 0), ttl=5)
+        other = Task(task.id, 2, Resources(2, 2, 0), "other-content", None)
+        with self.assertRaises(ValueError):
+            self.tq.add_task(other)
+        with self.assertRaises(ValueError):
+            self.tq.add_tasks([other])
+        with self.assertRaises(ValueError):
+            self.tq.add_task(other, not_before=self.clock() + 5)
+
+        self.tq.nack(token)
+        self.assertEqual(self.tq.get_node_by_id(task.id).item, task)
+
+        task, token = self.tq.lease_task(Resources(1, 1, 0), ttl=5)
+        self.tq.ack(token)
+        self.assertIs(self.tq.add_task(other), other, msg="acked id is not free")
+        self.tq.check_invariants()
+
+    def test_many_leases(self):
+        """Test expiry pops only the deadlines that are due"""
+        tq = TaskQueue(1, "tq1")
+        tq.clock = self.clock
+        tq.add_tasks(
+            Task(ii, 1, Resources(1, 1, 0), "some-content", None) for ii in range(1000)
+        )
+        tokens = [
+            tq.lease_task(Resources(1, 1, 0), ttl=ii + 1)[1] for ii in range(1000)
+        ]
+        for token in tokens[::2]:
+            tq.ack(token)
+
+        self.clock.now = 100.5
+        self.assertEqual(tq.expire_leases(), 50, msg="wrong number expired")
+        self.assertEqual(len(tq.lease_deadlines), 900, msg="deadlines not popped")
+        self.assertEqual(list(tq.QHIGHEST.index), list(range(1, 100, 2)))
+
+
+class TestTaskQueueDelayed(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.tq = TaskQueue(1, "tq1", validate=True)
+        self.tq.clock = self.clock
+        self.tq.add_tasks(
+            Task(ii, 1, Resources(1, 1, 0), "some-content", None) for ii in range(3)
+        )
+
+    def test_not_dispatched_before_due(self):
+        """Test a delayed task is dispatched only once it is due"""
+        self.tq.add_task(Task(3, 1, Resources(1, 1, 0), "some-content", None), 10)
+        self.tq.add_task(Task(4, 2, Resources(1, 1, 0), "some-content", None), 5)
+        self.assertEqual(len(self.tq), 3, msg="delayed task is queued")
+
+        ids = [self.tq.get_task(Resources(1, 1, 0)).id for _ in range(3)]
+        self.assertEqual(ids, [0, 1, 2], msg="wrong tasks dispatched")
+        self.assertIsNone(self.tq.get_task(Resources(1, 1, 0)))
+
+        self.clock.now = 5
+        self.assertEqual(self.tq.get_task(Resources(1, 1, 0)).id, 4)
+        self.assertIsNone(self.tq.get_task(Resources(1, 1, 0)))
+        self.clock.now = 10
+        self.assertEqual(self.tq.get_task(Resources(1, 1, 0)).id, 3)
+        self.assertEqual(self.tq.delayed, dict(), msg="delayed task is kept")
+
+    def test_due_tasks_join_the_end(self):
+        """Test due tasks join the end of their subqueue in due order"""
+        for id, not_before in ((3, 2), (4, 1), (5, 2)):
+            task = Task(id, 1, Resources(1, 1, 0), "some-content", None)
+            self.tq.add_task(task, not_before=not_before)
+        self.tq.add_task(Task(6, 1, Resources(1, 1, 0), "some-content", None), 0)
+
+        self.clock.now = 2
+        self.assertEqual(self.tq.promote_due(), 3, msg="wrong number promoted")
+        self.assertEqual(list(self.tq.QHIGHEST.index), [0, 1, 2, 6, 4, 3, 5])
+        self.assertEqual(self.tq.promote_due(), 0, msg="task promoted twice")
+
+    def test_duplicate_ids(self):
+        """Test a delayed id cannot be queued or delayed again and vice versa"""
+        self.tq.add_task(Task(3, 1, Resources(1, 1, 0), "some-content", None), 10)
+
+        with self.assertRaises(ValueError):
+            self.tq.add_task(Task(3, 1, Resources(1, 1, 0), "some-content", None))
+        with self.assertRaises(ValueError):
+            self.tq.add_tasks([Task(3, 2, Resources(1, 1, 0), "some-content", None)])
+        with self.assertRaises(ValueError):
+            self.tq.add_task(Task(0, 1, Resources(1, 1, 0), "some-content", None), 10)
+        with self.assertRaises(ValueError):
+            self.tq.add_task(Task(4, 9, Resources(1, 1, 0), "some-content", None), 10)
+        self.assertEqual((len(self.tq), len(self.tq.delayed)), (3, 1))
+
+    def test_cancel_and_promote(self):
+        """Test delayed tasks can be cancelled or made eligible early"""
+        tasks = [
+            Task(ii, 2, Resources(1, 1, 0), "some-content", None) for ii in range(3, 9)
+        ]
+        for task in tasks:
+            self.tq.add_task(task, not_before=10)
+
+        self.assertEqual(self.tq.cancel_delayed(3), tasks[0], msg="wrong task")
+        with self.assertRaises(ValueError):
+            self.tq.cancel_delayed(3)
+
+        self.tq.promote([5, 4])
+        self.assertEqual(list(self.tq.QHIGH.index), [5, 4], msg="wrong order")
+        with self.assertRaises(ValueError):
+            self.tq.promote([4])
+
+        self.assertEqual(self.tq.cancel_delayed(6), tasks[3], msg="wrong task")
+        self.assertEqual(len(self.tq.delayed_heap), 2, msg="heap is not rebuilt")
+
+        self.clock.now = 10
+        self.assertEqual(self.tq.promote_due(), 2, msg="wrong number promoted")
+        self.assertEqual(list(self.tq.QHIGH.index), [5, 4, 7, 8])
+
+    def test_many_delayed(self):
+        """Test promotion pops only the due times that have passed"""
+        tq = TaskQueue(1, "tq1")
+        tq.clock = self.clock
+        for ii in range(1000):
+            tq.add_task(Task(ii, 1, Resources(1, 1, 0), "some-content", None), ii + 1)
+
+        self.clock.now = 100.5
+        tasks, _ = tq.get_tasks(Resources(1000, 1000, 0), 1000)
+        self.assertEqual([task.id for task in tasks], list(range(100)))
+        self.assertEqual(len(tq.delayed_heap), 900, msg="due times not popped")
+        self.assertEqual(len(tq.delayed), 900, msg="wrong number delayed")
@@ -0,0 +1,198 @@
+import os
+import tempfile
+import time
+import unittest
+
+from project.doubly_linked_list import DoublyLinkedList
+from project.resources import Resources
+from project.task import Task
+from project.task_queue import TaskQueue
+from project.wal import Modes, WriteAheadLog
+
+
+def dispatch_order(tq: TaskQueue) -> list[int]:
+    return [
+        task_id
+        for priority_int in range(1, tq.levels + 1)
+        for task_id in tq.subqueue(priority_int).index
+    ]
+
+
+def list_order(tq: TaskQueue) -> list[int]:
+    ids, node = [], tq.tasks.start_node
+    while node is not None:
+        ids.append(node.item.id)
+        node = node.next_item
+    return ids
+
+
+class TestWriteAheadLog(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "queue.wal")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def fill(self, tq: TaskQueue) -> None:
+        tq.add_tasks(
+            Task(ii, ii % 3 + 1, Resources(ii, ii, 0), f"task-{ii}", None)
+            for ii in range(10)
+        )
+        tq.add_task(Task(10, 2, Resources(1, 1, 1), "some-content", 123))
+        tq.append_left(Task(11, 1, Resources(2, 2, 2), b"raw", {"key": 1}))
+        tq.insert_at_index(3, Task(12, 3, Resources(3, 3, 3), "some-content", 1))
+        tq.get_task(Resources(5, 5, 5))
+        tq.pop_right()
+        tq.change_priority(4, 1, position="front")
+        tq.change_priority(7, 3)
+        tq.move_after(0, 9)
+
+    def test_replay(self):
+        """Test a queue is rebuilt from the log in every mode"""
+        for mode in Modes:
+            with WriteAheadLog(self.path, mode=mode) as wal:
+                tq = TaskQueue(1, "tq1", wal=wal, validate=True)
+                self.fill(tq)
+
+            with WriteAheadLog(self.path, mode=mode) as wal:
+                recovered = TaskQueue(1, "tq1", wal=wal, validate=True)
+
+                self.assertEqual(list_order(recovered), list_order(tq))
+                self.assertEqual(dispatch_order(recovered), dispatch_order(tq))
+                for task_id in list_order(tq):
+                    self.assertEqual(
+                        recovered.get_node_by_id(task_id).item,
+                        tq.get_node_by_id(task_id).item,
+                        msg="wrong recovered task",
+                    )
+
+                # the recovered queue keeps logging on top of the replayed log
+                recovered.get_task(Resources(100, 100, 100))
+
+            with WriteAheadLog(self.path, mode=mode) as wal:
+                self.assertEqual(len(TaskQueue(1, "tq1", wal=wal)), len(tq) - 1)
+
+            os.remove(self.path)
+
+    def test_leases(self):
+        """Test leases are replayed and open ones expire after a restart"""
+        with WriteAheadLog(self.path) as wal:
+            tq = TaskQueue(1, "tq1", wal=wal, validate=True)
+            self.fill(tq)
+            leases = [tq.lease_task(Resources(9, 9, 9), ttl=60) for _ in range(4)]
+            tq.ack(leases[0][1])
+            tq.nack(leases[1][1])
+            expected = dispatch_order(tq)
+
+        with WriteAheadLog(self.path) as wal:
+            recovered = TaskQueue(1, "tq1", wal=wal, validate=True)
+            self.assertEqual(len(recovered.leases), 2, msg="wrong open leases")
+            self.assertEqual(recovered.lease_token, leases[-1][1])
+
+            # the consumers of open leases are gone, their tasks come back
+            self.assertEqual(recovered.expire_leases(), 2, msg="leases not expired")
+            tq.wal = None
+            for _, token in leases[2:]:
+                tq.nack(token)
+            self.assertEqual(dispatch_order(recovered), dispatch_order(tq))
+            self.assertNotEqual(dispatch_order(recovered), expected)
+
+        with WriteAheadLog(self.path) as wal:
+            recovered = TaskQueue(1, "tq1", wal=wal, validate=True)
+            self.assertEqual(recovered.leases, dict(), msg="requeue not logged")
+            self.assertEqual(dispatch_order(recovered), dispatch_order(tq))
+
+    def test_delayed_tasks(self):
+        """Test delayed tasks are replayed with the same wall-clock due times"""
+        with WriteAheadLog(self.path) as wal:
+            tq = TaskQueue(1, "tq1", wal=wal, validate=True)
+            self.fill(tq)
+            now = tq.clock()
+            for ii in range(20, 25):
+                task = Task(ii, ii % 3 + 1, Resources(1, 1, 0), f"task-{ii}", None)
+                tq.add_task(task, not_before=now + 3600 * (ii - 19))
+            tq.promote([22])
+            tq.cancel_delayed(23)
+            tq.get_task(Resources(1, 1, 0))
+
+        with WriteAheadLog(self.path) as wal:
+            recovered = TaskQueue(1, "tq1", wal=wal, validate=True)
+            self.assertEqual(dispatch_order(recovered), dispatch_order(tq))
+            self.assertEqual(list_order(recovered), list_order(tq))
+            self.assertEqual(list(recovered.delayed), [20, 21, 24])
+            for id, (not_before, _, task) in recovered.delayed.items():
+                self.assertEqual(task, tq.delayed[id][2], msg="wrong task")
+                self.assertAlmostEqual(not_before, tq.delayed[id][0], delta=1)
+
+            # a due task is promoted once and the promotion is logged
+            recovered.clock = lambda: now + 3600.5
+            self.assertEqual(recovered.promote_due(), 1, msg="task not promoted")
+
+        with WriteAheadLog(self.path) as wal:
+            recovered = TaskQueue(1, "tq1", wal=wal, validate=True)
+            self.assertEqual(list(recovered.delayed), [21, 24], msg="not logged")
+
+    def test_torn_tail(self):
+        """Test a partially written last record is cut off on replay"""
+        with WriteAheadLog(self.path, mode="sync") as wal:
+            tq = TaskQueue(1, "tq1", wal=wal)
+            for ii in range(5):
+                tq.add_task(Task(ii, 1, Resources(1, 1, 1), "some-content", None))
+
+        with open(self.path, "r+b") as file:
+            file.truncate(os.path.getsize(self.path) - 3)
+
+        with WriteAheadLog(self.path) as wal:
+            tq = TaskQueue(1, "tq1", wal=wal)
+            self.assertEqual(list_order(tq), [0, 1, 2, 3], msg="wrong recovery")
+            tq.add_task(Task(5, 1, Resources(1, 1, 1), "some-content", None))
+
+        with WriteAheadLog(self.path) as wal:
+            tq = TaskQueue(1, "tq1", wal=wal)
+            self.assertEqual(list_order(tq), [0, 1, 2, 3, 5], msg="wrong recovery")
+
+    def test_failed_change_is_not_logged(self):
+        """Test a rejected change does not reach the log"""
+        with WriteAheadLog(self.path) as wal:
+            tq = TaskQueue(1, "tq1", list_cls=DoublyLinkedList, wal=wal)
+            tq.add_task(Task(0, 1, Resources(1, 1, 1), "some-content", None))
+            with self.assertRaises(ValueError):
+                tq.add_task(Task(0, 1, Resources(1, 1, 1), "some-content", None))
+            with self.assertRaises(ValueError):
+                tq.add_task(Task(1, 9, Resources(1, 1, 1), "some-content", None))
+
+        with WriteAheadLog(self.path) as wal:
+            self.assertEqual(len(TaskQueue(1, "tq1", wal=wal)), 1)
+
+    def test_group_commit(self):
+        """Test group mode syncs once a batch is complete"""
+        with WriteAheadLog(self.path, mode="group", batch_size=4, interval=60) as wal:
+            tq = TaskQueue(1, "tq1", wal=wal)
+            for ii in range(3):
+                tq.add_task(Task(ii, 1, Resources(1, 1, 1), "some-content", None))
+            self.assertEqual(wal.pending, 3, msg="wrong pending records")
+
+            tq.add_task(Task(3, 1, Resources(1, 1, 1), "some-content", None))
+            self.assertEqual(wal.pending, 0, msg="batch is not synced")
+
+    def test_group_commit_when_idle(self):
+        """Test group mode syncs records left pending once the writes stop"""
+        with WriteAheadLog(
+            self.path, mode="group", batch_size=100, interval=0.5
+        ) as wal:
+            tq = TaskQueue(1, "tq1", wal=wal)
+            wal.sync()
+            for ii in range(3):
+                tq.add_task(Task(ii, 1, Resources(1, 1, 1), "some-content", None))
+            self.assertEqual(wal.pending, 3, msg="burst is synced")
+            self.assertEqual(os.path.getsize(self.path), 0, msg="burst is written")
+
+            deadline = time.monotonic() + 5
+            while wal.pending and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(wal.pending, 0, msg="idle records are not synced")
+            self.assertGreater(os.path.getsize(self.path), 0, msg="nothing written")
+
+            with WriteAheadLog(self.path) as other:
+                self.assertEqual(len(TaskQueue(2, "tq2", wal=other)), 3)
@@ -0,0 +1,340 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from enum import IntEnum
+
+from .codec import INT, decode_task, decode_value, encode_task, encode_value
+
+
+class Op(IntEnum):
+    APPEND = 1
+    APPEND_LEFT = 2
+    EXTEND = 3
+    INSERT = 4
+    POP = 5
+    CHANGE_PRIORITY = 6
+    MOVE_BEFORE = 7
+    MOVE_AFTER = 8
+    CHECKPOINT = 9  # a snapshot of the queue was taken here
+    LEASE = 10
+    ACK = 11
+    REQUEUE = 12
+    DELAY = 13
+    PROMOTE = 14
+    CANCEL_DELAYED = 15
+
+
+Modes = ("sync", "group", "async")
+
+RECORD_HEADER = struct.Struct("<II")  # length and crc32 of the record body
+COUNT = struct.Struct("<I")
+PRIORITY_CHANGE = struct.Struct("<qi")  # id, priority
+MOVE = struct.Struct("<qq")  # id, other_id
+LEASE = struct.Struct("<qd")  # token, seq
+LEASE_REF = struct.Struct("<qq")  # token, id
+DUE = struct.Struct("<d")  # wall-clock due time of a delayed task
+
+
+def encode_tasks(tasks: list) -> bytes:
+    return COUNT.pack(len(tasks)) + b"".join(encode_task(task) for task in tasks)
+
+
+def encode_ids(ids: list[int]) -> bytes:
+    return COUNT.pack(len(ids)) + array("q", ids).tobytes()
+
+
+def encode_priority_change(id: int, priority: int, position: str) -> bytes:
+    return PRIORITY_CHANGE.pack(id, priority) + encode_value(position)
+
+
+Encoders = {
+    Op.APPEND: encode_task,
+    Op.APPEND_LEFT: encode_task,
+    Op.EXTEND: encode_tasks,
+    Op.INSERT: lambda index, task: INT.pack(index) + encode_task(task),
+    Op.POP: INT.pack,
+    Op.CHANGE_PRIORITY: encode_priority_change,
+    Op.MOVE_BEFORE: MOVE.pack,
+    Op.MOVE_AFTER: MOVE.pack,
+    Op.CHECKPOINT: INT.pack,
+    Op.LEASE: lambda token, seq, task: LEASE.pack(token, seq) + encode_task(task),
+    Op.ACK: LEASE_REF.pack,
+    Op.REQUEUE: LEASE_REF.pack,
+    Op.DELAY: lambda not_before, task: DUE.pack(not_before) + encode_task(task),
+    Op.PROMOTE: encode_ids,
+    Op.CANCEL_DELAYED: INT.pack,
+}
+
+
+# append-only write-ahead log of Queue changes
+#
+# every change of a queue created with `wal=...` is written as one record:
+# body length, crc32 of the body and the body, i.e. an Op and its arguments
+# (tasks are encoded with codec.py). on startup the queue replays the log to
+# rebuild the task list and subqueues; a torn or corrupt tail left by a crash
+# is cut off. a lease is logged as the pop of its task plus a LEASE record;
+# leases still open at the end of a replay expire right away, so their tasks
+# are back in the queue. a delayed task is logged with its wall-clock due time
+# and again when it becomes due (PROMOTE), so it is due at the same time after a
+# restart. a queue loaded from a snapshot replays only the records after the
+# checkpoint record of that snapshot.
+#
+# mode sets when records reach the disk (fsync):
+# - "sync": after every record, nothing acknowledged is ever lost
+# - "group": once `batch_size` records are pending or `interval` seconds passed
+#   since the last fsync; a background thread fsyncs the records a burst left
+#   pending once they are `interval` seconds old, so a crash loses at most the
+#   records of the last `interval` seconds, even after the writes stop
+# - "async": a background thread fsyncs every `interval` seconds
+# sync() forces pending records to the disk in any mode
+class WriteAheadLog:
+    def __init__(
+        self,
+        path: str,
+        mode: str = "group",
+        batch_size: int = 256,
+        interval: float = 0.01,
+    ):
+        if mode not in Modes:
+            raise ValueError(f"mode {mode} is not one of {Modes}")
+
+        self.path = path
+        self.mode = mode
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self.file = open(path, "a+b")
+        self.lock = threading.Lock()
+        self.pending = 0  # records written since the last fsync
+        self.last_sync = time.monotonic()
+
+        self.stop_event = threading.Event()
+        self.dirty = threading.Event()  # group mode: records are left pending
+        self.syncer = None
+        if mode == "async":
+            self.syncer = threading.Thread(target=self._sync_loop, daemon=True)
+        elif mode == "group":
+            self.syncer = threading.Thread(target=self._group_loop, daemon=True)
+        if self.syncer is not None:
+            self.syncer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _sync(self) -> None:
+        # must be called under self.lock
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def _sync_loop(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            with self.lock:
+                if self.pending:
+                    self._sync()
+
+    def _group_loop(self) -> None:
+        # sleeps until a write leaves records pending, then fsyncs them once
+        # `interval` seconds passed since the last fsync
+        while True:
+            self.dirty.wait()
+            if self.stop_event.is_set():
+                return
+
+            with self.lock:
+                delay = self.last_sync + self.interval - time.monotonic()
+            if delay > 0 and self.stop_event.wait(delay):
+                return
+
+            with self.lock:
+                self.dirty.clear()
+                if self.pending:
+                    self._sync()
+
+    def sync(self) -> None:
+        with self.lock:
+            self._sync()
+
+    def write(self, op: Op, *args) -> None:
+        # TC: O(S) with S the size of the record (+ fsync, depending on mode)
+        body = bytes((op,)) + Encoders[op](*args)
+        record = RECORD_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+        with self.lock:
+            self.file.write(record)
+            self.pending += 1
+
+            if self.mode == "sync":
+                self._sync()
+            elif self.mode == "group":
+                if (
+                    self.pending >= self.batch_size
+                    or time.monotonic() - self.last_sync >= self.interval
+                ):
+                    self._sync()
+                elif not self.dirty.is_set():
+                    self.dirty.set()
+
+    def _records(self, buf: memoryview, offset: int = 0):
+        # valid records from offset on, each with the offset right after it
+        while offset + RECORD_HEADER.size <= len(buf):
+            length, crc = RECORD_HEADER.unpack_from(buf, offset)
+            start = offset + RECORD_HEADER.size
+            body = buf[start : start + length]
+            if len(body) != length or zlib.crc32(body) != crc:
+                return
+
+            offset = start + length
+            yield body, offset
+
+    def _after_checkpoint(self, buf: memoryview, checkpoint: int) -> int | None:
+        # offset right after the checkpoint record, None if there is none
+        marker = bytes((Op.CHECKPOINT,)) + INT.pack(checkpoint)
+        for body, offset in self._records(buf):
+            if body == marker:
+                return offset
+        return None
+
+    def replay(self, queue, checkpoint: int | None = None) -> int:
+        # apply logged changes to the queue, returns the number of records;
+        # with a checkpoint, only changes after its record are applied
+        # TC: O(R) with R the size of the log; SC: O(R)
+        with self.lock:
+            self.file.flush()
+            self.file.seek(0)
+            buf = memoryview(self.file.read())
+
+        start = 0
+        if checkpoint is not None:
+            start = self._after_checkpoint(buf, checkpoint) or 0
+
+        # runs of appended tasks are applied with a single queue.extend
+        appended = []
+
+        end, nrecords = start, 0
+        for body, end in self._records(buf, start):
+            if body[0] == Op.APPEND:
+                appended.append(decode_task(body, 1)[0])
+            else:
+                if appended:
+                    queue.extend(appended)
+                    appended = []
+                self._apply(queue, body)
+
+            nrecords += 1
+
+        if appended:
+            queue.extend(appended)
+
+        # cut off a torn tail, so new records follow the last valid one
+        if end != len(buf):
+            with self.lock:
+                self.file.truncate(end)
+                self._sync()
+
+        return nrecords
+
+    def _apply(self, queue, body) -> None:
+        op = body[0]
+
+        if op == Op.APPEND:
+            queue.append(decode_task(body, 1)[0])
+        elif op == Op.APPEND_LEFT:
+            queue.append_left(decode_task(body, 1)[0])
+        elif op == Op.EXTEND:
+            (ntasks,) = COUNT.unpack_from(body, 1)
+            tasks, offset = [], 1 + COUNT.size
+            for _ in range(ntasks):
+                task, offset = decode_task(body, offset)
+                tasks.append(task)
+            queue.extend(tasks)
+        elif op == Op.INSERT:
+            (index,) = INT.unpack_from(body, 1)
+            queue.insert_at_index(index, decode_task(body, 1 + INT.size)[0])
+        elif op == Op.POP:
+            queue.pop(INT.unpack_from(body, 1)[0])
+        elif op == Op.CHANGE_PRIORITY:
+            id, priority = PRIORITY_CHANGE.unpack_from(body, 1)
+            position, _ = decode_value(body, 1 + PRIORITY_CHANGE.size)
+            queue.change_priority(id, priority, position)
+        elif op == Op.MOVE_BEFORE:
+            queue.move_before(*MOVE.unpack_from(body, 1))
+        elif op == Op.MOVE_AFTER:
+            queue.move_after(*MOVE.unpack_from(body, 1))
+        elif op == Op.CHECKPOINT:
+            pass
+        elif op == Op.LEASE:
+            token, seq = LEASE.unpack_from(body, 1)
+            queue.restore_lease(token, seq, decode_task(body, 1 + LEASE.size)[0])
+        elif op == Op.ACK:
+            token, id = LEASE_REF.unpack_from(body, 1)
+            # a task leased when the snapshot was taken is saved as queued
+            if token in queue.leases:
+                queue.ack(token)
+            else:
+                queue.pop(id)
+        elif op == Op.REQUEUE:
+            token, id = LEASE_REF.unpack_from(body, 1)
+            if token in queue.leases:
+                queue.nack(token)
+        elif op == Op.DELAY:
+            (not_before,) = DUE.unpack_from(body, 1)
+            queue.restore_delayed(decode_task(body, 1 + DUE.size)[0], not_before)
+        elif op == Op.PROMOTE:
+            queue.promote(array("q", bytes(body[1 + COUNT.size :])))
+        elif op == Op.CANCEL_DELAYED:
+            queue.cancel_delayed(INT.unpack_from(body, 1)[0])
+        else:
+            raise ValueError(f"unknown log record {op}")
+
+    def truncate(self) -> None:
+        # drop every record, e.g. once the queue state is saved elsewhere
+        with self.lock:
+            self.file.truncate(0)
+            self._sync()
+
+    def truncate_through(self, checkpoint: int) -> bool:
+        # drop the records up to the checkpoint record (included), e.g. once
+        # the snapshot taken there is written; records written after it are
+        # kept. writers wait while the rest of the log is copied. returns False
+        # if there is no such record. TC: O(R) with R the size of the log
+        with self.lock:
+            self.file.flush()
+            self.file.seek(0)
+            buf = self.file.read()
+            start = self._after_checkpoint(memoryview(buf), checkpoint)
+            if start is None:
+                return False
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as tmp:
+                tmp.write(buf[start:])
+                tmp.flush()
+                os.fsync(tmp.fileno())
+
+            os.replace(tmp_path, self.path)
+            self.file.close()
+            self.file = open(self.path, "a+b")
+            self.pending = 0
+            self.last_sync = time.monotonic()
+            return True
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+
+        if self.syncer is not None:
+            self.stop_event.set()
+            self.dirty.set()
+            self.syncer.join()
+
+        with self.lock:
+            self._sync()
+            self.file.close()